@@ -0,0 +1,130 @@
+"""
+Latency of unrelated requests while avatars are being uploaded.
+
+Runs an in-process app with an avatar route and a trivial ``/ping`` route.
+``--uploads`` clients keep uploading a ``--width`` x ``--height`` PNG while
+one client measures ``/ping``. Two avatar routes are compared: ``inline``
+resizes and "uploads" on the event loop, as the route used to do with the
+synchronous Cloudinary SDK, and ``pipeline`` uses ``receive_avatar`` and
+``store_avatar``, which do both in the avatar pool. The remote upload is
+simulated by a blocking sleep of ``--upload-ms``. No database or Redis is
+needed::
+
+    python -m benchmarks.avatar_uploads --uploads 8
+"""
+
+import argparse
+import asyncio
+import io
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from PIL import Image
+
+from src.conf.config import config
+from src.services.avatars import (
+    avatar_executor,
+    receive_avatar,
+    resize_avatar,
+    store_avatar,
+)
+
+PING_INTERVAL = 0.01
+
+
+class SimulatedRemoteStorage:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def save(self, key: str, data: bytes, extension: str) -> str:
+        await avatar_executor.run(time.sleep, self.latency)
+        return f"https://example.com/{key}{extension}"
+
+
+def make_app(latency: float) -> FastAPI:
+    app = FastAPI()
+    storage = SimulatedRemoteStorage(latency)
+
+    @app.patch("/inline")
+    async def inline(request: Request):
+        form = await request.form()
+        data = await form["file"].read()
+        resize_avatar(data, config.AVATAR_SIZE)
+        time.sleep(latency)
+        return {"ok": True}
+
+    @app.patch("/pipeline")
+    async def pipeline(request: Request):
+        data = await receive_avatar(request)
+        return {"url": await store_avatar(data, "bench", storage)}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def image(width: int, height: int) -> bytes:
+    output = io.BytesIO()
+    Image.effect_noise((width, height), 64).convert("RGB").save(output, format="PNG")
+    return output.getvalue()
+
+
+async def run(app: FastAPI, route: str, uploads: int, content: bytes, seconds: float):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        stop = time.perf_counter() + seconds
+        done = 0
+
+        async def uploader():
+            nonlocal done
+            while time.perf_counter() < stop:
+                files = {"file": ("avatar.png", content, "image/png")}
+                response = await client.patch(route, files=files)
+                response.raise_for_status()
+                done += 1
+
+        async def pinger():
+            # Latency counts from when each ping was due, not from when the
+            # loop got round to sending it, or a blocked loop would hide itself.
+            latencies = []
+            due = time.perf_counter()
+            while due < stop:
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                await client.get("/ping")
+                latencies.append(time.perf_counter() - due)
+                due += PING_INTERVAL
+            return latencies
+
+        results = await asyncio.gather(pinger(), *(uploader() for _ in range(uploads)))
+    latencies = sorted(results[0])
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{route:<10} {done / seconds:6.1f} uploads/s | /ping p50 "
+        f"{statistics.median(latencies) * 1000:7.2f} ms, p99 {p99 * 1000:7.2f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--width", type=int, default=1600)
+    parser.add_argument("--height", type=int, default=1200)
+    parser.add_argument("--upload-ms", type=float, default=50)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    content = image(args.width, args.height)
+    print(f"{len(content) / 1024:.0f} KiB image, {args.uploads} concurrent uploads")
+    app = make_app(args.upload_ms / 1000)
+    for route in ("/inline", "/pipeline"):
+        await run(app, route, args.uploads, content, args.seconds)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
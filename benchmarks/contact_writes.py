@@ -0,0 +1,143 @@
+"""
+Contact write throughput: SELECT + mutate + refresh vs UPDATE/DELETE ... RETURNING.
+
+Seeds ``--rows`` contacts for a throwaway user in the database from
+``DB_URL`` (run the migrations first), then updates and deletes them one
+request-sized session at a time, first the way the repository used to
+(load, mutate, commit, refresh) and then through ``update_contact`` and
+``delete_contact``. Prints writes per second and statements per write::
+
+    python -m benchmarks.contact_writes --rows 2000
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import date
+
+from sqlalchemy import delete, event, insert, select
+
+from src.conf.config import config
+from src.database.db import DatabaseSessionManager, engine_options
+from src.entity.models import Contact, User
+from src.repository import contacts as repositories_contacts
+from src.schemas.contact import ContactPatchSchema
+
+
+async def seed(manager: DatabaseSessionManager, rows: int) -> tuple[User, list[int]]:
+    tag = uuid.uuid4().hex[:8]
+    async with manager.session() as session:
+        user = User(
+            username=f"bench-{tag}", email=f"bench-{tag}@bench.net", password="x"
+        )
+        session.add(user)
+        await session.flush()
+        result = await session.execute(
+            insert(Contact).returning(Contact.id),
+            [
+                {
+                    "name": f"name{i}",
+                    "surname": f"surname{i}",
+                    "email": f"{tag}-{i}@bench.net",
+                    "phone": f"{tag[:4]}{i}",
+                    "birthday": date(1990, 1 + i % 12, 1 + i % 28),
+                    "user_id": user.id,
+                }
+                for i in range(rows)
+            ],
+        )
+        return user, list(result.scalars())
+
+
+async def legacy_update(contact_id: int, body, db, user: User):
+    result = await db.execute(select(Contact).filter_by(id=contact_id, user_id=user.id))
+    contact = result.unique().scalar_one_or_none()
+    if contact:
+        for key, value in body.model_dump(exclude_unset=True).items():
+            setattr(contact, key, value)
+        await db.commit()
+        await db.refresh(contact)
+    return contact
+
+
+async def legacy_delete(contact_id: int, db, user: User):
+    result = await db.execute(select(Contact).filter_by(id=contact_id, user_id=user.id))
+    contact = result.unique().scalar_one_or_none()
+    if contact:
+        await db.delete(contact)
+        await db.commit()
+    return contact
+
+
+async def run(manager, label: str, ids: list[int], write, statements: list) -> None:
+    statements.clear()
+    started = time.perf_counter()
+    for contact_id in ids:
+        async with manager.session() as db:
+            await write(contact_id, db)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:<24} {len(ids) / elapsed:9.0f} writes/s | "
+        f"{len(statements) / len(ids):4.1f} statements/write"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    manager = DatabaseSessionManager(config.DB_URL, **engine_options(config.DB_URL))
+    user, ids = await seed(manager, args.rows * 2)
+    legacy_ids, returning_ids = ids[: args.rows], ids[args.rows :]
+    body = ContactPatchSchema(notes="benchmark notes", birthday="1990-12-31")
+
+    statements = []
+    event.listen(
+        manager.engine.sync_engine,
+        "before_cursor_execute",
+        lambda *event_args: statements.append(event_args[2]),
+    )
+    try:
+        await run(
+            manager,
+            "update (select+refresh)",
+            legacy_ids,
+            lambda contact_id, db: legacy_update(contact_id, body, db, user),
+            statements,
+        )
+        await run(
+            manager,
+            "update (returning)",
+            returning_ids,
+            lambda contact_id, db: repositories_contacts.update_contact(
+                contact_id, body, db, user
+            ),
+            statements,
+        )
+        await run(
+            manager,
+            "delete (select)",
+            legacy_ids,
+            lambda contact_id, db: legacy_delete(contact_id, db, user),
+            statements,
+        )
+        await run(
+            manager,
+            "delete (returning)",
+            returning_ids,
+            lambda contact_id, db: repositories_contacts.delete_contact(
+                contact_id, db, user
+            ),
+            statements,
+        )
+    finally:
+        async with manager.session() as db:
+            await db.execute(delete(Contact).filter_by(user_id=user.id))
+            await db.execute(delete(User).filter_by(id=user.id))
+        await manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
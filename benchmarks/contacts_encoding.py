@@ -0,0 +1,105 @@
+"""
+Bytes on the wire and CPU per 500-row contact page, by encoder and compression.
+
+Builds ``--pages`` pages of 500 contacts with their owner in memory and
+encodes each page two ways: FastAPI's response_model path (validate, dump
+to a dict, ``json.dumps`` in ``JSONResponse``) and the routes'
+``dump_contacts``, which goes straight to bytes. Each body is then gzipped
+at a few levels. Prints the CPU time per page and the size of the body::
+
+    python -m benchmarks.contacts_encoding --pages 40
+"""
+
+import argparse
+import asyncio
+import gzip
+import time
+from datetime import date, datetime
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from src.entity.models import Contact, Role, User
+from src.routes.contacts import dump_contacts
+from src.schemas.contact import ContactResponse
+
+PAGE = 500
+LEVELS = (1, 5, 9)
+
+response_field = create_response_field(
+    name="Response_get_contacts", type_=list[ContactResponse]
+)
+
+
+def page(number: int) -> list[Contact]:
+    user = User(
+        id=1,
+        username="bench",
+        email="bench@bench.net",
+        avatar="https://bench.net/avatar.png",
+        role=Role.user,
+    )
+    contacts = []
+    for i in range(number * PAGE, (number + 1) * PAGE):
+        contact = Contact(
+            id=i + 1,
+            name=f"name{i}",
+            surname=f"surname{i}",
+            email=f"contact{i}@bench.net",
+            phone=f"380{i:09d}",
+            birthday=date(1990, 1 + i % 12, 1 + i % 28),
+            notes="benchmark notes",
+            created_at=datetime(2024, 1, 1, 12, 0, 0),
+            updated_at=datetime(2024, 1, 1, 12, 0, 0),
+            user_id=user.id,
+        )
+        contact.user = user
+        contacts.append(contact)
+    return contacts
+
+
+async def default_path(contacts: list[Contact]) -> bytes:
+    content = await serialize_response(
+        field=response_field, response_content=contacts, is_coroutine=True
+    )
+    return JSONResponse(content).body
+
+
+async def direct_path(contacts: list[Contact]) -> bytes:
+    return dump_contacts(contacts, lean=False)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=40)
+    args = parser.parse_args()
+
+    pages = [page(number) for number in range(args.pages)]
+    for label, encode in (("response_model", default_path), ("dump_json", direct_path)):
+        cpu = 0.0
+        bodies = []
+        for contacts in pages:
+            started = time.process_time()
+            bodies.append(await encode(contacts))
+            cpu += time.process_time() - started
+        size = sum(len(body) for body in bodies) / len(bodies)
+        print(
+            f"{label:<16} {cpu / len(pages) * 1000:7.2f} ms CPU/page | "
+            f"{size / 1024:7.1f} KiB/page"
+        )
+    for level in LEVELS:
+        cpu = 0.0
+        compressed = 0
+        for body in bodies:
+            started = time.process_time()
+            compressed += len(gzip.compress(body, compresslevel=level))
+            cpu += time.process_time() - started
+        print(
+            f"{'+ gzip -' + str(level):<16} {cpu / len(bodies) * 1000:7.2f} ms CPU/page | "
+            f"{compressed / len(bodies) / 1024:7.1f} KiB/page on the wire"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Throughput and peak memory of the streaming bulk contact import.
+
+Generates a ``--rows``-row CSV (or NDJSON) upload on the fly, streams it in
+64 KiB chunks through ``import_contacts`` for a throwaway user in the
+database from ``DB_URL`` (run the migrations first), and prints rows per
+second. With ``--memory`` the run is traced and the tracemalloc peak is
+printed as well (tracing slows the import down considerably, so time and
+memory are best read from separate runs). The user and contacts are
+removed afterwards::
+
+    python -m benchmarks.contacts_import --rows 100000
+    python -m benchmarks.contacts_import --rows 100000 --memory
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+import uuid
+
+from sqlalchemy import delete
+
+from src.conf.config import config
+from src.database.db import DatabaseSessionManager, engine_options
+from src.entity.models import Contact, User
+from src.services.contacts_import import ImportFormat, import_contacts
+
+CHUNK = 64 * 1024
+
+
+def lines(rows: int, fmt: ImportFormat, tag: str):
+    if fmt == ImportFormat.csv:
+        yield b"name,surname,email,phone,birthday,notes\n"
+    for i in range(rows):
+        row = {
+            "name": f"name{i}",
+            "surname": f"surname{i}",
+            "email": f"{tag}-{i}@bench.net",
+            "phone": f"38{i:09d}",
+            "birthday": f"1990-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "notes": "imported by benchmark",
+        }
+        if fmt == ImportFormat.csv:
+            yield (",".join(row.values()) + "\n").encode()
+        else:
+            yield json.dumps(row).encode() + b"\n"
+
+
+async def upload(rows: int, fmt: ImportFormat, tag: str):
+    chunk = b""
+    for line in lines(rows, fmt, tag):
+        chunk += line
+        if len(chunk) >= CHUNK:
+            yield chunk
+            chunk = b""
+    if chunk:
+        yield chunk
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--batch-size", type=int, default=config.IMPORT_BATCH_SIZE)
+    parser.add_argument("--memory", action="store_true")
+    args = parser.parse_args()
+
+    manager = DatabaseSessionManager(config.DB_URL, **engine_options(config.DB_URL))
+    tag = uuid.uuid4().hex[:8]
+    async with manager.session() as session:
+        user = User(
+            username=f"bench-{tag}", email=f"bench-{tag}@bench.net", password="x"
+        )
+        session.add(user)
+    fmt = ImportFormat(args.format)
+    try:
+        if args.memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        async with manager.session() as session:
+            report = await import_contacts(
+                upload(args.rows, fmt, tag), fmt, session, user, args.batch_size
+            )
+        elapsed = time.perf_counter() - started
+        print(
+            f"{report.imported} imported, {report.duplicates} duplicates, "
+            f"{report.failed} failed in {elapsed:.2f} s "
+            f"({args.rows / elapsed:.0f} rows/s)"
+        )
+        if args.memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"peak {peak / 2**20:.1f} MiB")
+    finally:
+        async with manager.session() as session:
+            await session.execute(delete(Contact).filter_by(user_id=user.id))
+            await session.execute(delete(User).filter_by(id=user.id))
+        await manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
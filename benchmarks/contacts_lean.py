@@ -0,0 +1,147 @@
+"""
+Rows/sec and memory of a 500-row contact page: joined owner vs attached owner vs lean.
+
+Seeds ``--rows`` contacts for a throwaway user in the database from
+``DB_URL`` (run the migrations first), then loads and serializes 500-row
+pages three ways: the former global ``lazy="joined"`` load with
+``ContactResponse``, the owner attached by the repository with
+``ContactResponse``, and ``lean=True`` with ``ContactLeanResponse``.
+Prints rows per second (timed without tracing) and the tracemalloc peak
+per page::
+
+    python -m benchmarks.contacts_lean --rows 20000
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+import uuid
+from datetime import date
+
+from pydantic import TypeAdapter
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import joinedload
+
+from src.conf.config import config
+from src.database.db import DatabaseSessionManager, engine_options
+from src.entity.models import Contact, User
+from src.repository import contacts as repositories_contacts
+from src.schemas.contact import ContactLeanResponse, ContactResponse
+
+PAGE = 500
+
+full_contacts = TypeAdapter(list[ContactResponse])
+lean_contacts = TypeAdapter(list[ContactLeanResponse])
+
+
+async def seed(manager: DatabaseSessionManager, rows: int) -> User:
+    tag = uuid.uuid4().hex[:8]
+    async with manager.session() as session:
+        user = User(
+            username=f"bench-{tag}",
+            email=f"bench-{tag}@bench.net",
+            password="x",
+            avatar="https://bench.net/avatar.png",
+        )
+        session.add(user)
+        await session.flush()
+        await session.execute(
+            insert(Contact),
+            [
+                {
+                    "name": f"name{i}",
+                    "surname": f"surname{i}",
+                    "email": f"{tag}-{i}@bench.net",
+                    "phone": f"{tag[:4]}{i}",
+                    "birthday": date(1990, 1 + i % 12, 1 + i % 28),
+                    "notes": "benchmark notes",
+                    "user_id": user.id,
+                }
+                for i in range(rows)
+            ],
+        )
+        return user
+
+
+async def joined_page(db, user: User, after_id: int) -> bytes:
+    result = await db.execute(
+        select(Contact)
+        .options(joinedload(Contact.user))
+        .filter_by(user_id=user.id)
+        .filter(Contact.id > after_id)
+        .order_by(Contact.id)
+        .limit(PAGE)
+    )
+    contacts = result.scalars().all()
+    return full_contacts.dump_json(
+        full_contacts.validate_python(contacts, from_attributes=True)
+    )
+
+
+async def attached_page(db, user: User, after_id: int) -> bytes:
+    contacts = await repositories_contacts.get_contacts(
+        PAGE, 0, db, user, after_id=after_id
+    )
+    return full_contacts.dump_json(
+        full_contacts.validate_python(contacts, from_attributes=True)
+    )
+
+
+async def lean_page(db, user: User, after_id: int) -> bytes:
+    contacts = await repositories_contacts.get_contacts(
+        PAGE, 0, db, user, after_id=after_id, lean=True
+    )
+    return lean_contacts.dump_json(
+        lean_contacts.validate_python(contacts, from_attributes=True)
+    )
+
+
+async def measure(
+    manager, user: User, label: str, render, first_id: int, pages: int
+) -> None:
+    elapsed = 0.0
+    peaks = []
+    for page in range(pages):
+        async with manager.session() as db:
+            started = time.perf_counter()
+            await render(db, user, first_id - 1 + page * PAGE)
+            elapsed += time.perf_counter() - started
+            tracemalloc.start()
+            await render(db, user, first_id - 1 + page * PAGE)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    print(
+        f"{label:<16} {pages * PAGE / elapsed:9.0f} rows/s | "
+        f"peak {max(peaks) / 1024:8.1f} KiB per {PAGE}-row page"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=20_000)
+    args = parser.parse_args()
+
+    manager = DatabaseSessionManager(config.DB_URL, **engine_options(config.DB_URL))
+    user = await seed(manager, args.rows)
+    async with manager.session() as db:
+        first_id = (
+            await db.execute(select(Contact.id).filter_by(user_id=user.id).limit(1))
+        ).scalar()
+    pages = args.rows // PAGE
+    try:
+        for label, render in (
+            ("joined owner", joined_page),
+            ("attached owner", attached_page),
+            ("lean", lean_page),
+        ):
+            await measure(manager, user, label, render, first_id, pages)
+    finally:
+        async with manager.session() as db:
+            await db.execute(delete(Contact).filter_by(user_id=user.id))
+            await db.execute(delete(User).filter_by(id=user.id))
+        await manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
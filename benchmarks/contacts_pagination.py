@@ -0,0 +1,115 @@
+"""
+Page latency of the contact list at growing depth: OFFSET vs keyset cursor.
+
+Seeds ``--rows`` contacts for a throwaway user in the database from
+``DB_URL`` (run the migrations first), then times ``get_contacts`` for a
+500-row page at several depths with both strategies. The seeded user and
+contacts are removed afterwards unless ``--keep`` is given::
+
+    python -m benchmarks.contacts_pagination --rows 1000000
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import date
+
+from sqlalchemy import delete, insert, select
+
+from src.conf.config import config
+from src.database.db import DatabaseSessionManager, engine_options
+from src.entity.models import Contact, User
+from src.repository import contacts as repositories_contacts
+
+PAGE = 500
+BATCH = 10_000
+
+
+async def seed(manager: DatabaseSessionManager, rows: int) -> User:
+    tag = uuid.uuid4().hex[:8]
+    async with manager.session() as session:
+        user = User(
+            username=f"bench-{tag}", email=f"bench-{tag}@bench.net", password="x"
+        )
+        session.add(user)
+        await session.flush()
+        for start in range(0, rows, BATCH):
+            await session.execute(
+                insert(Contact),
+                [
+                    {
+                        "name": f"name{i}",
+                        "surname": f"surname{i % 5000}",
+                        "email": f"{tag}-{i}@bench.net",
+                        "phone": f"{tag[:4]}{i}",
+                        "birthday": date(1990, 1 + i % 12, 1 + i % 28),
+                        "user_id": user.id,
+                    }
+                    for i in range(start, min(start + BATCH, rows))
+                ],
+            )
+        return user
+
+
+async def timed(coro) -> float:
+    started = time.perf_counter()
+    await coro
+    return time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    manager = DatabaseSessionManager(config.DB_URL, **engine_options(config.DB_URL))
+    print(f"seeding {args.rows} contacts...")
+    user = await seed(manager, args.rows)
+
+    depths = [d for d in (0, 1_000, 10_000, 100_000, 500_000) if d < args.rows]
+    depths.append(max(args.rows - PAGE, 0))
+    try:
+        async with manager.session() as db:
+            for depth in depths:
+                after_id = None
+                if depth:
+                    after_id = (
+                        await db.execute(
+                            select(Contact.id)
+                            .filter_by(user_id=user.id)
+                            .order_by(Contact.id)
+                            .offset(depth - 1)
+                            .limit(1)
+                        )
+                    ).scalar()
+                offset_times, cursor_times = [], []
+                for _ in range(args.repeat):
+                    offset_times.append(
+                        await timed(
+                            repositories_contacts.get_contacts(PAGE, depth, db, user)
+                        )
+                    )
+                    cursor_times.append(
+                        await timed(
+                            repositories_contacts.get_contacts(
+                                PAGE, 0, db, user, after_id=after_id
+                            )
+                        )
+                    )
+                print(
+                    f"depth {depth:>9}: offset {min(offset_times) * 1000:8.2f} ms | "
+                    f"cursor {min(cursor_times) * 1000:8.2f} ms"
+                )
+    finally:
+        if not args.keep:
+            async with manager.session() as db:
+                await db.execute(delete(Contact).filter_by(user_id=user.id))
+                await db.execute(delete(User).filter_by(id=user.id))
+        await manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+"""
+CPU cost of rendering the verification email.
+
+Renders ``verify_email.html`` ``--messages`` times in three ways: ``fresh``
+builds a new Jinja environment for every message, which is what fastapi-mail
+did on every send, so the template was read and compiled each time;
+``loader`` shares one environment, which still asks the loader whether the
+file changed; ``compiled`` uses ``email_templates``, compiled once at
+startup. Runs without a database or Redis::
+
+    python -m benchmarks.email_rendering --messages 5000
+"""
+
+import argparse
+import time
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from src.services.rendering import TEMPLATE_FOLDER, TemplateRenderer
+
+TEMPLATE = "verify_email.html"
+
+
+def body(index: int) -> dict:
+    return {
+        "host": "http://localhost:8000/",
+        "username": f"user{index}",
+        "token": "x" * 160,
+    }
+
+
+def fresh(index: int) -> str:
+    environment = Environment(loader=FileSystemLoader(TEMPLATE_FOLDER))
+    return environment.get_template(TEMPLATE).render(**body(index))
+
+
+shared = Environment(
+    loader=FileSystemLoader(TEMPLATE_FOLDER), autoescape=select_autoescape(["html"])
+)
+
+
+def loader(index: int) -> str:
+    return shared.get_template(TEMPLATE).render(**body(index))
+
+
+renderer = TemplateRenderer()
+
+
+def compiled(index: int) -> str:
+    return renderer.render(TEMPLATE, **body(index))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=5000)
+    args = parser.parse_args()
+
+    renderer.compile()
+    for name, render in (("fresh", fresh), ("loader", loader), ("compiled", compiled)):
+        start = time.perf_counter()
+        for index in range(args.messages):
+            render(index)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<9} {elapsed / args.messages * 1e6:9.1f} us/message")
+    print(renderer.stats()["templates"][TEMPLATE])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Verified-JWT decode throughput on a single core, with and without the cache.
+
+Every authenticated request decodes its bearer token once, so decodes per
+second is an upper bound on requests per second per core for that step::
+
+    python -m benchmarks.jwt_decode --tokens 100 --number 100000
+"""
+
+import argparse
+import asyncio
+import time
+
+from jose import jwt
+
+from src.services.auth import auth_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=100, help="distinct users")
+    parser.add_argument("--number", type=int, default=100_000)
+    args = parser.parse_args()
+
+    tokens = [
+        asyncio.run(auth_service.create_access_token(data={"sub": f"{i}@bench.net"}))
+        for i in range(args.tokens)
+    ]
+
+    def uncached(token: str) -> dict:
+        return jwt.decode(
+            token, auth_service.SECRET_KEY, algorithms=[auth_service.ALGORITHM]
+        )
+
+    for name, decode in (("jose", uncached), ("cached", auth_service.decode_token)):
+        auth_service.token_cache.clear()
+        started = time.perf_counter()
+        for i in range(args.number):
+            decode(tokens[i % len(tokens)])
+        elapsed = time.perf_counter() - started
+        print(f"{name:>7}: {args.number / elapsed:10.0f} decodes/s")
+
+
+if __name__ == "__main__":
+    main()
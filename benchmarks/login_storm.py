@@ -0,0 +1,87 @@
+"""
+Latency of unrelated requests while a login storm is running.
+
+Fires ``--logins`` concurrent ``POST /api/auth/login`` loops at a running
+server and, at the same time, samples ``GET /api/contacts/`` with a valid
+token. Prints p50/p99 of the contacts requests and how the logins ended
+(200, 401 or 503 once the bcrypt pool is saturated)::
+
+    uvicorn main:app --workers 1 &
+    python -m benchmarks.login_storm --email user@mail.net --password secret
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+import httpx
+
+
+def percentile(samples: list[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str):
+    return await client.post(
+        "/api/auth/login", data={"username": email, "password": password}
+    )
+
+
+async def storm(client, email, password, stop: asyncio.Event, statuses: Counter):
+    while not stop.is_set():
+        response = await login(client, email, password)
+        statuses[response.status_code] += 1
+
+
+async def sample(client, token: str, stop: asyncio.Event, latencies: list[float]):
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/api/contacts/", headers=headers)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.logins + 10)
+    async with httpx.AsyncClient(
+        base_url=args.url, limits=limits, timeout=60
+    ) as client:
+        response = await login(client, args.email, args.password)
+        response.raise_for_status()
+        token = response.json()["access_token"]
+
+        for name, logins in (("idle", 0), ("storm", args.logins)):
+            stop = asyncio.Event()
+            latencies, statuses = [], Counter()
+            tasks = [asyncio.create_task(sample(client, token, stop, latencies))]
+            tasks += [
+                asyncio.create_task(
+                    storm(client, args.email, args.password, stop, statuses)
+                )
+                for _ in range(logins)
+            ]
+            await asyncio.sleep(args.seconds)
+            stop.set()
+            await asyncio.gather(*tasks)
+            print(
+                f"{name:>5}: contacts p50 "
+                f"{statistics.median(latencies) * 1000:8.2f} ms "
+                f"p99 {percentile(latencies, 0.99) * 1000:8.2f} ms | "
+                f"logins {dict(statuses)}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
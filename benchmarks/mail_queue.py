@@ -0,0 +1,157 @@
+"""
+Mail throughput with and without SMTP session reuse.
+
+Sends ``--messages`` verification emails to a local aiosmtpd server. The
+``per-message`` run opens, uses and closes a new SMTP connection for every
+message, as the FastMail call used to. The ``worker`` run
+feeds the same messages through ``MailWorker``, whose ``--consumers`` tasks
+take them in batches of ``--batch-size`` and keep their sessions open. An
+in-memory queue stands in for Redis, so only aiosmtpd (a benchmark-only
+extra) is needed::
+
+    python -m benchmarks.mail_queue --messages 2000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+
+from src.services.mail_queue import MailWorker, build_message
+
+HOST = "127.0.0.1"
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+class MemoryQueue:
+    """
+    Just enough of MailQueue for MailWorker, kept in memory.
+    """
+
+    def __init__(self, messages: list[bytes]):
+        self.waiting = asyncio.Queue()
+        for raw in messages:
+            self.waiting.put_nowait(raw)
+        self.pending = len(messages)
+        self.done = asyncio.Event()
+
+    async def take(self, consumer: str, count: int, timeout: float) -> list[bytes]:
+        try:
+            batch = [await asyncio.wait_for(self.waiting.get(), timeout)]
+        except asyncio.TimeoutError:
+            return []
+        while len(batch) < count and not self.waiting.empty():
+            batch.append(self.waiting.get_nowait())
+        return batch
+
+    async def ack(self, consumer: str, raw: bytes) -> None:
+        self.pending -= 1
+        if not self.pending:
+            self.done.set()
+
+    async def reschedule(self, consumer: str, raw: bytes, due: float | None) -> None:
+        self.waiting.put_nowait(raw)
+
+    async def heartbeat(self, consumer: str, ttl: int) -> None:
+        pass
+
+    async def requeue_orphans(self, consumer: str = "") -> int:
+        return 0
+
+    async def promote_due(self, limit: int = 100) -> int:
+        return 0
+
+
+def messages(count: int) -> list[bytes]:
+    return [
+        json.dumps(
+            {
+                "id": str(index),
+                "attempts": 0,
+                "to": f"user{index}@example.com",
+                "subject": "Confirm your email ",
+                "template": "verify_email.html",
+                "body": {
+                    "host": "http://localhost:8000/",
+                    "username": f"user{index}",
+                    "token": "x" * 160,
+                },
+            }
+        ).encode()
+        for index in range(count)
+    ]
+
+
+async def per_message(port: int, batch: list[bytes], concurrency: int) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(raw: bytes):
+        async with semaphore:
+            smtp = aiosmtplib.SMTP(hostname=HOST, port=port)
+            await smtp.connect()
+            await smtp.send_message(build_message(json.loads(raw)))
+            await smtp.quit()
+
+    await asyncio.gather(*(send(raw) for raw in batch))
+    return len(batch)
+
+
+async def worker(port: int, batch: list[bytes], consumers: int, size: int) -> int:
+    queue = MemoryQueue(batch)
+    mail_worker = MailWorker(
+        queue,
+        consumers,
+        size,
+        smtp_factory=lambda: aiosmtplib.SMTP(hostname=HOST, port=port),
+        name="bench",
+    )
+    await mail_worker.start()
+    await queue.done.wait()
+    await mail_worker.stop()
+    return mail_worker.stats()["sessions"]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--consumers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    handler = CountingHandler()
+    controller = Controller(handler, hostname=HOST, port=args.port)
+    controller.start()
+    try:
+        batch = messages(args.messages)
+        runs = [
+            ("per-message", per_message(args.port, batch, args.consumers)),
+            ("worker", worker(args.port, batch, args.consumers, args.batch_size)),
+        ]
+        for name, run in runs:
+            received = handler.received
+            start = time.perf_counter()
+            sessions = await run
+            elapsed = time.perf_counter() - start
+            assert handler.received - received == args.messages
+            print(
+                f"{name:<12} {args.messages / elapsed:8.1f} messages/s, "
+                f"{sessions} SMTP sessions"
+            )
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""
+Payload size and (de)serialization time of the cached user principal.
+
+Compares ``pickle`` of a persistent SQLAlchemy ``User`` (what the auth cache
+used to store) with the versioned record of ``src.services.principal``::
+
+    python -m benchmarks.principal_serialization --number 100000
+"""
+
+import argparse
+import pickle
+import timeit
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from src.entity.models import Base, User, Role
+from src.services.principal import dump_principal, load_principal
+
+
+def load_user() -> User:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine, expire_on_commit=False) as session:
+        session.add(
+            User(
+                username="benchmark",
+                email="benchmark@example.com",
+                password="$2b$12$" + "x" * 53,
+                avatar="https://www.gravatar.com/avatar/" + "0" * 32,
+                refresh_token="x" * 200,
+                role=Role.user,
+                confirmed=True,
+            )
+        )
+        session.commit()
+        return session.execute(select(User)).scalar_one()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=100_000)
+    args = parser.parse_args()
+
+    user = load_user()
+    codecs = {
+        "pickle": (pickle.dumps, pickle.loads),
+        "principal": (dump_principal, load_principal),
+    }
+    for name, (dumps, loads) in codecs.items():
+        data = dumps(user)
+        dump_time = timeit.timeit(lambda: dumps(user), number=args.number)
+        load_time = timeit.timeit(lambda: loads(data), number=args.number)
+        print(
+            f"{name:>10}: {len(data):5d} bytes | "
+            f"dump {dump_time / args.number * 1e6:6.2f} us | "
+            f"load {load_time / args.number * 1e6:6.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    main()
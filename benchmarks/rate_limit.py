@@ -0,0 +1,109 @@
+"""
+Redis operations spent on rate limiting, per request and with leases.
+
+Simulates ``--workers`` app workers serving ``--users`` users who each send
+``--rps`` requests a second for ``--seconds`` simulated seconds, against a
+limit of ``--limit`` (as in RATE_LIMITS, e.g. "100/60"). ``per-request`` is
+fastapi-limiter, which runs a Lua script in Redis for every request;
+``leases`` is ``TokenBuckets``, which takes leases sized from each worker's
+demand, up to a tenth of a bucket, and answers from memory until they run
+out. The two do not allow the same
+requests: fastapi-limiter counts fixed windows, ``TokenBuckets`` refills
+continuously. Redis is modelled in memory, so the
+counts are exact and no server is needed::
+
+    python -m benchmarks.rate_limit --workers 4 --users 200 --rps 5
+"""
+
+import argparse
+import asyncio
+import math
+from unittest.mock import MagicMock, patch
+
+from src.services.rate_limit import Rate, TokenBuckets
+
+
+class LeaseScript:
+    """
+    The TAKE_LEASE script over an in-memory bucket, counting calls.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.calls = 0
+
+    async def __call__(self, keys, args):
+        self.calls += 1
+        capacity, rate, now, want, refund = args
+        tokens, ts = self.buckets.get(keys[0], (capacity, now))
+        tokens = min(capacity, tokens + max(0, now - ts) * rate + refund)
+        granted = min(want, math.floor(tokens))
+        tokens -= granted
+        self.buckets[keys[0]] = (tokens, now)
+        wait = 0 if granted else math.ceil((1 - tokens) / rate)
+        return [granted, wait]
+
+
+def schedule(users: int, rps: float, seconds: float):
+    step = 1 / rps
+    for tick in range(int(seconds * rps)):
+        for user in range(users):
+            # Spread the users over the tick so they do not arrive together.
+            yield tick * step + user * step / users, user
+
+
+async def leases(args, rate: Rate) -> tuple[int, int]:
+    script = LeaseScript()
+    client = MagicMock()
+    client.register_script.return_value = script
+    workers = [
+        TokenBuckets(client, "ratelimit", 0.1, 100_000) for _ in range(args.workers)
+    ]
+    clock = [0.0]
+    allowed = 0
+    with patch("src.services.rate_limit.time.time", lambda: clock[0]):
+        for index, (at, user) in enumerate(
+            schedule(args.users, args.rps, args.seconds)
+        ):
+            clock[0] = 1_000_000 + at
+            wait = await workers[index % args.workers].acquire(f"me:{user}", rate)
+            allowed += wait == 0
+    return script.calls, allowed
+
+
+def per_request(args, rate: Rate) -> tuple[int, int]:
+    # fastapi-limiter's fixed window: one EVALSHA for every request.
+    windows, calls, allowed = {}, 0, 0
+    for at, user in schedule(args.users, args.rps, args.seconds):
+        calls += 1
+        window = (user, int(at // rate.seconds))
+        windows[window] = windows.get(window, 0) + 1
+        allowed += windows[window] <= rate.times
+    return calls, allowed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rps", type=float, default=5)
+    parser.add_argument("--seconds", type=float, default=120)
+    parser.add_argument("--limit", default="100/60")
+    args = parser.parse_args()
+
+    rate = Rate.parse(args.limit)
+    requests = int(args.seconds * args.rps) * args.users
+    print(f"{requests} requests, limit {args.limit} per user")
+    results = [
+        ("per-request", per_request(args, rate)),
+        ("leases", await leases(args, rate)),
+    ]
+    for name, (calls, allowed) in results:
+        print(
+            f"{name:<12} {calls / args.seconds:9.1f} Redis ops/s "
+            f"({calls / requests:6.1%} of requests), {allowed} allowed"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""
+Latency benchmark for the authenticated-user cache.
+
+Compares the old blocking ``redis.Redis`` client with the shared async pool
+from ``src.database.cache`` while many coroutines hit the cache concurrently.
+Besides the cache call latency it measures event loop lag with a ticker
+coroutine, which is what every other request in the worker actually feels.
+
+Requires a running Redis (``docker compose up redis``)::
+
+    python -m benchmarks.user_cache_latency --concurrency 200 --requests 20000
+"""
+
+import argparse
+import asyncio
+import pickle
+import statistics
+import time
+
+import redis
+
+from src.conf.config import config
+from src.database.cache import RedisConnectionManager
+
+PAYLOAD = pickle.dumps({"id": 1, "email": "bench@example.com", "role": "user"})
+
+
+def percentile(samples: list[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+async def ticker(stop: asyncio.Event, lags: list[float], interval: float = 0.001):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run_sync(requests: int, concurrency: int) -> tuple[list[float], list[float]]:
+    client = redis.Redis(
+        host=config.REDIS_DOMAIN,
+        port=config.REDIS_PORT,
+        db=0,
+        password=config.REDIS_PASSWORD,
+    )
+    latencies, lags = [], []
+
+    async def worker(n: int):
+        for i in range(n):
+            key = f"bench:user:{i % 1000}"
+            started = time.perf_counter()
+            if client.get(key) is None:
+                client.set(key, PAYLOAD)
+                client.expire(key, 300)
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0)
+
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(stop, lags))
+    await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+    stop.set()
+    await tick
+    client.close()
+    return latencies, lags
+
+
+async def run_async(requests: int, concurrency: int) -> tuple[list[float], list[float]]:
+    manager = RedisConnectionManager(
+        host=config.REDIS_DOMAIN,
+        port=config.REDIS_PORT,
+        password=config.REDIS_PASSWORD,
+        max_connections=config.REDIS_MAX_CONNECTIONS,
+    )
+    client = manager.client
+    latencies, lags = [], []
+
+    async def worker(n: int):
+        for i in range(n):
+            key = f"bench:user:{i % 1000}"
+            started = time.perf_counter()
+            if await client.get(key) is None:
+                await client.set(key, PAYLOAD, ex=300)
+            latencies.append(time.perf_counter() - started)
+
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(stop, lags))
+    await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+    stop.set()
+    await tick
+    await manager.close()
+    return latencies, lags
+
+
+def report(name: str, elapsed: float, latencies: list[float], lags: list[float]):
+    print(
+        f"{name:>6}: {len(latencies) / elapsed:9.0f} ops/s | "
+        f"cache p50 {statistics.median(latencies) * 1000:7.3f} ms "
+        f"p99 {percentile(latencies, 0.99) * 1000:7.3f} ms | "
+        f"loop lag p50 {statistics.median(lags or [0]) * 1000:7.3f} ms "
+        f"p99 {percentile(lags or [0], 0.99) * 1000:7.3f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    for name, runner in (("sync", run_sync), ("async", run_async)):
+        started = time.perf_counter()
+        latencies, lags = await runner(args.requests, args.concurrency)
+        report(name, time.perf_counter() - started, latencies, lags)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
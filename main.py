@@ -1,19 +1,22 @@
 # import uvicorn
-import redis.asyncio as redis
-
 from pathlib import Path
-from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi_limiter import FastAPILimiter
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.db import get_db
-from src.routes import contacts, auth, users
 from src.conf.config import config
+from src.database.db import sessionmanager
+from src.database.cache import redismanager
+from src.routes import contacts, auth, users, internal, health
+from src.services.auth import auth_service
+from src.services.avatars import avatar_executor
+from src.services.cache import user_cache
+from src.services.health import health_checker
+from src.services.mail_queue import mail_worker
+from src.services.rendering import email_templates
 
 app = FastAPI()
 
@@ -25,6 +28,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
+)
+# Contact pages of up to 500 rows shrink several times; tiny bodies are not worth the CPU.
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=config.GZIP_MINIMUM_SIZE,
+    compresslevel=config.GZIP_COMPRESS_LEVEL,
 )
 
 # BASE_DIR = Path(".")
@@ -37,17 +47,27 @@ app.mount("/static", StaticFiles(directory=directory), name="static")
 app.include_router(auth.router, prefix="/api")
 app.include_router(users.router, prefix="/api")
 app.include_router(contacts.router, prefix="/api")
+app.include_router(internal.router, prefix="/api")
+app.include_router(health.router, prefix="/api")
 
 
 @app.on_event("startup")
 async def startup():
-    r = await redis.Redis(
-        host=config.REDIS_DOMAIN,
-        port=config.REDIS_PORT,
-        db=0,
-        password=config.REDIS_PASSWORD,
-    )
-    await FastAPILimiter.init(r)
+    await user_cache.start()
+    email_templates.compile()
+    await mail_worker.start()
+    await health_checker.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await health_checker.stop()
+    await user_cache.stop()
+    await mail_worker.stop()
+    auth_service.hash_executor.shutdown()
+    avatar_executor.shutdown()
+    await redismanager.close()
+    await sessionmanager.close()
 
 
 templates = Jinja2Templates(directory=BASE_DIR / "src" / "templates")  # noqa
@@ -66,26 +86,21 @@ def index(request: Request):
 
 
 @app.get("/api/healthchecker")
-async def healthchecker(db: AsyncSession = Depends(get_db)):
+async def healthchecker():
     """
     Health Checker
 
-    :param db: database session
+    Answers from the last background check of the database instead of
+    querying it, see /api/health/ready.
+
     :return: health status
     :rtype: dict
     """
-    try:
-        # Make request
-        result = await db.execute(text("SELECT 1"))
-        result = result.fetchone()
-        if result is None:
-            raise HTTPException(
-                status_code=500, detail="Database is not configured correctly"
-            )
-        return {"message": "Welcome to FastAPI!"}
-    except Exception as e:
-        print(e)
+    _, checks = health_checker.ready()
+    if not checks["database"]["ok"]:
+        print(checks["database"]["error"])
         raise HTTPException(status_code=500, detail="Error connecting to the database")
+    return {"message": "Welcome to FastAPI!"}
 
 
 # if __name__ == "__main__":
@@ -0,0 +1,38 @@
+"""add contacts trigram indexes
+
+Revision ID: 5f1d7c2a9b3e
+Revises: 8b33ec432356
+Create Date: 2026-10-18 10:12:31.418207
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5f1d7c2a9b3e"
+down_revision: Union[str, None] = "8b33ec432356"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = ("name", "surname", "email")
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in SEARCH_COLUMNS:
+        op.create_index(
+            f"ix_contacts_{column}_trgm",
+            "contacts",
+            [column],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={column: "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    for column in SEARCH_COLUMNS:
+        op.drop_index(f"ix_contacts_{column}_trgm", table_name="contacts")
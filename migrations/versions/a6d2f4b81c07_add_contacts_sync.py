@@ -0,0 +1,54 @@
+"""add contacts sync
+
+Revision ID: a6d2f4b81c07
+Revises: d41c9e83a5f0
+Create Date: 2026-10-18 16:02:44.905113
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a6d2f4b81c07"
+down_revision: Union[str, None] = "d41c9e83a5f0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "contact_tombstones",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("contact_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("deleted_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_contact_tombstones_user_id_deleted_at",
+        "contact_tombstones",
+        ["user_id", "deleted_at"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_contacts_user_id_updated_at",
+        "contacts",
+        ["user_id", "updated_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_contacts_user_id_updated_at", table_name="contacts")
+    op.drop_index(
+        "ix_contact_tombstones_user_id_deleted_at", table_name="contact_tombstones"
+    )
+    op.drop_table("contact_tombstones")
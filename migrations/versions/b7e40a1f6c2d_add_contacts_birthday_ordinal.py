@@ -0,0 +1,42 @@
+"""add contacts birthday ordinal
+
+Revision ID: b7e40a1f6c2d
+Revises: 5f1d7c2a9b3e
+Create Date: 2026-10-18 11:03:54.902116
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e40a1f6c2d"
+down_revision: Union[str, None] = "5f1d7c2a9b3e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "contacts", sa.Column("birthday_ordinal", sa.Integer(), nullable=True)
+    )
+    op.execute(
+        "UPDATE contacts SET birthday_ordinal = "
+        "CAST(EXTRACT(MONTH FROM birthday) AS INTEGER) * 100 "
+        "+ CAST(EXTRACT(DAY FROM birthday) AS INTEGER) "
+        "WHERE birthday IS NOT NULL"
+    )
+    op.create_index(
+        op.f("ix_contacts_birthday_ordinal"),
+        "contacts",
+        ["birthday_ordinal"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_contacts_birthday_ordinal"), table_name="contacts")
+    op.drop_column("contacts", "birthday_ordinal")
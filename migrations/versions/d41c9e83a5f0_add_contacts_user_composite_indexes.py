@@ -0,0 +1,65 @@
+"""add contacts user composite indexes
+
+Revision ID: d41c9e83a5f0
+Revises: b7e40a1f6c2d
+Create Date: 2026-10-18 14:21:07.318542
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d41c9e83a5f0"
+down_revision: Union[str, None] = "b7e40a1f6c2d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.drop_index(op.f("ix_contacts_email"), table_name="contacts")
+    op.drop_index(op.f("ix_contacts_phone"), table_name="contacts")
+    op.drop_index(op.f("ix_contacts_name"), table_name="contacts")
+    op.drop_index(op.f("ix_contacts_surname"), table_name="contacts")
+    op.drop_index(op.f("ix_contacts_birthday_ordinal"), table_name="contacts")
+    op.create_index(
+        "ix_contacts_user_id_id", "contacts", ["user_id", "id"], unique=False
+    )
+    op.create_index(
+        "ix_contacts_user_id_surname_name",
+        "contacts",
+        ["user_id", "surname", "name"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_contacts_user_id_birthday_ordinal",
+        "contacts",
+        ["user_id", "birthday_ordinal"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_contacts_user_id_email", "contacts", ["user_id", "email"], unique=True
+    )
+    op.create_index(
+        "ix_contacts_user_id_phone", "contacts", ["user_id", "phone"], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_contacts_user_id_phone", table_name="contacts")
+    op.drop_index("ix_contacts_user_id_email", table_name="contacts")
+    op.drop_index("ix_contacts_user_id_birthday_ordinal", table_name="contacts")
+    op.drop_index("ix_contacts_user_id_surname_name", table_name="contacts")
+    op.drop_index("ix_contacts_user_id_id", table_name="contacts")
+    op.create_index(
+        op.f("ix_contacts_birthday_ordinal"),
+        "contacts",
+        ["birthday_ordinal"],
+        unique=False,
+    )
+    op.create_index(op.f("ix_contacts_surname"), "contacts", ["surname"], unique=False)
+    op.create_index(op.f("ix_contacts_name"), "contacts", ["name"], unique=False)
+    op.create_index(op.f("ix_contacts_phone"), "contacts", ["phone"], unique=True)
+    op.create_index(op.f("ix_contacts_email"), "contacts", ["email"], unique=True)
@@ -2,3 +2,8 @@ ACCOUNT_EXIST = "Account already exists"
 USER_NOT_CONFIRMED = "Verification error"
 INVALID_PASSWORD = "Invalid password"
 INVALID_EMAIL = "Invalid email"
+SERVICE_BUSY = "Service is busy, try again later"
+AVATAR_TOO_LARGE = "Avatar file is too large"
+INVALID_IMAGE = "File is not a valid image"
+CONTACT_EXISTS = "Email or phone is already used by another contact"
+TOO_MANY_REQUESTS = "Too many requests, try again later"
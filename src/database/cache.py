@@ -0,0 +1,36 @@
+import redis.asyncio as redis
+
+from src.conf.config import config
+
+
+class RedisConnectionManager:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        password: str | None = None,
+        max_connections: int | None = None,
+    ):
+        self._pool: redis.ConnectionPool = redis.ConnectionPool(
+            host=host,
+            port=port,
+            db=0,
+            password=password,
+            max_connections=max_connections,
+        )
+        self._client: redis.Redis = redis.Redis(connection_pool=self._pool)
+
+    @property
+    def client(self) -> redis.Redis:
+        return self._client
+
+    async def close(self):
+        await self._pool.disconnect()
+
+
+redismanager = RedisConnectionManager(
+    host=config.REDIS_DOMAIN,
+    port=config.REDIS_PORT,
+    password=config.REDIS_PASSWORD,
+    max_connections=config.REDIS_MAX_CONNECTIONS,
+)
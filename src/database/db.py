@@ -1,5 +1,12 @@
 import contextlib
+import time
 
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     AsyncEngine,
@@ -10,29 +17,188 @@ from sqlalchemy.ext.asyncio import (
 from src.conf.config import config
 
 
+def engine_options(url: str) -> dict:
+    """
+    The engine_options function builds the pool and driver settings for create_async_engine from the application config. SQLite urls (used by the tests) get no pool settings, since their pools do not accept them.
+
+    :param url: str: The database url
+    :return: Keyword arguments for create_async_engine
+    :doc-author: Trelent
+    """
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        return {}
+    options = {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+    if backend == "postgresql":
+        options["connect_args"] = {
+            "prepared_statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+            "command_timeout": config.DB_COMMAND_TIMEOUT,
+            "timeout": config.DB_CONNECT_TIMEOUT,
+        }
+    return options
+
+
+class PoolStats:
+    def __init__(self):
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        self.waits += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def instrument(self, pool) -> None:
+        @event.listens_for(pool, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            self.checkouts += 1
+
+        @event.listens_for(pool, "checkin")
+        def on_checkin(dbapi_connection, connection_record):
+            self.checkins += 1
+
+        @event.listens_for(pool, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            self.connects += 1
+            if getattr(pool, "overflow", lambda: 0)() > 0:
+                self.overflow_events += 1
+
+    def snapshot(self, pool) -> dict:
+        return {
+            "status": pool.status(),
+            "size": getattr(pool, "size", lambda: None)(),
+            "checked_out": getattr(pool, "checkedout", lambda: None)(),
+            "overflow": getattr(pool, "overflow", lambda: None)(),
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "connects": self.connects,
+            "overflow_events": self.overflow_events,
+            "timeouts": self.timeouts,
+            "wait_ms": {
+                "count": self.waits,
+                "avg": self.wait_total / self.waits * 1000 if self.waits else 0.0,
+                "max": self.wait_max * 1000,
+            },
+        }
+
+
+AFTER_COMMIT = "after_commit"
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], Awaitable]) -> None:
+    """
+    The after_commit function schedules a coroutine to run once the session's unit of work has really been committed, for side effects such as cache invalidation that must not be seen before the data is. Nothing runs if the work is rolled back.
+
+    :param session: AsyncSession: The session doing the work
+    :param callback: Callable[[], Awaitable]: Called without arguments after the commit
+    :return: None
+    :doc-author: Trelent
+    """
+    session.info.setdefault(AFTER_COMMIT, []).append(callback)
+
+
 class DatabaseSessionManager:
-    def __init__(self, url: str):
-        self._engine: AsyncEngine | None = create_async_engine(url)
+    def __init__(self, url: str, **engine_kwargs):
+        self._engine: AsyncEngine | None = create_async_engine(url, **engine_kwargs)
         self._session_maker: async_sessionmaker = async_sessionmaker(
-            autoflush=False, autocommit=False, bind=self._engine
+            autoflush=False,
+            autocommit=False,
+            expire_on_commit=False,
+            join_transaction_mode="rollback_only",
         )
+        self.stats = PoolStats()
+        self.stats.instrument(self._engine.sync_engine.pool)
+
+    @property
+    def engine(self) -> AsyncEngine:
+        return self._engine
+
+    def pool_stats(self) -> dict:
+        return self.stats.snapshot(self._engine.sync_engine.pool)
+
+    async def close(self):
+        await self._engine.dispose()
+
+    @staticmethod
+    async def _finish(session: AsyncSession, connection, commit: bool):
+        callbacks = session.info.pop(AFTER_COMMIT, [])
+        if commit:
+            await session.commit()
+            await connection.commit()
+            for callback in callbacks:
+                await callback()
+        else:
+            await session.rollback()
+            await connection.rollback()
 
     @contextlib.asynccontextmanager
     async def session(self):
+        """
+        The session function is a unit of work on exactly one pooled connection. The session joins a transaction opened on that connection, so commits made inside (for example by the repository functions) only flush; the transaction is committed once the block succeeds and rolled back if it raises. A 4xx HTTPException is a deliberate answer rather than a failure, so the work done before it is kept. Callbacks registered with after_commit run after a successful commit.
+
+        :param self: Represent the instance of the class
+        :return: An AsyncSession bound to the checked out connection
+        :doc-author: Trelent
+        """
         if self._session_maker is None:
             raise Exception("Session maker is not defined")
-        session = self._session_maker()
+        started = time.perf_counter()
         try:
-            yield session
-        except:
-            await session.rollback()
+            connection = await self._engine.connect()
+        except PoolTimeoutError:
+            self.stats.timeouts += 1
+            raise
+        self.stats.record_wait(time.perf_counter() - started)
+        try:
+            await connection.begin()
+            session = self._session_maker(bind=connection)
+            try:
+                yield session
+            except HTTPException as err:
+                await self._finish(session, connection, commit=err.status_code < 500)
+                raise
+            except Exception:
+                await self._finish(session, connection, commit=False)
+                raise
+            else:
+                await self._finish(session, connection, commit=True)
+            finally:
+                await session.close()
         finally:
-            await session.close()
+            await connection.close()
 
 
-sessionmanager = DatabaseSessionManager(config.DB_URL)
+sessionmanager = DatabaseSessionManager(config.DB_URL, **engine_options(config.DB_URL))
 
 
 async def get_db():
+    """
+    The get_db function is a FastAPI dependency that gives every request its own session on one pooled connection, committed when the request succeeds and rolled back when it fails.
+
+    :return: An AsyncSession for the current request
+    :doc-author: Trelent
+    """
     async with sessionmanager.session() as session:
-        return session
+        yield session
+
+
+def get_sessionmanager() -> DatabaseSessionManager:
+    """
+    The get_sessionmanager function is a FastAPI dependency for routes that must open their own session, such as streaming responses whose body is produced after the request's dependencies have been closed.
+
+    :return: The application's session manager
+    :doc-author: Trelent
+    """
+    return sessionmanager
@@ -1,8 +1,18 @@
 import enum
 
 from datetime import date
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Date, Integer, ForeignKey, DateTime, func, Enum, Boolean
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
+from sqlalchemy import (
+    String,
+    Date,
+    Integer,
+    ForeignKey,
+    DateTime,
+    func,
+    Enum,
+    Boolean,
+    Index,
+)
 from sqlalchemy.orm import DeclarativeBase
 
 
@@ -10,14 +20,51 @@ class Base(DeclarativeBase):
     pass
 
 
+def birthday_ordinal(birthday: date | str | None) -> int | None:
+    """
+    The birthday_ordinal function maps a date to month * 100 + day, e.g. 1 March -> 301. The value ignores the year, so it orders birthdays within a year and can be range-scanned through an index.
+
+    :param birthday: date | str | None: The birthday, as a date or an ISO string
+    :return: The ordinal, or None if there is no birthday
+    :doc-author: Trelent
+    """
+    if birthday is None:
+        return None
+    if isinstance(birthday, str):
+        birthday = date.fromisoformat(birthday)
+    return birthday.month * 100 + birthday.day
+
+
+def trigram_index(column: str) -> Index:
+    return Index(
+        f"ix_contacts_{column}_trgm",
+        column,
+        postgresql_using="gin",
+        postgresql_ops={column: "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql")
+
+
 class Contact(Base):
     __tablename__ = "contacts"
+    __table_args__ = (
+        # Every user-facing query filters by owner first, so the owner leads each index.
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+        Index("ix_contacts_user_id_surname_name", "user_id", "surname", "name"),
+        Index("ix_contacts_user_id_birthday_ordinal", "user_id", "birthday_ordinal"),
+        Index("ix_contacts_user_id_email", "user_id", "email", unique=True),
+        Index("ix_contacts_user_id_phone", "user_id", "phone", unique=True),
+        Index("ix_contacts_user_id_updated_at", "user_id", "updated_at"),
+        trigram_index("name"),
+        trigram_index("surname"),
+        trigram_index("email"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
-    name: Mapped[str] = mapped_column(String(25), index=True)
-    surname: Mapped[str] = mapped_column(String(50), index=True)
-    email: Mapped[str] = mapped_column(String(320), unique=True, index=True)
-    phone: Mapped[str] = mapped_column(String(15), unique=True, index=True)
+    name: Mapped[str] = mapped_column(String(25))
+    surname: Mapped[str] = mapped_column(String(50))
+    email: Mapped[str] = mapped_column(String(320))
+    phone: Mapped[str] = mapped_column(String(15))
     birthday: Mapped[Date] = mapped_column(Date, nullable=True)
+    birthday_ordinal: Mapped[int] = mapped_column(Integer, nullable=True)
     notes: Mapped[str] = mapped_column(String(500), nullable=True)
     created_at: Mapped[date] = mapped_column(
         "created_at", DateTime, default=func.now(), nullable=True
@@ -26,7 +73,28 @@ class Contact(Base):
         "updated_at", DateTime, default=func.now(), onupdate=func.now(), nullable=True
     )
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)
-    user: Mapped["User"] = relationship("User", backref="contacts", lazy="joined")
+    user: Mapped["User"] = relationship("User", backref="contacts", lazy="raise")
+
+    @validates("birthday")
+    def validate_birthday(self, key, birthday):
+        self.birthday_ordinal = birthday_ordinal(birthday)
+        return birthday
+
+
+class ContactTombstone(Base):
+    """
+    One row per deleted contact, so that a client syncing changes since some
+    time also learns which of its contacts are gone.
+    """
+
+    __tablename__ = "contact_tombstones"
+    __table_args__ = (
+        Index("ix_contact_tombstones_user_id_deleted_at", "user_id", "deleted_at"),
+    )
+    id: Mapped[int] = mapped_column(primary_key=True)
+    contact_id: Mapped[int] = mapped_column(Integer)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=True)
+    deleted_at: Mapped[date] = mapped_column("deleted_at", DateTime, default=func.now())
 
 
 class Role(enum.Enum):
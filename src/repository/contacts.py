@@ -1,39 +1,134 @@
-from datetime import date, timedelta
+import base64
+import binascii
+import functools
 
-from sqlalchemy import select, and_, or_, extract
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import (
+    select,
+    insert,
+    update,
+    delete,
+    or_,
+    func,
+    case,
+    literal,
+    DateTime,
+)
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from src.database.db import after_commit
+from src.conf.config import config
+from src.entity.models import Contact, ContactTombstone, User, birthday_ordinal
+from src.schemas.contact import (
+    ContactSchema,
+    ContactUpdateSchema,
+    ContactPatchSchema,
+    ContactBatchPatch,
+)
+from src.services.cache import contact_versions
+
+
+def encode_cursor(contact_id: int) -> str:
+    """
+    The encode_cursor function turns the id of the last contact on a page into an opaque cursor for the next page.
+
+    :param contact_id: int: Id of the last contact on the page
+    :return: The cursor
+    :doc-author: Trelent
+    """
+    return base64.urlsafe_b64encode(f"id:{contact_id}".encode()).decode().rstrip("=")
 
-from src.entity.models import Contact, User
-from src.schemas.contact import ContactSchema, ContactUpdateSchema
 
+def decode_cursor(cursor: str) -> int:
+    """
+    The decode_cursor function reads the contact id back from a cursor made by encode_cursor.
 
-async def get_contacts(limit: int, offset: int, db: AsyncSession, user: User):
+    :param cursor: str: The cursor from the previous page
+    :return: Id of the last contact already returned
+    :raises ValueError: If the cursor is malformed
+    :doc-author: Trelent
     """
-    The get_contacts function returns a list of contacts for the user.
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError) as err:
+        raise ValueError("Invalid cursor") from err
+    prefix, _, contact_id = raw.partition(":")
+    if prefix != "id" or not contact_id.isdigit():
+        raise ValueError("Invalid cursor")
+    return int(contact_id)
+
+
+def _paginate(statement, limit: int, offset: int, after_id: int | None):
+    statement = statement.order_by(Contact.id).limit(limit)
+    if after_id is not None:
+        return statement.filter(Contact.id > after_id)
+    return statement.offset(offset)
+
+
+def _contacts_changed(db: AsyncSession, user: User) -> None:
+    # Readers must not see the new version before the data behind it is committed.
+    after_commit(db, functools.partial(contact_versions.bump, user.id))
+
+
+def _attach_owner(contacts, user: User, lean: bool = False):
+    # The owner is already in hand, so it is set on each row instead of joined in.
+    if not lean:
+        for contact in contacts:
+            set_committed_value(contact, "user", user)
+    return contacts
+
+
+async def get_contacts(
+    limit: int,
+    offset: int,
+    db: AsyncSession,
+    user: User,
+    after_id: int | None = None,
+    lean: bool = False,
+):
+    """
+    The get_contacts function returns a page of contacts for the user, ordered by id. With after_id the page starts right after that contact (keyset pagination), so late pages cost the same as the first one; otherwise offset is used.
 
     :param limit: int: Specify the number of contacts to return
     :param offset: int: Specify the offset of the query
     :param db: AsyncSession: Pass in the database session
     :param user: User: Filter the contacts by user
+    :param after_id: int | None: Id of the last contact of the previous page
+    :param lean: bool: Leave the owner off the contacts
     :return: A list of contacts
     :doc-author: Trelent
     """
-    statement = select(Contact).filter_by(user=user).offset(offset).limit(limit)
+    statement = _paginate(
+        select(Contact).filter_by(user_id=user.id), limit, offset, after_id
+    )
     contacts = await db.execute(statement)
-    return contacts.scalars().all()
+    return _attach_owner(contacts.scalars().all(), user, lean)
 
 
-async def get_all_contacts(limit: int, offset: int, db: AsyncSession):
+async def get_all_contacts(
+    limit: int,
+    offset: int,
+    db: AsyncSession,
+    after_id: int | None = None,
+    lean: bool = False,
+):
     """
-    The get_all_contacts function returns a list of all contacts in the database.
+    The get_all_contacts function returns a page of all contacts in the database, ordered by id, using either keyset pagination (after_id) or offset. The owners are loaded with one extra IN query for the whole page, or not at all in lean mode.
 
     :param limit: int: Limit the number of contacts returned
     :param offset: int: Skip the first offset number of rows
     :param db: AsyncSession: Pass in the database session to be used
+    :param after_id: int | None: Id of the last contact of the previous page
+    :param lean: bool: Leave the owners off the contacts
     :return: A list of contact objects
     :doc-author: Trelent
     """
-    statement = select(Contact).offset(offset).limit(limit)
+    owner = raiseload(Contact.user) if lean else selectinload(Contact.user)
+    statement = _paginate(select(Contact).options(owner), limit, offset, after_id)
     contacts = await db.execute(statement)
     return contacts.scalars().all()
 
@@ -48,14 +143,17 @@ async def get_contact(contact_id: int, db: AsyncSession, user: User):
     :return: A single contact
     :doc-author: Trelent
     """
-    statement = select(Contact).filter_by(id=contact_id, user=user)
+    statement = select(Contact).filter_by(id=contact_id, user_id=user.id)
     contact = await db.execute(statement)
-    return contact.scalar_one_or_none()
+    contact = contact.scalar_one_or_none()
+    if contact:
+        _attach_owner([contact], user)
+    return contact
 
 
 async def create_contact(body: ContactSchema, db: AsyncSession, user: User):
     """
-    The create_contact function creates a new contact in the database.
+    The create_contact function creates a new contact in the database. The INSERT runs in a savepoint, so a unique email/phone clash leaves the request's transaction usable.
 
     :param body: ContactSchema: Validate the data passed in by the user
     :param db: AsyncSession: Pass the database session to the function
@@ -63,108 +161,377 @@ async def create_contact(body: ContactSchema, db: AsyncSession, user: User):
     :return: A contact instance
     :doc-author: Trelent
     """
-    contact = Contact(**body.model_dump(exclude_unset=True), user=user)
-    db.add(contact)
+    contact = Contact(**body.model_dump(exclude_unset=True), user_id=user.id)
+    async with db.begin_nested():
+        db.add(contact)
+        await db.flush()
+    _contacts_changed(db, user)
     await db.commit()
     await db.refresh(contact)
+    _attach_owner([contact], user)
     return contact
 
 
+async def insert_contacts(rows: list[dict], db: AsyncSession, user: User) -> set[str]:
+    """
+    The insert_contacts function inserts a batch of already validated contacts for the user with multi-row INSERT statements. Rows that clash with an existing contact of the user (same email or phone) are skipped by ON CONFLICT DO NOTHING instead of failing the batch.
+
+    :param rows: list[dict]: Contact fields, one dict per contact
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Owner of the new contacts
+    :return: The emails of the contacts that were actually inserted
+    :doc-author: Trelent
+    """
+    if not rows:
+        return set()
+    values = [
+        dict(
+            row,
+            birthday_ordinal=birthday_ordinal(row.get("birthday")),
+            user_id=user.id,
+        )
+        for row in rows
+    ]
+    dialect = postgresql if _dialect_name(db) == "postgresql" else sqlite
+    table = Contact.__table__
+    statement = dialect.insert(table).on_conflict_do_nothing().returning(table.c.email)
+    # Executed with a parameter list, the driver sends multi-row VALUES batches.
+    result = await db.execute(statement, values)
+    inserted = set(result.scalars())
+    if inserted:
+        _contacts_changed(db, user)
+    await db.commit()
+    return inserted
+
+
 async def update_contact(
-    contact_id: int, body: ContactUpdateSchema, db: AsyncSession, user: User
+    contact_id: int,
+    body: ContactUpdateSchema | ContactPatchSchema,
+    db: AsyncSession,
+    user: User,
 ):
     """
-    The update_contact function updates a contact in the database.
+    The update_contact function updates a contact in the database with a single UPDATE ... RETURNING statement. A full (PUT) body replaces every field, leaving out optional ones clears them; a partial (PATCH) body writes only the fields it sets and leaves the other columns untouched. The statement runs in a savepoint, so a unique email/phone clash leaves the request's transaction usable.
 
     :param contact_id: int: Identify the contact to be updated
-    :param body: ContactUpdateSchema: Get the contact information from the request body
+    :param body: ContactUpdateSchema | ContactPatchSchema: The full or partial contact
     :param db: AsyncSession: Pass in the database session to the function
     :param user: User: Ensure that the user is only updating their own contacts
-    :return: The updated contact
+    :return: The updated contact, or None if the user has no such contact
     :doc-author: Trelent
     """
-    statement = select(Contact).filter_by(id=contact_id, user=user)
-    result = await db.execute(statement)
-    contact = result.scalar_one_or_none()
+    values = body.model_dump(exclude_unset=isinstance(body, ContactPatchSchema))
+    if not values:
+        return await get_contact(contact_id, db, user)
+    if "birthday" in values:
+        values["birthday_ordinal"] = birthday_ordinal(values["birthday"])
+    statement = (
+        update(Contact)
+        .filter_by(id=contact_id, user_id=user.id)
+        .values(**values)
+        .returning(Contact)
+    )
+    async with db.begin_nested():
+        result = await db.execute(statement)
+        contact = result.scalar_one_or_none()
     if contact:
-        contact.name = body.name
-        contact.surname = body.surname
-        contact.email = body.email
-        contact.phone = body.phone
-        contact.birthday = body.birthday
-        contact.notes = body.notes
+        _attach_owner([contact], user)
+        _contacts_changed(db, user)
         await db.commit()
-        await db.refresh(contact)
     return contact
 
 
+async def _record_deletions(ids: list[int], db: AsyncSession, user: User) -> None:
+    await db.execute(
+        insert(ContactTombstone),
+        [{"contact_id": contact_id, "user_id": user.id} for contact_id in ids],
+    )
+
+
 async def delete_contact(contact_id: int, db: AsyncSession, user: User):
     """
-    The delete_contact function deletes a contact from the database.
+    The delete_contact function deletes a contact from the database with a single DELETE ... RETURNING statement and leaves a tombstone for clients that sync.
 
     :param contact_id: int: Specify the contact to delete
     :param db: AsyncSession: Pass the database session to the function
     :param user: User: Get the user from the database
-    :return: The contact that was deleted
+    :return: The contact that was deleted, or None if the user has no such contact
     :doc-author: Trelent
     """
-    statement = select(Contact).filter_by(id=contact_id, user=user)
-    contact = await db.execute(statement)
-    contact = contact.scalar_one_or_none()
+    statement = (
+        delete(Contact).filter_by(id=contact_id, user_id=user.id).returning(Contact)
+    )
+    result = await db.execute(statement)
+    contact = result.scalar_one_or_none()
     if contact:
-        await db.delete(contact)
+        _attach_owner([contact], user)
+        await _record_deletions([contact.id], db, user)
+        _contacts_changed(db, user)
         await db.commit()
     return contact
 
 
-async def search_contacts(query: str, db: AsyncSession, user: User):
+async def get_contacts_by_ids(
+    ids: list[int], db: AsyncSession, user: User
+) -> dict[int, Contact]:
+    """
+    The get_contacts_by_ids function loads several of the user's contacts with one IN query.
+
+    :param ids: list[int]: Ids of the contacts
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Only the user's own contacts are returned
+    :return: The contacts found, by id
+    :doc-author: Trelent
+    """
+    statement = select(Contact).filter(Contact.id.in_(ids)).filter_by(user_id=user.id)
+    contacts = await db.execute(statement)
+    return {contact.id: contact for contact in contacts.scalars().all()}
+
+
+async def update_contacts(
+    patches: list[ContactBatchPatch], db: AsyncSession, user: User
+) -> dict[int, Contact]:
+    """
+    The update_contacts function applies a different partial update to each of several contacts in one UPDATE ... RETURNING statement. Every changed column is set through a CASE on the contact id, so rows keep the columns their own patch leaves out. The statement runs in a savepoint, so a unique email/phone clash leaves the request's transaction usable.
+
+    :param patches: list[ContactBatchPatch]: One patch per contact, each with its id
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Only the user's own contacts are updated
+    :return: The updated contacts, by id
+    :doc-author: Trelent
+    """
+    ids = [patch.id for patch in patches]
+    columns: dict[str, dict[int, object]] = {}
+    for patch in patches:
+        for key, value in patch.model_dump(exclude_unset=True, exclude={"id"}).items():
+            columns.setdefault(key, {})[patch.id] = value
+    if not columns:
+        return await get_contacts_by_ids(ids, db, user)
+    if "birthday" in columns:
+        columns["birthday_ordinal"] = {
+            contact_id: birthday_ordinal(birthday)
+            for contact_id, birthday in columns["birthday"].items()
+        }
+    values = {
+        key: case(by_id, value=Contact.id, else_=getattr(Contact, key))
+        for key, by_id in columns.items()
+    }
+    statement = (
+        update(Contact)
+        .filter(Contact.id.in_(ids))
+        .filter_by(user_id=user.id)
+        .values(**values)
+        .returning(Contact)
+        .execution_options(synchronize_session=False)
+    )
+    async with db.begin_nested():
+        result = await db.execute(statement)
+        contacts = result.scalars().all()
+    if contacts:
+        _contacts_changed(db, user)
+    await db.commit()
+    return {contact.id: contact for contact in contacts}
+
+
+async def delete_contacts(ids: list[int], db: AsyncSession, user: User) -> set[int]:
+    """
+    The delete_contacts function deletes several of the user's contacts with one DELETE ... RETURNING statement and leaves a tombstone for each of them.
+
+    :param ids: list[int]: Ids of the contacts to delete
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Only the user's own contacts are deleted
+    :return: The ids that were deleted
+    :doc-author: Trelent
+    """
+    statement = (
+        delete(Contact)
+        .filter(Contact.id.in_(ids))
+        .filter_by(user_id=user.id)
+        .returning(Contact.id)
+    )
+    result = await db.execute(statement)
+    deleted = set(result.scalars())
+    if deleted:
+        await _record_deletions(sorted(deleted), db, user)
+        _contacts_changed(db, user)
+    await db.commit()
+    return deleted
+
+
+async def get_contact_changes(
+    since: datetime | None, db: AsyncSession, user: User
+) -> tuple[list[Contact], list[int], datetime]:
     """
-    The search_contacts function searches the database for contacts that match a given query.
+    The get_contact_changes function returns what changed in the user's contacts since a watermark: the contacts updated after it and the ids of the contacts deleted after it, both read through (user_id, time) indexes. Without a watermark every contact is returned and nothing is reported deleted. Changes up to CONTACTS_SYNC_OVERLAP seconds older than the watermark are returned again, so that a write whose transaction started before the previous sync but committed after it is not missed; clients apply changes idempotently.
+
+    :param since: datetime | None: The watermark returned by the previous sync
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Only the user's own contacts are returned
+    :return: The changed contacts, the deleted ids and the new watermark
+    :doc-author: Trelent
+    """
+    dialect = _dialect_name(db)
+    # The columns hold the database's local time without a zone; read it the same way.
+    clock = func.localtimestamp() if dialect == "postgresql" else func.now()
+    watermark = (await db.execute(select(clock))).scalar_one()
+    statement = select(Contact).filter_by(user_id=user.id)
+    if since is None:
+        contacts = await db.execute(statement.order_by(Contact.id))
+        return list(contacts.scalars().all()), [], watermark
+    start = _database_time(since, dialect) - timedelta(
+        seconds=config.CONTACTS_SYNC_OVERLAP
+    )
+    contacts = await db.execute(
+        statement.filter(Contact.updated_at > start).order_by(
+            Contact.updated_at, Contact.id
+        )
+    )
+    deleted = await db.execute(
+        select(ContactTombstone.contact_id)
+        .filter_by(user_id=user.id)
+        .filter(ContactTombstone.deleted_at > start)
+        .distinct()
+    )
+    return list(contacts.scalars().all()), sorted(deleted.scalars()), watermark
+
+
+EXPORT_COLUMNS = (
+    Contact.id,
+    Contact.name,
+    Contact.surname,
+    Contact.email,
+    Contact.phone,
+    Contact.birthday,
+    Contact.notes,
+    Contact.created_at,
+    Contact.updated_at,
+    Contact.user_id,
+)
+
+
+async def stream_all_contacts(db: AsyncSession, batch_size: int):
+    """
+    The stream_all_contacts function walks every contact in the database through a server-side cursor, batch_size rows at a time. Plain rows are fetched instead of ORM objects, so nothing accumulates in the session and memory stays flat however large the table is.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :param batch_size: int: Rows fetched from the cursor at a time
+    :return: An async iterator of row batches, ordered by id
+    :doc-author: Trelent
+    """
+    statement = (
+        select(*EXPORT_COLUMNS)
+        .order_by(Contact.id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await db.stream(statement)
+    async for rows in result.partitions():
+        yield rows
+
+
+SEARCH_COLUMNS = (Contact.name, Contact.surname, Contact.email)
+
+
+def _dialect_name(db: AsyncSession) -> str:
+    return db.get_bind().dialect.name
+
+
+def _database_time(moment: datetime, dialect: str):
+    """
+    The _database_time function brings a watermark into the zone the time columns are written in, so it compares with them. A naive watermark is taken as already being in it. Postgres writes the session's local time, so an aware watermark is converted there by the database itself; SQLite writes UTC.
+
+    :param moment: datetime: The watermark to convert
+    :param dialect: str: Name of the database dialect
+    :return: The watermark as a naive time, or an expression computing it
+    :doc-author: Trelent
+    """
+    if moment.tzinfo is None:
+        return moment
+    if dialect == "postgresql":
+        return func.timezone(
+            func.current_setting("TimeZone"), literal(moment, DateTime(timezone=True))
+        )
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _like_pattern(query: str) -> str:
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _search_rank(query: str, dialect: str):
+    if dialect == "postgresql":
+        # pg_trgm similarity, served by the gin_trgm_ops indexes on these columns.
+        return func.greatest(
+            *(func.similarity(column, query) for column in SEARCH_COLUMNS)
+        )
+    # Portable fallback (SQLite in tests): exact match, then prefix, then substring.
+    lowered = query.lower()
+    return case(
+        *((func.lower(column) == lowered, 1.0) for column in SEARCH_COLUMNS),
+        *(
+            (func.lower(column).startswith(lowered, autoescape=True), 0.5)
+            for column in SEARCH_COLUMNS
+        ),
+        else_=0.0,
+    )
+
+
+async def search_contacts(
+    query: str, db: AsyncSession, user: User, limit: int = 50, lean: bool = False
+):
+    """
+    The search_contacts function searches the user's contacts by name, surname and email and returns the best matches first. On PostgreSQL the ILIKE predicates are served by pg_trgm GIN indexes and results are ranked by trigram similarity; other databases fall back to exact, prefix and substring ranking.
 
     :param query: str: Search for contacts in the database
     :param db: AsyncSession: Pass in the database session
     :param user: User: Get the user's id
-    :return: A list of contacts that match the query
+    :param limit: int: Maximum number of contacts to return
+    :param lean: bool: Leave the owner off the contacts
+    :return: A list of contacts that match the query, most relevant first
     :doc-author: Trelent
     """
+    pattern = _like_pattern(query)
+    rank = _search_rank(query, _dialect_name(db))
     statement = (
         select(Contact)
-        .filter(
-            or_(
-                Contact.name.ilike(f"%{query}%"),
-                Contact.surname.ilike(f"%{query}%"),
-                Contact.email.ilike(f"%{query}%"),
-            )
-        )
-        .filter_by(user=user)
+        .filter(or_(*(column.ilike(pattern, escape="\\") for column in SEARCH_COLUMNS)))
+        .filter_by(user_id=user.id)
+        .order_by(rank.desc(), Contact.id)
+        .limit(limit)
     )
     contacts = await db.execute(statement)
-    return contacts.scalars().all()
+    return _attach_owner(contacts.scalars().all(), user, lean)
 
 
-async def congrats(db: AsyncSession, user: User):
+async def congrats(db: AsyncSession, user: User, days: int = 7, lean: bool = False):
     """
-    The congrats function searches the database for contacts whose birthday is within a week of today.
+    The congrats function searches the database for contacts whose birthday is within the given number of days from today, soonest first. It is a range scan over the indexed birthday_ordinal column and wraps correctly at the end of the year.
 
     :param db: AsyncSession: Pass the database session to the function
     :param user: User: Pass the user object to the function
-    :return: A list of contacts who have a birthday in the next week
+    :param days: int: Size of the window in days
+    :param lean: bool: Leave the owner off the contacts
+    :return: A list of contacts who have a birthday in the window
     :doc-author: Trelent
     """
-    current_date = date.today()
-    next_week = current_date + timedelta(days=7)
+    today = date.today()
+    start = birthday_ordinal(today)
+    end = birthday_ordinal(today + timedelta(days=days))
+    ordinal = Contact.birthday_ordinal
+
+    if days >= 365:
+        window = ordinal.is_not(None)
+    elif start <= end:
+        window = ordinal.between(start, end)
+    else:
+        # The window crosses New Year: late December or early January.
+        window = or_(ordinal >= start, ordinal <= end)
 
     statement = (
         select(Contact)
-        .filter(
-            and_(
-                extract("month", Contact.birthday) >= current_date.month,
-                extract("day", Contact.birthday) >= current_date.day,
-                extract("month", Contact.birthday) <= next_week.month,
-                extract("day", Contact.birthday) <= next_week.day,
-            )
-        )
-        .filter_by(user=user)
+        .filter(window)
+        .filter_by(user_id=user.id)
+        .order_by(case((ordinal >= start, 0), else_=1), ordinal, Contact.id)
     )
     contacts = await db.execute(statement)
-    return contacts.scalars().all()
+    return _attach_owner(contacts.scalars().all(), user, lean)
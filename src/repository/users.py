@@ -1,11 +1,19 @@
+import functools
+
 from fastapi import Depends
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from libgravatar import Gravatar
 
-from src.database.db import get_db
+from src.database.db import after_commit, get_db
 from src.entity.models import User
 from src.schemas.user import UserSchema
+from src.services.cache import user_cache
+
+
+def _user_changed(db: AsyncSession, email: str) -> None:
+    # Evicting before the commit would let a concurrent request cache the old row again.
+    after_commit(db, functools.partial(user_cache.invalidate, email))
 
 
 async def get_user_by_email(email: str, db: AsyncSession = Depends(get_db)):
@@ -57,6 +65,7 @@ async def update_token(user: User, token: str | None, db: AsyncSession):
     :doc-author: Trelent
     """
     user.refresh_token = token
+    _user_changed(db, user.email)
     await db.commit()
 
 
@@ -72,6 +81,7 @@ async def confirmed_email(email: str, db: AsyncSession) -> None:
     """
     user = await get_user_by_email(email, db)
     user.confirmed = True
+    _user_changed(db, email)
     await db.commit()
 
 
@@ -87,6 +97,7 @@ async def update_avatar_url(email: str, url: str | None, db: AsyncSession) -> Us
     """
     user = await get_user_by_email(email, db)
     user.avatar = url
+    _user_changed(db, email)
     await db.commit()
     await db.refresh(user)
     return user
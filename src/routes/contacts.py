@@ -1,40 +1,204 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Path, Query
+from datetime import date, datetime
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    status,
+    Path,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.db import get_db
+from src.conf import messages
+from src.database.db import DatabaseSessionManager, get_db, get_sessionmanager
 from src.entity.models import User, Role
 from src.repository import contacts as repositories_contacts
-from src.schemas.contact import ContactSchema, ContactUpdateSchema, ContactResponse
+from src.schemas.contact import (
+    ContactSchema,
+    ContactUpdateSchema,
+    ContactPatchSchema,
+    ContactResponse,
+    ContactLeanResponse,
+    ContactImportReport,
+    ContactBatchIds,
+    ContactBatchUpdate,
+    ContactBatchItem,
+    ContactBatchResponse,
+    ContactSyncResponse,
+)
+from src.services import contacts_export, contacts_import
 from src.services.auth import auth_service
+from src.services.cache import contact_versions, contacts_cache
+from src.services.etag import etag_matches, make_etag, not_modified
 from src.services.roles import RoleAccess
 
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
 access_to_route_all = RoleAccess([Role.admin, Role.moderator])
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def cursor_to_id(cursor: str | None) -> int | None:
+    if cursor is None:
+        return None
+    try:
+        return repositories_contacts.decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def set_next_cursor(response: Response, contacts: list, limit: int) -> None:
+    if len(contacts) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = repositories_contacts.encode_cursor(
+            contacts[-1].id
+        )
+
+
+def owner_state(user: User) -> str:
+    """
+    The owner_state function sums up the fields of the owner that a full contact embeds, so that representations depending on them change when the owner does (a new avatar, another role) even though no contact did.
+
+    :param user: User: The owner of the contacts
+    :return: The embedded owner fields, joined
+    :doc-author: Trelent
+    """
+    return f"{user.username}:{user.email}:{user.avatar}:{user.role}"
+
+
+lean_contacts = TypeAdapter(list[ContactLeanResponse])
+full_contacts = TypeAdapter(list[ContactResponse])
+
+
+def dump_contacts(contacts: list, lean: bool) -> bytes:
+    adapter = lean_contacts if lean else full_contacts
+    return adapter.dump_json(adapter.validate_python(contacts, from_attributes=True))
+
+
+def json_response(content: bytes, response: Response | None = None) -> Response:
+    headers = dict(response.headers) if response is not None else None
+    if headers:
+        headers.pop("content-length", None)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+def render_contacts(contacts: list, lean: bool, response: Response | None = None):
+    """
+    The render_contacts function serializes the contacts straight to JSON bytes with pydantic-core, skipping the dict that FastAPI would otherwise build from the response_model and encode a second time. In lean mode the nested owner is left out.
+
+    :param contacts: list: The contacts to return
+    :param lean: bool: Leave the owner out of every contact
+    :param response: Response | None: The route's response, whose headers are kept
+    :return: A ready JSON response
+    :doc-author: Trelent
+    """
+    return json_response(dump_contacts(contacts, lean), response)
+
+
+async def cached_contacts(
+    version: int | None,
+    user: User,
+    kind: str,
+    load,
+    response: Response,
+    paged: bool = False,
+    **params,
+) -> Response:
+    """
+    The cached_contacts function answers a contacts query from the read-through cache, keyed by the user, the user's contacts version, the kind of query and its parameters, and for full contacts by the embedded owner fields. On a miss the contacts are loaded and rendered once, and the body is cached together with the X-Next-Cursor of the page. Without a version (Redis is unavailable) the cache is bypassed.
+
+    :param version: int | None: The user's contacts version
+    :param user: User: The owner of the contacts
+    :param kind: str: Name of the query
+    :param load: Async function that returns the contacts
+    :param response: Response: The route's response, whose headers are kept
+    :param paged: bool: Whether a full page of limit contacts gets a next cursor
+    :param params: The query parameters, lean (and limit if paged) among them
+    :return: A ready JSON response
+    :doc-author: Trelent
+    """
+
+    async def render() -> dict[str, bytes]:
+        contacts = await load()
+        entry = {"body": dump_contacts(contacts, params["lean"])}
+        if paged and len(contacts) == params["limit"]:
+            entry["next_cursor"] = repositories_contacts.encode_cursor(
+                contacts[-1].id
+            ).encode()
+        return entry
+
+    key = None
+    if version is not None:
+        owner = None if params["lean"] else owner_state(user)
+        key = contacts_cache.key(user.id, version, kind, owner=owner, **params)
+    entry = await contacts_cache.get_or_load(key, render)
+    if "next_cursor" in entry:
+        response.headers[NEXT_CURSOR_HEADER] = entry["next_cursor"].decode()
+    return json_response(entry["body"], response)
+
 
 @router.get("/", response_model=list[ContactResponse])
 async def get_contacts(
+    response: Response,
     limit: int = Query(10, ge=10, le=500),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None),
+    lean: bool = Query(False),
+    if_none_match: str | None = Header(None),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(auth_service.get_current_user),
 ):
     """
-    The get_contacts function returns a list of contacts.
+    The get_contacts function returns a list of contacts. Pages can be walked either with offset or with the opaque cursor returned in the X-Next-Cursor header of the previous page; the cursor takes precedence and stays fast at any depth. The page's ETag is derived from the user's contacts version, which every write bumps, so a client whose If-None-Match is current gets 304 before the database is queried; other clients are served from the read-through cache.
 
     :param limit: int: Limit the number of contacts returned
     :param ge: Set a minimum value for the limit parameter
     :param le: Limit the number of contacts returned
     :param offset: int: Specify the offset of the first contact to return
     :param ge: Specify the minimum value of a parameter, and le is used to specify the maximum value
+    :param cursor: str | None: Cursor of the next page from the previous response
+    :param lean: bool: Leave the nested user out of every contact
+    :param if_none_match: str | None: ETags of the copies the client already has
     :param db: AsyncSession: Pass the database connection to the function
     :param user: User: Get the current user
     :return: A list of contacts, which is a list of dictionaries
     :doc-author: Trelent
     """
-    contacts = await repositories_contacts.get_contacts(limit, offset, db, user)
-    return contacts
+    after_id = cursor_to_id(cursor)
+    version = await contact_versions.get(user.id)
+    if version is not None:
+        owner = None if lean else owner_state(user)
+        etag = make_etag(user.id, version, limit, offset, after_id, lean, owner)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        response.headers["ETag"] = etag
+
+    async def load():
+        return await repositories_contacts.get_contacts(
+            limit, offset, db, user, after_id=after_id, lean=lean
+        )
+
+    return await cached_contacts(
+        version,
+        user,
+        "list",
+        load,
+        response,
+        paged=True,
+        limit=limit,
+        offset=offset,
+        after_id=after_id,
+        lean=lean,
+    )
 
 
 @router.get(
@@ -43,8 +207,11 @@ async def get_contacts(
     dependencies=[Depends(access_to_route_all)],
 )
 async def get_all_contacts(
+    response: Response,
     limit: int = Query(10, ge=10, le=500),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None),
+    lean: bool = Query(False),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(auth_service.get_current_user),
 ):
@@ -56,25 +223,81 @@ async def get_all_contacts(
     :param le: Limit the maximum number of contacts that can be returned by a single request
     :param offset: int: Specify the offset of the query
     :param ge: Specify a minimum value for the parameter
+    :param cursor: str | None: Cursor of the next page from the previous response
+    :param lean: bool: Leave the nested user out of every contact
     :param db: AsyncSession: Get the database session
     :param user: User: Get the current user from the database
     :return: A list of contacts
     :doc-author: Trelent
     """
-    contacts = await repositories_contacts.get_all_contacts(limit, offset, db)
-    return contacts
+    contacts = await repositories_contacts.get_all_contacts(
+        limit, offset, db, after_id=cursor_to_id(cursor), lean=lean
+    )
+    set_next_cursor(response, contacts, limit)
+    return render_contacts(contacts, lean, response)
+
+
+@router.get("/export", dependencies=[Depends(access_to_route_all)])
+async def export_contacts(
+    format: contacts_export.ExportFormat = Query(contacts_export.ExportFormat.ndjson),
+    manager: DatabaseSessionManager = Depends(get_sessionmanager),
+    user: User = Depends(auth_service.get_current_user),
+):
+    """
+    The export_contacts function streams every contact in the database as NDJSON or CSV. Rows are read through a server-side cursor and sent batch by batch, so memory use does not depend on the size of the table.
+
+    :param format: ExportFormat: ndjson (default) or csv
+    :param manager: DatabaseSessionManager: Opens the session the export reads from
+    :param user: User: Get the current user
+    :return: A streaming response with the export
+    :doc-author: Trelent
+    """
+    return StreamingResponse(
+        contacts_export.export_contacts(manager, format),
+        media_type=contacts_export.MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="contacts.{format.value}"'
+        },
+    )
+
+
+@router.get("/sync", response_model=ContactSyncResponse)
+async def sync_contacts(
+    since: datetime | None = Query(None),
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(auth_service.get_current_user),
+):
+    """
+    The sync_contacts function lets a client keep a local copy of its contacts up to date. The first call, without since, returns every contact; each later call passes the watermark of the previous response and gets only the contacts changed and the ids of the contacts deleted since then, so the cost follows the number of changes rather than the number of contacts.
+
+    :param since: datetime | None: The watermark returned by the previous sync
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Get the current user from the database
+    :return: The changed contacts, the deleted ids and the watermark for the next call
+    :doc-author: Trelent
+    """
+    contacts, deleted, watermark = await repositories_contacts.get_contact_changes(
+        since, db, user
+    )
+    sync = ContactSyncResponse.model_validate(
+        {"contacts": contacts, "deleted": deleted, "watermark": watermark}
+    )
+    return json_response(sync.model_dump_json().encode())
 
 
 @router.get("/{contact_id}", response_model=ContactResponse)
 async def get_contact(
     contact_id: int,
+    response: Response,
+    if_none_match: str | None = Header(None),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(auth_service.get_current_user),
 ):
     """
-    The get_contact function is a GET request that returns the contact with the given ID. If no such contact exists, it will return a 404 NOT FOUND error.
+    The get_contact function is a GET request that returns the contact with the given ID. If no such contact exists, it will return a 404 NOT FOUND error. The ETag is derived from the contact's updated_at, the user's contacts version and the embedded owner fields; the version is there because updated_at may only have a resolution of one second. A client whose If-None-Match is current gets 304 without a body.
 
     :param contact_id: int: Get the contact id
+    :param if_none_match: str | None: ETags of the copies the client already has
     :param db: AsyncSession: Pass the database session to the function
     :param user: User: Get the current user from the auth_service
     :return: A contact object
@@ -83,6 +306,11 @@ async def get_contact(
     contact = await repositories_contacts.get_contact(contact_id, db, user)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="NOT FOUND")
+    version = await contact_versions.get(user.id)
+    etag = make_etag(contact.id, contact.updated_at, version, owner_state(user))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return contact
 
 
@@ -101,11 +329,136 @@ async def create_contact(
     :return: The created contact
     :doc-author: Trelent
     """
-    contact = await repositories_contacts.create_contact(body, db, user)
+    try:
+        contact = await repositories_contacts.create_contact(body, db, user)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=messages.CONTACT_EXISTS
+        )
     return contact
 
 
-@router.put("/{contact_id}")
+@router.post("/import", response_model=ContactImportReport)
+async def import_contacts(
+    request: Request,
+    format: contacts_import.ImportFormat | None = Query(None),
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(auth_service.get_current_user),
+):
+    """
+    The import_contacts function bulk-imports contacts from a CSV (with a header row) or NDJSON request body. The body is read as a stream and written in batches, so large uploads use bounded memory. The format comes from the format parameter or else from the Content-Type header.
+
+    :param request: Request: The upload, read as a stream
+    :param format: ImportFormat | None: Format of the body, csv or ndjson
+    :param db: AsyncSession: Get the database session
+    :param user: User: Get the current user
+    :return: Counts of imported, duplicate and failed rows, with the first errors by line
+    :doc-author: Trelent
+    """
+    fmt = format or contacts_import.detect_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send text/csv or application/x-ndjson",
+        )
+    try:
+        return await contacts_import.import_contacts(request.stream(), fmt, db, user)
+    except contacts_import.ImportRejected as err:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+
+
+def batch_response(ids: list[int], found, found_status: int) -> ContactBatchResponse:
+    """
+    The batch_response function reports the outcome of a batch operation per requested id, in request order: found_status for the ids the operation reached and 404 for the others.
+
+    :param ids: list[int]: The requested ids
+    :param found: The contacts by id (a dict), or the ids (a set) the operation reached
+    :param found_status: int: Status of the reached ids
+    :return: The per-item results
+    :doc-author: Trelent
+    """
+    items = []
+    for contact_id in dict.fromkeys(ids):
+        if contact_id not in found:
+            items.append(
+                ContactBatchItem(id=contact_id, status=status.HTTP_404_NOT_FOUND)
+            )
+            continue
+        contact = None
+        if isinstance(found, dict):
+            contact = ContactLeanResponse.model_validate(found[contact_id])
+        items.append(
+            ContactBatchItem(id=contact_id, status=found_status, contact=contact)
+        )
+    return ContactBatchResponse(items=items)
+
+
+@router.post("/batch/get", response_model=ContactBatchResponse)
+async def get_contacts_batch(
+    body: ContactBatchIds,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(auth_service.get_current_user),
+):
+    """
+    The get_contacts_batch function returns several contacts with one query. Each requested id gets its own status: 200 with the contact, or 404 if the user has no such contact.
+
+    :param body: ContactBatchIds: Ids of the contacts, at most CONTACTS_BATCH_LIMIT
+    :param db: AsyncSession: Get the database session
+    :param user: User: Get the current user
+    :return: The per-item results
+    :doc-author: Trelent
+    """
+    contacts = await repositories_contacts.get_contacts_by_ids(body.ids, db, user)
+    return batch_response(body.ids, contacts, status.HTTP_200_OK)
+
+
+@router.post("/batch/update", response_model=ContactBatchResponse)
+async def update_contacts_batch(
+    body: ContactBatchUpdate,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(auth_service.get_current_user),
+):
+    """
+    The update_contacts_batch function applies a partial update to each of several contacts with one statement. Each item gets its own status: 200 with the updated contact, or 404 if the user has no such contact. If an update would give two contacts the same email or phone, nothing is changed and 409 is returned.
+
+    :param body: ContactBatchUpdate: The patches, each with a contact id
+    :param db: AsyncSession: Get the database session
+    :param user: User: Get the current user
+    :return: The per-item results
+    :doc-author: Trelent
+    """
+    try:
+        contacts = await repositories_contacts.update_contacts(body.items, db, user)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=messages.CONTACT_EXISTS,
+        )
+    return batch_response(
+        [item.id for item in body.items], contacts, status.HTTP_200_OK
+    )
+
+
+@router.post("/batch/delete", response_model=ContactBatchResponse)
+async def delete_contacts_batch(
+    body: ContactBatchIds,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(auth_service.get_current_user),
+):
+    """
+    The delete_contacts_batch function deletes several contacts with one statement. Each requested id gets its own status: 204 if it was deleted, or 404 if the user has no such contact.
+
+    :param body: ContactBatchIds: Ids of the contacts, at most CONTACTS_BATCH_LIMIT
+    :param db: AsyncSession: Get the database session
+    :param user: User: Get the current user
+    :return: The per-item results
+    :doc-author: Trelent
+    """
+    deleted = await repositories_contacts.delete_contacts(body.ids, db, user)
+    return batch_response(body.ids, deleted, status.HTTP_204_NO_CONTENT)
+
+
+@router.put("/{contact_id}", response_model=ContactResponse)
 async def update_contact(
     body: ContactUpdateSchema,
     contact_id: int = Path(ge=1),
@@ -113,7 +466,7 @@ async def update_contact(
     user: User = Depends(auth_service.get_current_user),
 ):
     """
-    The update_contact function updates a contact in the database. It takes an id, body and db as parameters. The id is used to find the contact in the database, while body contains all of the information that will be updated for that specific contact. The db parameter is used to connect with our PostgreSQL database.
+    The update_contact function updates a contact in the database. It takes an id, body and db as parameters. The id is used to find the contact in the database, while body contains all of the information that will be updated for that specific contact. The db parameter is used to connect with our PostgreSQL database. If the new email or phone is used by another of the user's contacts, 409 is returned.
 
     :param body: ContactUpdateSchema: Validate the body of the request
     :param contact_id: int: Get the contact id from the url
@@ -122,7 +475,40 @@ async def update_contact(
     :return: The updated contact
     :doc-author: Trelent
     """
-    contact = await repositories_contacts.update_contact(contact_id, body, db, user)
+    try:
+        contact = await repositories_contacts.update_contact(contact_id, body, db, user)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=messages.CONTACT_EXISTS
+        )
+    if contact is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="NOT FOUND")
+    return contact
+
+
+@router.patch("/{contact_id}", response_model=ContactResponse)
+async def patch_contact(
+    body: ContactPatchSchema,
+    contact_id: int = Path(ge=1),
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(auth_service.get_current_user),
+):
+    """
+    The patch_contact function partially updates a contact. Only the fields present in the request body are written; the others keep their values, and notes may be cleared with null. If the new email or phone is used by another of the user's contacts, 409 is returned.
+
+    :param body: ContactPatchSchema: The fields to change
+    :param contact_id: int: Get the contact id from the url
+    :param db: AsyncSession: Get the database session
+    :param user: User: Get the current user
+    :return: The updated contact
+    :doc-author: Trelent
+    """
+    try:
+        contact = await repositories_contacts.update_contact(contact_id, body, db, user)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=messages.CONTACT_EXISTS
+        )
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="NOT FOUND")
     return contact
@@ -150,38 +536,75 @@ async def delete_contact(
 @router.get("/search/{query}", response_model=list[ContactResponse])
 async def search_contacts(
     query: str,
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    lean: bool = Query(False),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(auth_service.get_current_user),
 ):
     """
-    The search_contacts function searches for contacts in the database. It takes a query string as an argument and returns a list of ContactResponse objects.
+    The search_contacts function searches for contacts in the database. It takes a query string as an argument and returns a list of ContactResponse objects, most relevant first. Results are served from the read-through cache until the user's contacts change.
 
     :param query: str: Specify the search query
+    :param limit: int: Maximum number of contacts to return
+    :param lean: bool: Leave the nested user out of every contact
     :param db: AsyncSession: Pass the database session to the function
     :param user: User: Get the current user from the database
     :return: A list of contactresponse objects
     :doc-author: Trelent
     """
-    contacts = await repositories_contacts.search_contacts(query, db, user)
-    if contacts is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="NOT FOUND")
-    return contacts
+
+    async def load():
+        contacts = await repositories_contacts.search_contacts(
+            query, db, user, limit, lean=lean
+        )
+        if contacts is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="NOT FOUND"
+            )
+        return contacts
+
+    version = await contact_versions.get(user.id)
+    return await cached_contacts(
+        version, user, "search", load, response, query=query, limit=limit, lean=lean
+    )
 
 
 @router.get("/upcoming_birthdays/", response_model=list[ContactResponse])
 async def upcoming_birthdays(
+    response: Response,
+    days: int = Query(7, ge=1, le=365),
+    lean: bool = Query(False),
     db: AsyncSession = Depends(get_db),
     user: User = Depends(auth_service.get_current_user),
 ):
     """
-    The upcoming_birthdays function searches for contacts by birthday.
+    The upcoming_birthdays function searches for contacts by birthday. Results are served from the read-through cache until the user's contacts change or the day does.
 
+    :param days: int: Size of the window in days, a week by default
+    :param lean: bool: Leave the nested user out of every contact
     :param db: AsyncSession: Get the database session
     :param user: User: Get the current user from the database
-    :return: A list of contacts, where the birthday is today
+    :return: A list of contacts whose birthday is within the window, soonest first
     :doc-author: Trelent
     """
-    contacts = await repositories_contacts.congrats(db, user)
-    if contacts is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="NOT FOUND")
-    return contacts
+
+    async def load():
+        contacts = await repositories_contacts.congrats(db, user, days, lean=lean)
+        if contacts is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="NOT FOUND"
+            )
+        return contacts
+
+    version = await contact_versions.get(user.id)
+    return await cached_contacts(
+        version,
+        user,
+        "birthdays",
+        load,
+        response,
+        today=date.today(),
+        days=days,
+        lean=lean,
+    )
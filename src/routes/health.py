@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Response, status
+
+from src.services.health import health_checker
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/live")
+async def liveness():
+    """
+    The liveness function answers as long as the event loop of this worker is running. It does no I/O, so a slow database never gets a healthy worker restarted.
+
+    :return: The status and uptime of the worker
+    :rtype: dict
+    :doc-author: Trelent
+    """
+    return health_checker.live()
+
+
+@router.get("/ready")
+async def readiness(response: Response):
+    """
+    The readiness function reports, from the last background checks, whether this worker can serve requests, with the pool checkout time and the database and Redis latencies the checks observed. It answers 503 when either is down or the checks have gone stale.
+
+    :param response: Response: Set the status code when the worker is not ready
+    :return: Whether the worker is ready and the last checks
+    :rtype: dict
+    :doc-author: Trelent
+    """
+    ready, checks = health_checker.ready()
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": "ready" if ready else "unavailable", "checks": checks}
@@ -0,0 +1,71 @@
+from fastapi import APIRouter, Depends
+from redis.exceptions import RedisError
+
+from src.database.db import sessionmanager
+from src.entity.models import Role
+from src.services.cache import contacts_cache, user_cache
+from src.services.mail_queue import mail_queue, mail_worker
+from src.services.rate_limit import rate_limits
+from src.services.rendering import email_templates
+from src.services.roles import RoleAccess
+
+router = APIRouter(prefix="/internal", tags=["internal"])
+
+access_to_internal = RoleAccess([Role.admin])
+
+
+@router.get("/pool", dependencies=[Depends(access_to_internal)])
+async def pool_stats():
+    """
+    The pool_stats function reports the state of the database connection pool: connections checked out, overflow in use, checkout wait times, overflow connects and pool timeouts since start.
+
+    :return: Pool statistics of this worker
+    :rtype: dict
+    :doc-author: Trelent
+    """
+    return sessionmanager.pool_stats()
+
+
+@router.get("/cache", dependencies=[Depends(access_to_internal)])
+async def cache_stats():
+    """
+    The cache_stats function reports hits, misses and the hit rate of the contact query cache, and the hits and misses of both tiers of the user cache, since start.
+
+    :return: Cache statistics of this worker
+    :rtype: dict
+    :doc-author: Trelent
+    """
+    return {"contacts": contacts_cache.stats(), "users": user_cache.stats()}
+
+
+@router.get("/mail", dependencies=[Depends(access_to_internal)])
+async def mail_stats():
+    """
+    The mail_stats function reports (when Redis is reachable) the length of the outbound mail queue, of the retry schedule and of the dead-letter list, and the messages sent, failed sends and SMTP sessions opened by this worker since start, and how long the email templates took to compile and to render.
+
+    :return: Mail queue statistics
+    :rtype: dict
+    :doc-author: Trelent
+    """
+    try:
+        queue = await mail_queue.stats()
+    except RedisError as err:
+        print(err)
+        queue = None
+    return {
+        "queue": queue,
+        "worker": mail_worker.stats(),
+        "templates": email_templates.stats(),
+    }
+
+
+@router.get("/ratelimit", dependencies=[Depends(access_to_internal)])
+async def rate_limit_stats():
+    """
+    The rate_limit_stats function reports how many rate limit decisions this worker made from its local leases and how many needed a round trip to Redis, the requests refused and the Redis errors since start.
+
+    :return: Rate limiter statistics of this worker
+    :rtype: dict
+    :doc-author: Trelent
+    """
+    return rate_limits.stats()
@@ -1,7 +1,3 @@
-import pickle
-
-import cloudinary
-import cloudinary.uploader
 from fastapi import (
     APIRouter,
     HTTPException,
@@ -9,33 +5,42 @@ from fastapi import (
     status,
     Path,
     Query,
-    UploadFile,
-    File,
+    Request,
 )
-from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.db import get_db
 from src.entity.models import User
 from src.schemas.user import UserResponse
+from src.services import avatars
 from src.services.auth import auth_service
-from src.conf.config import config
+from src.services.executor import ExecutorSaturated
+from src.services.rate_limit import RateLimiter
+from src.conf import messages
 from src.repository import users as repositories_users
 
 router = APIRouter(prefix="/users", tags=["users"])
 
-cloudinary.config(
-    cloud_name=config.CLD_NAME,
-    api_key=config.CLD_API_KEY,
-    api_secret=config.CLD_API_SECRET,
-    secure=True,
-)
+AVATAR_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                }
+            }
+        },
+    }
+}
 
 
 @router.get(
     "/me",
     response_model=UserResponse,
-    dependencies=[Depends(RateLimiter(times=1, seconds=20))],
+    dependencies=[Depends(RateLimiter("users:me"))],
 )
 async def get_current_user(user: User = Depends(auth_service.get_current_user)):
     """
@@ -51,30 +56,39 @@ async def get_current_user(user: User = Depends(auth_service.get_current_user)):
 @router.patch(
     "/avatar",
     response_model=UserResponse,
-    dependencies=[Depends(RateLimiter(times=1, seconds=20))],
+    dependencies=[Depends(RateLimiter("users:avatar"))],
+    openapi_extra=AVATAR_UPLOAD_BODY,
 )
-async def get_current_user(
-    file: UploadFile = File(),
+async def update_avatar(
+    request: Request,
     user: User = Depends(auth_service.get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """
-    The get_current_user function is a dependency that will be used in the get_current_user endpoint. It takes an UploadFile object, which is a file uploaded by the user, and returns a User object with its avatar URL updated.
+    The update_avatar function replaces the user's avatar with the uploaded image. The multipart body is read as it streams in and refused with 413 once it is larger than AVATAR_MAX_BYTES; the image is cropped to a square in a worker pool and saved to the configured storage off the event loop.
 
-    :param file: UploadFile: Get the file from the request
-    :param db: AsyncSession: Connect to the database
+    :param request: Request: The multipart upload with the image in its file field
     :param user: User: Get the current user
-    :param : Get the current user
-    :return: The current user, based on the token
+    :param db: AsyncSession: Connect to the database
+    :return: The current user with the new avatar url
     :doc-author: Trelent
     """
-    public_id = f"images/{user.email}"
-    res = cloudinary.uploader.upload(file.file, public_id=public_id, overwrite=True)
-    print(res)
-    res_url = cloudinary.CloudinaryImage(public_id).build_url(
-        width=250, height=250, crop="fill", version=res.get("version")
-    )
-    user = await repositories_users.update_avatar_url(user.email, res_url, db)
-    auth_service.cache.set(user.email, pickle.dumps(user))
-    auth_service.cache.expire(user.email, 300)
-    return user
+    try:
+        data = await avatars.receive_avatar(request)
+        url = await avatars.store_avatar(data, user.email)
+    except avatars.AvatarTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=messages.AVATAR_TOO_LARGE,
+        )
+    except avatars.InvalidImage:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=messages.INVALID_IMAGE
+        )
+    except ExecutorSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=messages.SERVICE_BUSY,
+            headers={"Retry-After": "1"},
+        )
+    return await repositories_users.update_avatar_url(user.email, url, db)
@@ -1,8 +1,9 @@
 from datetime import date, datetime
 from typing import Optional
-from pydantic import BaseModel, EmailStr, Field, ConfigDict
+from pydantic import BaseModel, EmailStr, Field, ConfigDict, field_validator
 
-from src.schemas.user import UserResponse
+from src.conf.config import config
+from src.schemas.user import StoredEmailStr, UserResponse
 
 
 class ContactSchema(BaseModel):
@@ -11,23 +12,84 @@ class ContactSchema(BaseModel):
     email: EmailStr()
     phone: str = Field(min_length=4, max_length=15)
     birthday: date = Field()
-    notes: Optional[str] = Field(min_length=2, max_length=500)
+    notes: Optional[str] = Field(None, min_length=2, max_length=500)
 
 
 class ContactUpdateSchema(ContactSchema):
     pass
 
 
-class ContactResponse(BaseModel):
+class ContactPatchSchema(BaseModel):
+    name: str = Field(None, min_length=2, max_length=25)
+    surname: str = Field(None, min_length=2, max_length=50)
+    email: EmailStr = None
+    phone: str = Field(None, min_length=4, max_length=15)
+    birthday: date = None
+    notes: Optional[str] = Field(None, min_length=2, max_length=500)
+
+
+class ContactLeanResponse(BaseModel):
     id: int = 1
     name: str
     surname: str
-    email: EmailStr
+    email: StoredEmailStr
     phone: str
     birthday: date
-    notes: str
+    notes: str | None
     created_at: datetime | None
     updated_at: datetime | None
-    user: UserResponse | None
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class ContactResponse(ContactLeanResponse):
+    user: UserResponse | None
+
+
+class ContactImportError(BaseModel):
+    line: int
+    error: str
+
+
+class ContactImportReport(BaseModel):
+    imported: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    errors: list[ContactImportError] = []
+
+
+class ContactBatchIds(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=config.CONTACTS_BATCH_LIMIT)
+
+
+class ContactBatchPatch(ContactPatchSchema):
+    id: int = Field(ge=1)
+
+
+class ContactBatchUpdate(BaseModel):
+    items: list[ContactBatchPatch] = Field(
+        min_length=1, max_length=config.CONTACTS_BATCH_LIMIT
+    )
+
+    @field_validator("items")
+    @classmethod
+    def validate_unique_ids(cls, items: list[ContactBatchPatch]):
+        if len({item.id for item in items}) != len(items):
+            raise ValueError("Each contact id may appear only once")
+        return items
+
+
+class ContactBatchItem(BaseModel):
+    id: int
+    status: int
+    contact: ContactLeanResponse | None = None
+
+
+class ContactBatchResponse(BaseModel):
+    items: list[ContactBatchItem]
+
+
+class ContactSyncResponse(BaseModel):
+    contacts: list[ContactLeanResponse]
+    deleted: list[int]
+    watermark: datetime
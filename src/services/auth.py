@@ -1,5 +1,4 @@
-import redis
-import pickle
+import hashlib
 
 from datetime import datetime, timedelta, timezone
 from typing import Optional
@@ -11,7 +10,10 @@ from jose import JWTError, jwt
 
 from src.database.db import get_db
 from src.repository import users as repositories_users
+from src.services.cache import LRUCache, user_cache
+from src.services.executor import BoundedExecutor, ExecutorSaturated
 from src.conf.config import config
+from src.conf import messages
 
 RED = "\033[91m"
 GREEN = "\033[92m"
@@ -24,11 +26,12 @@ class Auth:
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     SECRET_KEY = config.SECRET_HASH_KEY
     ALGORITHM = config.ALGORITHM
-    cache = redis.Redis(
-        host=config.REDIS_DOMAIN,
-        port=config.REDIS_PORT,
-        db=0,
-        password=config.REDIS_PASSWORD,
+    cache = user_cache
+    token_cache = LRUCache(maxsize=config.TOKEN_CACHE_SIZE, ttl=0)
+    hash_executor = BoundedExecutor(
+        max_workers=config.HASH_POOL_SIZE,
+        max_queue=config.HASH_QUEUE_LIMIT,
+        thread_name_prefix="bcrypt",
     )
 
     def verify_password(self, plain_password, hashed_password):
@@ -54,6 +57,41 @@ class Auth:
         """
         return self.pwd_context.hash(password)
 
+    async def _run_hashing(self, func, *args):
+        try:
+            return await self.hash_executor.run(func, *args)
+        except ExecutorSaturated:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=messages.SERVICE_BUSY,
+                headers={"Retry-After": "1"},
+            )
+
+    async def verify_password_async(self, plain_password, hashed_password):
+        """
+        The verify_password_async function runs verify_password in the bounded bcrypt pool, so the event loop keeps serving other requests while the hash is checked.
+
+        :param self: Represent the instance of the class
+        :param plain_password: Store the password that is entered by the user
+        :param hashed_password: Compare the hashed password in the database with the plain_password parameter
+        :return: A boolean value
+        :doc-author: Trelent
+        """
+        return await self._run_hashing(
+            self.verify_password, plain_password, hashed_password
+        )
+
+    async def get_password_hash_async(self, password: str):
+        """
+        The get_password_hash_async function runs get_password_hash in the bounded bcrypt pool. When the pool and its queue are full it answers 503 right away instead of queueing more work.
+
+        :param self: Represent the instance of the class
+        :param password: str: Pass in the password that you want to hash
+        :return: A hashed password
+        :doc-author: Trelent
+        """
+        return await self._run_hashing(self.get_password_hash, password)
+
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
     # define a function to generate a new access token
@@ -108,6 +146,23 @@ class Auth:
         )
         return encoded_refresh_token
 
+    def decode_token(self, token: str) -> dict:
+        """
+        The decode_token function verifies a jwt and returns its claims. Verified claims are kept in a bounded in-process cache keyed by the sha256 digest of the token until the token's own exp, so a repeated bearer token skips the signature check.
+
+        :param self: Represent the instance of the class
+        :param token: str: The encoded jwt
+        :return: The claims of the token
+        :doc-author: Trelent
+        """
+        key = hashlib.sha256(token.encode()).digest()
+        payload = self.token_cache.get(key)
+        if payload is None:
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            if "exp" in payload:
+                self.token_cache.set(key, payload, expires_at=payload["exp"])
+        return payload
+
     async def decode_refresh_token(self, refresh_token: str):
         """
         The decode_refresh_token function is used to decode the refresh token. It will raise an exception if the token is invalid or has expired. If it's valid, it returns the email address of the user.
@@ -118,9 +173,7 @@ class Auth:
         :doc-author: Trelent
         """
         try:
-            payload = jwt.decode(
-                refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
-            )
+            payload = self.decode_token(refresh_token)
             if payload["scope"] == "refresh_token":
                 email = payload["sub"]
                 return email
@@ -154,7 +207,7 @@ class Auth:
 
         try:
             # Decode JWT
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_token(token)
             if payload["scope"] == "access_token":
                 email = payload["sub"]
                 if email is None:
@@ -166,18 +219,16 @@ class Auth:
 
         user_hash = str(email)
 
-        user = self.cache.get(user_hash)
+        user = await self.cache.get(user_hash)
 
         if user is None:
             print(f"{GREEN}User from database{RESET}")
             user = await repositories_users.get_user_by_email(email, db)
             if user is None:
                 raise credentials_exception
-            self.cache.set(user_hash, pickle.dumps(user))
-            self.cache.expire(user_hash, 300)
+            await self.cache.set(user_hash, user)
         else:
             print(f"{BLUE}User from cache{RESET}")
-            user = pickle.loads(user)
         return user
 
     def create_email_token(self, data: dict):
@@ -205,7 +256,7 @@ class Auth:
         :doc-author: Trelent
         """
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.decode_token(token)
             email = payload["sub"]
             return email
         except JWTError as e:
@@ -0,0 +1,205 @@
+import functools
+import hashlib
+import io
+import os
+import time
+
+import cloudinary
+import cloudinary.uploader
+from fastapi import Request
+from PIL import Image, ImageOps
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from src.conf.config import config
+from src.services.executor import BoundedExecutor
+
+CHUNK_SIZE = 64 * 1024
+# Room for the multipart boundaries and part headers around the file itself.
+FORM_OVERHEAD = 16 * 1024
+
+cloudinary.config(
+    cloud_name=config.CLD_NAME,
+    api_key=config.CLD_API_KEY,
+    api_secret=config.CLD_API_SECRET,
+    secure=True,
+)
+
+
+class AvatarTooLarge(Exception):
+    pass
+
+
+class InvalidImage(Exception):
+    pass
+
+
+avatar_executor = BoundedExecutor(
+    max_workers=config.AVATAR_POOL_SIZE,
+    max_queue=config.AVATAR_QUEUE_LIMIT,
+    thread_name_prefix="avatar",
+)
+
+
+async def read_upload(
+    file: UploadFile, max_bytes: int, chunk_size: int = CHUNK_SIZE
+) -> bytes:
+    """
+    The read_upload function reads an uploaded file chunk by chunk and stops as soon as it grows past max_bytes, so an oversized upload is never held in memory whole.
+
+    :param file: UploadFile: The uploaded file
+    :param max_bytes: int: The largest accepted size
+    :param chunk_size: int: Bytes read at a time
+    :return: The content of the file
+    :doc-author: Trelent
+    """
+    buffer = bytearray()
+    while chunk := await file.read(chunk_size):
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise AvatarTooLarge(f"avatar is larger than {max_bytes} bytes")
+    return bytes(buffer)
+
+
+async def _capped(stream, max_bytes: int):
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > max_bytes:
+            raise AvatarTooLarge(f"request body is larger than {max_bytes} bytes")
+        yield chunk
+
+
+async def receive_avatar(
+    request: Request, max_bytes: int = config.AVATAR_MAX_BYTES
+) -> bytes:
+    """
+    The receive_avatar function reads the file field of a multipart avatar upload while the body streams in. A Content-Length over the cap is rejected before anything is read, and a body without one is cut off as soon as it grows past the cap, instead of being spooled whole first.
+
+    :param request: Request: The upload request
+    :param max_bytes: int: The largest accepted avatar
+    :return: The content of the uploaded file
+    :doc-author: Trelent
+    """
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise InvalidImage("expected a multipart/form-data upload")
+    limit = max_bytes + FORM_OVERHEAD
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        raise AvatarTooLarge(f"request body is larger than {limit} bytes")
+    parser = MultiPartParser(
+        request.headers,
+        _capped(request.stream(), limit),
+        max_files=1,
+        max_fields=1,
+    )
+    try:
+        form = await parser.parse()
+    except MultiPartException as err:
+        raise InvalidImage(err.message) from err
+    except KeyError as err:
+        raise InvalidImage("the multipart boundary is missing") from err
+    try:
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise InvalidImage("the file field is missing")
+        return await read_upload(file, max_bytes)
+    finally:
+        await form.close()
+
+
+def resize_avatar(data: bytes, size: int) -> tuple[bytes, str]:
+    """
+    The resize_avatar function decodes an image, crops it to a centred size x size square and encodes it as PNG. It is CPU-bound and meant to run in the avatar pool.
+
+    :param data: bytes: The uploaded image
+    :param size: int: Width and height of the avatar
+    :return: The encoded avatar and its file extension
+    :doc-author: Trelent
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("RGB", (size, size))
+            avatar = ImageOps.fit(ImageOps.exif_transpose(image), (size, size))
+    except (OSError, ValueError, Image.DecompressionBombError) as err:
+        raise InvalidImage(str(err)) from err
+    if avatar.mode not in ("RGB", "RGBA"):
+        avatar = avatar.convert("RGBA")
+    output = io.BytesIO()
+    avatar.save(output, format="PNG", optimize=True)
+    return output.getvalue(), ".png"
+
+
+class LocalAvatarStorage:
+    """
+    Keeps avatars as files in a directory that is served under base_url.
+    """
+
+    def __init__(self, directory: str, base_url: str):
+        self.directory = directory
+        self.base_url = base_url
+
+    def _write(self, name: str, data: bytes) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        with open(f"{path}.tmp", "wb") as file:
+            file.write(data)
+        os.replace(f"{path}.tmp", path)
+
+    async def save(self, key: str, data: bytes, extension: str) -> str:
+        # Keys are emails: hashing keeps them out of public urls and paths.
+        name = f"{hashlib.sha256(key.encode()).hexdigest()}{extension}"
+        await avatar_executor.run(self._write, name, data)
+        # The name stays the same across uploads; the version defeats stale caches.
+        return f"{self.base_url.rstrip('/')}/{name}?v={time.time_ns()}"
+
+
+class CloudinaryAvatarStorage:
+    """
+    Uploads avatars to Cloudinary. The returned url asks Cloudinary for the
+    avatar crop, so avatars uploaded before they were resized locally are
+    served at the same size.
+    """
+
+    def __init__(self, folder: str, size: int):
+        self.folder = folder
+        self.size = size
+
+    async def save(self, key: str, data: bytes, extension: str) -> str:
+        public_id = f"{self.folder}/{key}"
+        upload = functools.partial(
+            cloudinary.uploader.upload, data, public_id=public_id, overwrite=True
+        )
+        result = await avatar_executor.run(upload)
+        return cloudinary.CloudinaryImage(public_id).build_url(
+            width=self.size,
+            height=self.size,
+            crop="fill",
+            version=result.get("version"),
+        )
+
+
+def make_avatar_storage():
+    if config.AVATAR_STORAGE == "local":
+        return LocalAvatarStorage(config.AVATAR_LOCAL_DIR, config.AVATAR_LOCAL_URL)
+    return CloudinaryAvatarStorage("images", config.AVATAR_SIZE)
+
+
+avatar_storage = make_avatar_storage()
+
+
+async def store_avatar(data: bytes, key: str, storage=None) -> str:
+    """
+    The store_avatar function resizes an uploaded avatar in the avatar pool and saves it to the storage backend, without blocking the event loop.
+
+    :param data: bytes: The uploaded image
+    :param key: str: Name of the avatar in the storage, unique per user
+    :param storage: The storage backend, the configured one by default
+    :return: The url of the stored avatar
+    :doc-author: Trelent
+    """
+    storage = storage or avatar_storage
+    avatar, extension = await avatar_executor.run(
+        resize_avatar, data, config.AVATAR_SIZE
+    )
+    return await storage.save(key, avatar, extension)
@@ -0,0 +1,326 @@
+import asyncio
+import hashlib
+import json
+import time
+
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from src.database.cache import redismanager
+from src.services.principal import dump_principal, load_principal
+from src.conf.config import config
+
+
+class LRUCache:
+    """
+    A small in-process LRU cache where every entry carries its own expiry time.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Any) -> Any | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any, expires_at: float | None = None) -> None:
+        if expires_at is None:
+            expires_at = time.time() + self.ttl
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Any) -> Any | None:
+        item = self._data.pop(key, None)
+        return item[1] if item else None
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class PrincipalCache:
+    """
+    Two-tier cache of authenticated users: an in-process LRU in front of Redis.
+
+    Writes to a user publish the key on a Redis channel, so every worker evicts
+    its local copy, not only the one that handled the write.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        maxsize: int,
+        local_ttl: float,
+        ttl: int,
+        channel: str,
+        dumps: Callable[[Any], bytes],
+        loads: Callable[[bytes], Any | None],
+    ):
+        self.client = client
+        self.local = LRUCache(maxsize, local_ttl)
+        self.ttl = ttl
+        self.channel = channel
+        self.dumps = dumps
+        self.loads = loads
+        self.hits = {"local": 0, "redis": 0}
+        self.misses = {"local": 0, "redis": 0}
+        self._listener: asyncio.Task | None = None
+
+    async def get(self, key: str) -> Any | None:
+        """
+        The get function looks the principal up in the local tier first and falls back to Redis, promoting Redis hits into the local tier. If Redis cannot be reached it counts as a miss, so the caller loads the user from the database.
+
+        :param self: Represent the instance of the class
+        :param key: str: Cache key of the user (the email)
+        :return: The cached principal or None on a miss in both tiers
+        :doc-author: Trelent
+        """
+        value = self.local.get(key)
+        if value is not None:
+            self.hits["local"] += 1
+            return value
+        self.misses["local"] += 1
+
+        try:
+            data = await self.client.get(key)
+        except RedisError as err:
+            print(err)
+            data = None
+        if data is None:
+            self.misses["redis"] += 1
+            return None
+        value = self.loads(data)
+        if value is None:
+            self.misses["redis"] += 1
+            return None
+        self.hits["redis"] += 1
+        self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        """
+        The set function stores the principal in both tiers. The local tier keeps the decoded record rather than the object passed in, so it never holds on to ORM state of the request session. If Redis cannot be reached nothing is cached.
+
+        :param self: Represent the instance of the class
+        :param key: str: Cache key of the user (the email)
+        :param value: Any: The principal to cache
+        :return: None
+        :doc-author: Trelent
+        """
+        data = self.dumps(value)
+        try:
+            await self.client.set(key, data, ex=self.ttl)
+        except RedisError as err:
+            # Without Redis no other worker could be told to evict a local copy.
+            print(err)
+            return
+        self.local.set(key, self.loads(data))
+
+    async def invalidate(self, key: str) -> None:
+        """
+        The invalidate function drops the principal from Redis and tells every worker to evict its local copy.
+
+        :param self: Represent the instance of the class
+        :param key: str: Cache key of the user (the email)
+        :return: None
+        :doc-author: Trelent
+        """
+        self.local.pop(key)
+        try:
+            await self.client.delete(key)
+            await self.client.publish(self.channel, key)
+        except RedisError as err:
+            print(err)
+
+    def stats(self) -> dict:
+        return {
+            tier: {
+                "hits": self.hits[tier],
+                "misses": self.misses[tier],
+            }
+            for tier in ("local", "redis")
+        } | {"local_size": len(self.local)}
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    # Anything published while we were not subscribed is lost.
+                    self.local.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.local.pop(message["data"].decode())
+            except RedisError as err:
+                print(err)
+                await asyncio.sleep(1)
+
+
+class CollectionVersions:
+    """
+    Per-owner version numbers of a collection, kept in Redis and shared by all
+    workers. Every write to the collection bumps the version, so anything
+    derived from it (ETags, cache keys) changes with the data.
+
+    A missing key is seeded from the clock rather than starting at zero, so a
+    version lost to eviction or a Redis restart never repeats an earlier one.
+    """
+
+    def __init__(self, client: redis.Redis, prefix: str):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, owner_id: int) -> str:
+        return f"{self.prefix}:{owner_id}"
+
+    async def get(self, owner_id: int) -> int | None:
+        """
+        The get function returns the current version of the owner's collection.
+
+        :param self: Represent the instance of the class
+        :param owner_id: int: Id of the owner
+        :return: The version, or None if Redis is unavailable
+        :doc-author: Trelent
+        """
+        key = self._key(owner_id)
+        try:
+            version = await self.client.get(key)
+            if version is None:
+                await self.client.set(key, time.time_ns(), nx=True)
+                version = await self.client.get(key)
+        except RedisError as err:
+            print(err)
+            return None
+        return int(version)
+
+    async def bump(self, owner_id: int) -> None:
+        """
+        The bump function moves the owner's collection to a new version after a write.
+
+        :param self: Represent the instance of the class
+        :param owner_id: int: Id of the owner
+        :return: None
+        :doc-author: Trelent
+        """
+        key = self._key(owner_id)
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.set(key, time.time_ns(), nx=True)
+                pipe.incr(key)
+                await pipe.execute()
+        except RedisError as err:
+            print(err)
+
+
+class QueryCache:
+    """
+    Read-through cache of rendered query results in Redis, one hash of fields
+    (the body and any headers that go with it) per entry.
+
+    Keys carry the owner's collection version, so a write moves every reader
+    to new keys at once; the entries of older versions are never read again
+    and simply expire.
+    """
+
+    def __init__(self, client: redis.Redis, prefix: str, ttl: int):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def key(self, owner_id: int, version: int, kind: str, **params) -> str:
+        digest = hashlib.sha1(
+            json.dumps(params, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return f"{self.prefix}:{owner_id}:{version}:{kind}:{digest[:20]}"
+
+    async def get_or_load(
+        self, key: str | None, load: Callable[[], Awaitable[dict[str, bytes]]]
+    ) -> dict[str, bytes]:
+        """
+        The get_or_load function returns the cached entry under key, or calls load and caches what it returns. Redis errors are counted and the entry is loaded as if there were no cache.
+
+        :param self: Represent the instance of the class
+        :param key: str | None: Key of the entry, or None to bypass the cache
+        :param load: Callable[[], Awaitable[dict[str, bytes]]]: Produces the entry on a miss
+        :return: The entry's fields
+        :doc-author: Trelent
+        """
+        if key is None:
+            return await load()
+        try:
+            entry = await self.client.hgetall(key)
+        except RedisError as err:
+            print(err)
+            self.errors += 1
+            return await load()
+        if entry:
+            self.hits += 1
+            return {field.decode(): value for field, value in entry.items()}
+        self.misses += 1
+        entry = await load()
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping=entry)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except RedisError as err:
+            print(err)
+            self.errors += 1
+        return entry
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+user_cache = PrincipalCache(
+    redismanager.client,
+    maxsize=config.USER_CACHE_LOCAL_SIZE,
+    local_ttl=config.USER_CACHE_LOCAL_TTL,
+    ttl=config.USER_CACHE_TTL,
+    channel=config.USER_CACHE_CHANNEL,
+    dumps=dump_principal,
+    loads=load_principal,
+)
+
+contact_versions = CollectionVersions(redismanager.client, "contacts:version")
+contacts_cache = QueryCache(
+    redismanager.client, "contacts:query", config.CONTACTS_CACHE_TTL
+)
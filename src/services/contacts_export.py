@@ -0,0 +1,73 @@
+import csv
+import enum
+import io
+import json
+
+from datetime import date
+from typing import AsyncIterator
+
+from src.conf.config import config
+from src.database.db import DatabaseSessionManager
+from src.repository import contacts as repositories_contacts
+
+EXPORT_FIELDS = tuple(column.key for column in repositories_contacts.EXPORT_COLUMNS)
+
+
+class ExportFormat(str, enum.Enum):
+    ndjson: str = "ndjson"
+    csv: str = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_ndjson(rows) -> bytes:
+    return "".join(
+        json.dumps(dict(zip(EXPORT_FIELDS, row)), default=_json_default) + "\n"
+        for row in rows
+    ).encode()
+
+
+def encode_csv(rows, header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows(
+        [value.isoformat() if isinstance(value, date) else value for value in row]
+        for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+async def export_contacts(
+    manager: DatabaseSessionManager,
+    fmt: ExportFormat,
+    batch_size: int = config.EXPORT_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    """
+    The export_contacts function produces the body of a contacts export, one chunk per batch of rows read from a server-side cursor. It opens its own session because a streaming body is sent after the request's dependencies have been closed.
+
+    :param manager: DatabaseSessionManager: Opens the session the export reads from
+    :param fmt: ExportFormat: ndjson or csv (with a header row)
+    :param batch_size: int: Rows per chunk
+    :return: An async iterator of encoded chunks
+    :doc-author: Trelent
+    """
+    async with manager.session() as db:
+        if fmt == ExportFormat.csv:
+            yield encode_csv([], header=True)
+        async for rows in repositories_contacts.stream_all_contacts(db, batch_size):
+            if fmt == ExportFormat.csv:
+                yield encode_csv(rows)
+            else:
+                yield encode_ndjson(rows)
@@ -0,0 +1,236 @@
+import csv
+import enum
+import json
+
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.conf.config import config
+from src.entity.models import User
+from src.repository import contacts as repositories_contacts
+from src.schemas.contact import ContactSchema, ContactImportError, ContactImportReport
+
+MAX_LINE_BYTES = 64 * 1024
+CSV_COLUMNS = ("name", "surname", "email", "phone", "birthday", "notes")
+
+
+class ImportFormat(str, enum.Enum):
+    csv: str = "csv"
+    ndjson: str = "ndjson"
+
+
+CONTENT_TYPES = {
+    "text/csv": ImportFormat.csv,
+    "application/csv": ImportFormat.csv,
+    "application/x-ndjson": ImportFormat.ndjson,
+    "application/ndjson": ImportFormat.ndjson,
+    "application/jsonl": ImportFormat.ndjson,
+}
+
+
+class ImportRejected(Exception):
+    pass
+
+
+def detect_format(content_type: str | None) -> ImportFormat | None:
+    """
+    The detect_format function picks the import format from the Content-Type header of the upload.
+
+    :param content_type: str | None: The Content-Type header
+    :return: The format, or None if the content type is not one we import
+    :doc-author: Trelent
+    """
+    if not content_type:
+        return None
+    return CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes], max_bytes: int = MAX_LINE_BYTES
+) -> AsyncIterator[tuple[int, bytes | None]]:
+    """
+    The iter_lines function splits a stream of body chunks into numbered lines while holding at most one partial line in memory. A line longer than max_bytes is dropped and yielded as None, so a malformed upload cannot make the buffer grow without bound.
+
+    :param chunks: AsyncIterator[bytes]: The request body
+    :param max_bytes: int: Longest line that is kept
+    :return: Pairs of line number and line (None for an overlong line)
+    :doc-author: Trelent
+    """
+    number, buffer, overlong = 0, b"", False
+    async for chunk in chunks:
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, None if overlong else line
+            overlong = False
+        if len(buffer) > max_bytes:
+            overlong, buffer = True, b""
+    if buffer or overlong:
+        yield number + 1, None if overlong else buffer
+
+
+def _decode(line: bytes, first: bool) -> str:
+    return line.decode("utf-8-sig" if first else "utf-8").rstrip("\r")
+
+
+def _ends_quoted(text: str, quoted: bool) -> bool:
+    # Follows csv.reader: a quote opens a quoted field only at the start of a
+    # field, and "" inside one is a literal quote.
+    field_start, closed = not quoted, False
+    for char in text:
+        if quoted:
+            quoted = char != '"'
+            closed = not quoted
+            continue
+        if char == '"' and (field_start or closed):
+            quoted = True
+        field_start, closed = char == ",", False
+    return quoted
+
+
+async def _csv_records(lines: AsyncIterator[tuple[int, bytes | None]]):
+    header = None
+    start, pending, size, quoted = 0, [], 0, False
+    async for number, line in lines:
+        if line is None:
+            yield number, None, f"Line is longer than {MAX_LINE_BYTES} bytes"
+            pending, size, quoted = [], 0, False
+            continue
+        try:
+            text = _decode(line, first=number == 1)
+        except UnicodeDecodeError:
+            yield number, None, "Line is not valid UTF-8"
+            pending, size, quoted = [], 0, False
+            continue
+        if not pending:
+            start = number
+        pending.append(text)
+        size += len(line)
+        quoted = _ends_quoted(text, quoted)
+        if quoted:
+            if size > MAX_LINE_BYTES:
+                yield start, None, f"Record is longer than {MAX_LINE_BYTES} bytes"
+                pending, size, quoted = [], 0, False
+            # A quoted field continues on the next line.
+            continue
+        record = "\n".join(pending)
+        pending, size = [], 0
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [value.strip().lower() for value in values]
+            missing = [column for column in CSV_COLUMNS[:5] if column not in header]
+            if missing:
+                raise ImportRejected(
+                    f"CSV header is missing columns: {', '.join(missing)}"
+                )
+            continue
+        if len(values) != len(header):
+            yield start, None, f"Expected {len(header)} fields, got {len(values)}"
+            continue
+        yield start, {
+            column: value if value != "" else None
+            for column, value in zip(header, values)
+            if column in CSV_COLUMNS
+        }, None
+    if pending:
+        yield start, None, "Unterminated quoted field"
+
+
+async def _ndjson_records(lines: AsyncIterator[tuple[int, bytes | None]]):
+    async for number, line in lines:
+        if line is None:
+            yield number, None, f"Line is longer than {MAX_LINE_BYTES} bytes"
+            continue
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as err:
+            yield number, None, f"Invalid JSON: {err}"
+            continue
+        if not isinstance(data, dict):
+            yield number, None, "Expected a JSON object"
+            continue
+        yield number, data, None
+
+
+def iter_records(chunks: AsyncIterator[bytes], fmt: ImportFormat):
+    """
+    The iter_records function parses a streamed CSV or NDJSON upload into raw contact records. CSV needs a header row naming the columns; a quoted field may span lines.
+
+    :param chunks: AsyncIterator[bytes]: The request body
+    :param fmt: ImportFormat: Format of the upload
+    :return: Triples of line number, record (or None) and error (or None)
+    :doc-author: Trelent
+    """
+    lines = iter_lines(chunks)
+    if fmt == ImportFormat.csv:
+        return _csv_records(lines)
+    return _ndjson_records(lines)
+
+
+def _validation_message(err: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in err.errors()
+    )
+
+
+async def import_contacts(
+    chunks: AsyncIterator[bytes],
+    fmt: ImportFormat,
+    db: AsyncSession,
+    user: User,
+    batch_size: int = config.IMPORT_BATCH_SIZE,
+    max_errors: int = config.IMPORT_MAX_ERRORS,
+) -> ContactImportReport:
+    """
+    The import_contacts function streams an upload into the user's contacts. Rows are validated with ContactSchema and inserted batch_size at a time, so memory stays bounded by one batch whatever the size of the upload. Rows whose email or phone the user already has are counted as duplicates; invalid rows are reported by line, up to max_errors of them.
+
+    :param chunks: AsyncIterator[bytes]: The request body
+    :param fmt: ImportFormat: Format of the upload
+    :param db: AsyncSession: Pass the database session to the function
+    :param user: User: Owner of the imported contacts
+    :param batch_size: int: Rows per INSERT statement
+    :param max_errors: int: Most errors listed in the report
+    :return: Counts of imported, duplicate and failed rows, with the first errors
+    :doc-author: Trelent
+    """
+    report = ContactImportReport()
+    batch: dict[str, dict] = {}
+
+    def fail(line: int, error: str) -> None:
+        report.failed += 1
+        if len(report.errors) < max_errors:
+            report.errors.append(ContactImportError(line=line, error=error))
+
+    async def flush() -> None:
+        inserted = await repositories_contacts.insert_contacts(
+            list(batch.values()), db, user
+        )
+        report.imported += len(inserted)
+        report.duplicates += len(batch) - len(inserted)
+        batch.clear()
+
+    async for line, record, error in iter_records(chunks, fmt):
+        if error is not None:
+            fail(line, error)
+            continue
+        try:
+            contact = ContactSchema.model_validate(record)
+        except ValidationError as err:
+            fail(line, _validation_message(err))
+            continue
+        if contact.email in batch:
+            report.duplicates += 1
+            continue
+        batch[contact.email] = contact.model_dump()
+        if len(batch) >= batch_size:
+            await flush()
+    if batch:
+        await flush()
+    return report
@@ -1,30 +1,13 @@
-from pathlib import Path
-
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
 from pydantic import EmailStr
+from redis.exceptions import RedisError
 
 from src.services.auth import auth_service
-from src.conf.config import config
-
-conf = ConnectionConfig(
-    MAIL_USERNAME=config.MAIL_USERNAME,
-    MAIL_PASSWORD=config.MAIL_PASSWORD,
-    MAIL_FROM=config.MAIL_FROM,
-    MAIL_PORT=config.MAIL_PORT,
-    MAIL_SERVER=config.MAIL_SERVER,
-    MAIL_FROM_NAME="Contact&Contact Systems",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / "templates",
-)
+from src.services.mail_queue import mail_queue
 
 
 async def send_email(email: EmailStr, username: str, host: str):
     """
-    The send_email function sends an email to the user with a link to verify their email address.
+    The send_email function queues an email to the user with a link to verify their email address. The message is kept in Redis until a mail worker has delivered it, so it survives restarts and is retried if the SMTP server fails.
 
     :param email: EmailStr: Specify the email address to send the message to
     :param username: str: Pass the username to the template
@@ -34,18 +17,17 @@ async def send_email(email: EmailStr, username: str, host: str):
     """
     try:
         token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={
-                "host": host,
-                "username": username,
-                "token": token_verification,
-            },
-            subtype=MessageType.html,
+        await mail_queue.put(
+            {
+                "to": email,
+                "subject": "Confirm your email ",
+                "template": "verify_email.html",
+                "body": {
+                    "host": host,
+                    "username": username,
+                    "token": token_verification,
+                },
+            }
         )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="verify_email.html")
-    except ConnectionErrors as err:
+    except RedisError as err:
         print(err)
@@ -0,0 +1,38 @@
+import hashlib
+
+from fastapi import Response, status
+
+
+def make_etag(*parts) -> str:
+    """
+    The make_etag function builds a weak ETag from the values a representation depends on. It is weak because the same contact may be sent with different encodings (compressed or not).
+
+    :param parts: The values that identify the representation
+    :return: The ETag, quoted and with the W/ prefix
+    :doc-author: Trelent
+    """
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode())
+    return f'W/"{digest.hexdigest()[:20]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str | None) -> bool:
+    """
+    The etag_matches function tells whether an If-None-Match header names the current ETag, using the weak comparison that conditional GET calls for.
+
+    :param if_none_match: str | None: The If-None-Match request header
+    :param etag: str | None: The current ETag, or None if there is none
+    :return: True if the client's copy is current
+    :doc-author: Trelent
+    """
+    if not if_none_match or etag is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == current for tag in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
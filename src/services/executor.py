@@ -0,0 +1,48 @@
+import asyncio
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class ExecutorSaturated(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """
+    A thread pool for blocking CPU work with a hard limit on queued calls.
+
+    Once ``max_workers + max_queue`` calls are in flight, ``run`` raises
+    ``ExecutorSaturated`` instead of queueing more work behind them. A call
+    holds its slot until its thread is done with it, even when the caller
+    has stopped waiting, so cancelled requests cannot oversubscribe the pool.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, thread_name_prefix: str):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=thread_name_prefix
+        )
+        self._lock = threading.Lock()
+        self.limit = max_workers + max_queue
+        self.pending = 0
+
+    def _release(self, future: Future | None = None) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        with self._lock:
+            if self.pending >= self.limit:
+                raise ExecutorSaturated(f"{self.pending} calls already in flight")
+            self.pending += 1
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+import redis.asyncio as redis
+from sqlalchemy import text
+
+from src.conf.config import config
+from src.database.cache import redismanager
+from src.database.db import DatabaseSessionManager, sessionmanager
+
+
+class HealthChecker:
+    """
+    Pings the database and Redis in the background and keeps the outcome.
+
+    Probes read the last outcome instead of opening a connection each, so
+    however often they come the database sees one SELECT 1 per interval per
+    worker. An outcome older than stale_after counts as a failure: it means
+    the checker itself is stuck.
+    """
+
+    def __init__(
+        self,
+        sessionmanager: DatabaseSessionManager,
+        client: redis.Redis,
+        interval: float,
+        timeout: float,
+        stale_after: float,
+    ):
+        self.sessionmanager = sessionmanager
+        self.client = client
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.started_at = time.time()
+        self.results: dict[str, dict] = {}
+        self._task: asyncio.Task | None = None
+
+    async def _ping_database(self) -> dict:
+        started = time.perf_counter()
+        async with self.sessionmanager.engine.connect() as connection:
+            checked_out = time.perf_counter()
+            await connection.execute(text("SELECT 1"))
+        done = time.perf_counter()
+        pool = self.sessionmanager.pool_stats()
+        return {
+            "pool_ms": round((checked_out - started) * 1000, 3),
+            "latency_ms": round((done - checked_out) * 1000, 3),
+            "pool": {key: pool[key] for key in ("size", "checked_out", "overflow")},
+        }
+
+    async def _ping_redis(self) -> dict:
+        started = time.perf_counter()
+        await self.client.ping()
+        return {"latency_ms": round((time.perf_counter() - started) * 1000, 3)}
+
+    async def _check(self, name: str, ping) -> None:
+        try:
+            result = {"ok": True} | await asyncio.wait_for(ping(), self.timeout)
+        except Exception as err:
+            print(err)
+            result = {"ok": False, "error": repr(err)}
+        self.results[name] = result | {"checked_at": time.time()}
+
+    async def check(self) -> dict:
+        """
+        The check function pings the database and Redis at the same time, each within the timeout, and keeps the outcome for the probes.
+
+        :param self: Represent the instance of the class
+        :return: The outcome of both checks
+        :doc-author: Trelent
+        """
+        await asyncio.gather(
+            self._check("database", self._ping_database),
+            self._check("redis", self._ping_redis),
+        )
+        return self.results
+
+    def ready(self) -> tuple[bool, dict]:
+        """
+        The ready function tells from the last checks, without any I/O, whether this worker can serve requests: both the database and Redis answered, recently enough.
+
+        :param self: Represent the instance of the class
+        :return: Whether the worker is ready, and the checks it was decided on
+        :doc-author: Trelent
+        """
+        now = time.time()
+        checks = {}
+        for name in ("database", "redis"):
+            result = self.results.get(name)
+            if result is None:
+                checks[name] = {"ok": False, "error": "not checked yet"}
+                continue
+            age = now - result["checked_at"]
+            checks[name] = result | {"age": round(age, 3)}
+            if age > self.stale_after:
+                checks[name] |= {"ok": False, "error": "check is stale"}
+        return all(check["ok"] for check in checks.values()), checks
+
+    def live(self) -> dict:
+        return {"status": "alive", "uptime": round(time.time() - self.started_at, 3)}
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+
+health_checker = HealthChecker(
+    sessionmanager,
+    redismanager.client,
+    config.HEALTH_CHECK_INTERVAL,
+    config.HEALTH_CHECK_TIMEOUT,
+    config.HEALTH_STALE_AFTER,
+)
@@ -0,0 +1,354 @@
+import asyncio
+import json
+import os
+import random
+import socket
+import time
+import uuid
+
+from email.message import EmailMessage
+from email.utils import formataddr
+
+import aiosmtplib
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from src.conf.config import config
+from src.database.cache import redismanager
+from src.services.rendering import email_templates
+
+FROM_NAME = "Contact&Contact Systems"
+# An SMTP session left idle longer than this is likely closed by the server.
+SESSION_IDLE = 30
+
+# Moves the retries that are due back onto the queue, atomically.
+PROMOTE_DUE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, raw in ipairs(due) do
+    redis.call('ZREM', KEYS[1], raw)
+    redis.call('LPUSH', KEYS[2], raw)
+end
+return #due
+"""
+
+# Puts the messages of consumers whose heartbeat expired (or of the consumer
+# named in ARGV[2]) back at the head of the queue and forgets the consumers.
+REQUEUE_ORPHANS = """
+local moved = 0
+for _, consumer in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    local heartbeat = ARGV[1] .. ':heartbeat:' .. consumer
+    if consumer == ARGV[2] or redis.call('EXISTS', heartbeat) == 0 then
+        local processing = ARGV[1] .. ':processing:' .. consumer
+        while redis.call('LMOVE', processing, KEYS[2], 'RIGHT', 'RIGHT') do
+            moved = moved + 1
+        end
+        redis.call('DEL', heartbeat)
+        redis.call('SREM', KEYS[1], consumer)
+    end
+end
+return moved
+"""
+
+
+class MailQueue:
+    """
+    Durable outbound mail queue in Redis.
+
+    Messages wait in a list. A consumer moves each one to its own processing
+    list while it is being sent and removes it once the server accepted it.
+    Consumers keep a heartbeat key alive; when one stops beating, whatever is
+    left in its processing list goes back on the queue. Failed sends wait in a sorted set scored by when they are due again;
+    messages that keep failing end up in a dead-letter list.
+    """
+
+    def __init__(self, client: redis.Redis, prefix: str):
+        self.client = client
+        self.queue = f"{prefix}:queue"
+        self.retry = f"{prefix}:retry"
+        self.dead = f"{prefix}:dead"
+        self.consumers = f"{prefix}:consumers"
+        self.prefix = prefix
+        self._promote = client.register_script(PROMOTE_DUE)
+        self._requeue = client.register_script(REQUEUE_ORPHANS)
+
+    def processing(self, consumer: str) -> str:
+        return f"{self.prefix}:processing:{consumer}"
+
+    async def put(self, message: dict) -> None:
+        message = {"id": uuid.uuid4().hex, "attempts": 0} | message
+        await self.client.lpush(self.queue, json.dumps(message))
+
+    async def take(self, consumer: str, count: int, timeout: float) -> list[bytes]:
+        """
+        The take function waits up to timeout seconds for a message, then takes up to count - 1 more that are already waiting, moving all of them to the consumer's processing list.
+
+        :param self: Represent the instance of the class
+        :param consumer: str: Name of the consumer
+        :param count: int: Most messages to take
+        :param timeout: float: Seconds to wait for the first message
+        :return: The raw messages taken, oldest first
+        :doc-author: Trelent
+        """
+        processing = self.processing(consumer)
+        first = await self.client.blmove(
+            self.queue, processing, timeout, src="RIGHT", dest="LEFT"
+        )
+        if first is None:
+            return []
+        async with self.client.pipeline(transaction=False) as pipe:
+            for _ in range(count - 1):
+                pipe.lmove(self.queue, processing, src="RIGHT", dest="LEFT")
+            rest = await pipe.execute()
+        return [first] + [raw for raw in rest if raw is not None]
+
+    async def ack(self, consumer: str, raw: bytes) -> None:
+        await self.client.lrem(self.processing(consumer), 1, raw)
+
+    async def reschedule(self, consumer: str, raw: bytes, due: float | None) -> None:
+        """
+        The reschedule function takes a message that failed off the consumer's processing list and either schedules another attempt at due or, when due is None, moves it to the dead-letter list.
+
+        :param self: Represent the instance of the class
+        :param consumer: str: Name of the consumer
+        :param raw: bytes: The message as taken from the queue
+        :param due: float | None: Unix time of the next attempt, or None to give up
+        :return: None
+        :doc-author: Trelent
+        """
+        try:
+            message = json.loads(raw)
+            message["attempts"] += 1
+            updated = json.dumps(message)
+        except (ValueError, TypeError, KeyError):
+            # Not a message we can read; keep it as it came for the dead letters.
+            updated = raw
+        async with self.client.pipeline(transaction=True) as pipe:
+            if due is None:
+                pipe.lpush(self.dead, updated)
+            else:
+                pipe.zadd(self.retry, {updated: due})
+            pipe.lrem(self.processing(consumer), 1, raw)
+            await pipe.execute()
+
+    async def promote_due(self, limit: int = 100) -> int:
+        return await self._promote(
+            keys=[self.retry, self.queue], args=[time.time(), limit]
+        )
+
+    async def heartbeat(self, consumer: str, ttl: int) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(f"{self.prefix}:heartbeat:{consumer}", 1, ex=ttl)
+            pipe.sadd(self.consumers, consumer)
+            await pipe.execute()
+
+    async def requeue_orphans(self, consumer: str = "") -> int:
+        """
+        The requeue_orphans function puts back at the head of the queue the messages taken by consumers whose heartbeat has expired, so the mail of a worker that died (or of a pod that is gone) is sent by the others.
+
+        :param self: Represent the instance of the class
+        :param consumer: str: A consumer to release as well, e.g. one that is stopping
+        :return: How many messages were put back
+        :doc-author: Trelent
+        """
+        return await self._requeue(
+            keys=[self.consumers, self.queue], args=[self.prefix, consumer]
+        )
+
+    async def stats(self) -> dict:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.llen(self.queue)
+            pipe.zcard(self.retry)
+            pipe.llen(self.dead)
+            queued, retrying, dead = await pipe.execute()
+        return {"queued": queued, "retrying": retrying, "dead": dead}
+
+
+def build_message(message: dict) -> EmailMessage:
+    email = EmailMessage()
+    email["From"] = formataddr((FROM_NAME, config.MAIL_FROM))
+    email["To"] = message["to"]
+    email["Subject"] = message["subject"]
+    html = email_templates.render(message["template"], **message["body"])
+    email.set_content(html, subtype="html")
+    return email
+
+
+def smtp_client() -> aiosmtplib.SMTP:
+    return aiosmtplib.SMTP(
+        hostname=config.MAIL_SERVER,
+        port=config.MAIL_PORT,
+        username=config.MAIL_USERNAME,
+        password=config.MAIL_PASSWORD,
+        use_tls=True,
+        start_tls=False,
+        validate_certs=True,
+    )
+
+
+def backoff(attempts: int) -> float:
+    delay = min(config.MAIL_RETRY_BASE * 2**attempts, config.MAIL_RETRY_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class MailWorker:
+    """
+    Sends the queued mail. Each of the ``consumers`` tasks keeps one SMTP
+    session open and sends every message of a batch, and of the batches that
+    follow, through it; a session is only reopened after an error or when it
+    has been idle for a while.
+
+    Every process gets its own consumer names, which it keeps alive with a
+    heartbeat. Each worker also requeues the messages of consumers whose
+    heartbeat expired. Delivery is at least once: a consumer stalled for
+    longer than the heartbeat ttl may see its message sent again by another.
+    """
+
+    def __init__(
+        self,
+        queue: MailQueue,
+        consumers: int,
+        batch_size: int,
+        smtp_factory=smtp_client,
+        name: str | None = None,
+    ):
+        self.queue = queue
+        self.consumers = consumers
+        self.batch_size = batch_size
+        self.smtp_factory = smtp_factory
+        self.name = (
+            name or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        )
+        self.heartbeat_ttl = config.MAIL_HEARTBEAT_TTL
+        self.sent = 0
+        self.failed = 0
+        self.sessions = 0
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        if not self._tasks and self.consumers > 0:
+            self._tasks = [
+                asyncio.create_task(self._consume(f"{self.name}:{index}"))
+                for index in range(self.consumers)
+            ]
+            self._tasks.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _maintain(self) -> None:
+        last_requeue = 0.0
+        while True:
+            try:
+                await self.queue.promote_due()
+                if time.monotonic() - last_requeue > self.heartbeat_ttl:
+                    await self.queue.requeue_orphans()
+                    last_requeue = time.monotonic()
+            except RedisError as err:
+                print(err)
+            await asyncio.sleep(1)
+
+    async def _beat(self, consumer: str, last_beat: float) -> float:
+        if time.monotonic() - last_beat < self.heartbeat_ttl / 3:
+            return last_beat
+        await self.queue.heartbeat(consumer, self.heartbeat_ttl)
+        return time.monotonic()
+
+    async def _consume(self, consumer: str) -> None:
+        smtp, last_used, last_beat = None, 0.0, float("-inf")
+        try:
+            while True:
+                try:
+                    last_beat = await self._beat(consumer, last_beat)
+                    batch = await self.queue.take(consumer, self.batch_size, 1)
+                    if not batch:
+                        continue
+                    if smtp is not None and time.monotonic() - last_used > SESSION_IDLE:
+                        smtp = await self._close(smtp)
+                    for raw in batch:
+                        last_beat = await self._beat(consumer, last_beat)
+                        smtp = await self._send(consumer, smtp, raw)
+                    last_used = time.monotonic()
+                except RedisError as err:
+                    print(err)
+                    await asyncio.sleep(1)
+        finally:
+            await self._close(smtp)
+            try:
+                await self.queue.requeue_orphans(consumer)
+            except RedisError as err:
+                print(err)
+
+    async def _send(self, consumer: str, smtp, raw: bytes):
+        try:
+            message = json.loads(raw)
+            email = build_message(message)
+        except Exception as err:
+            # A message that cannot be built never will be; retrying it would
+            # only bring it back to this point.
+            print(f"Undeliverable mail: {err!r}")
+            self.failed += 1
+            await self.queue.reschedule(consumer, raw, None)
+            return smtp
+        try:
+            if smtp is None:
+                smtp = self.smtp_factory()
+                await smtp.connect()
+                self.sessions += 1
+            await smtp.send_message(email)
+        except (aiosmtplib.SMTPException, OSError, asyncio.TimeoutError) as err:
+            print(err)
+            self.failed += 1
+            permanent = isinstance(err, aiosmtplib.SMTPResponseException) and (
+                err.code >= 500
+            )
+            if message["attempts"] + 1 >= config.MAIL_MAX_ATTEMPTS or permanent:
+                due = None
+            else:
+                due = time.time() + backoff(message["attempts"])
+            await self.queue.reschedule(consumer, raw, due)
+            if not isinstance(err, aiosmtplib.SMTPResponseException):
+                smtp = await self._close(smtp)
+            return smtp
+        except Exception as err:
+            print(f"Undeliverable mail: {err!r}")
+            self.failed += 1
+            await self.queue.reschedule(consumer, raw, None)
+            return await self._close(smtp)
+        self.sent += 1
+        await self.queue.ack(consumer, raw)
+        return smtp
+
+    @staticmethod
+    async def _close(smtp) -> None:
+        if smtp is None:
+            return None
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except (aiosmtplib.SMTPException, OSError):
+            smtp.close()
+        return None
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "failed": self.failed, "sessions": self.sessions}
+
+
+mail_queue = MailQueue(redismanager.client, config.MAIL_QUEUE_PREFIX)
+mail_worker = MailWorker(mail_queue, config.MAIL_WORKERS, config.MAIL_BATCH_SIZE)
+
+
+async def main():
+    email_templates.compile()
+    worker = MailWorker(mail_queue, max(config.MAIL_WORKERS, 1), config.MAIL_BATCH_SIZE)
+    await worker.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await worker.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+import struct
+
+from src.entity.models import User, Role
+
+PRINCIPAL_VERSION = 1
+
+_ROLES = list(Role)
+_NO_ROLE = 0xFF
+_NULL = 0xFFFF
+_HEADER = struct.Struct(">BQB?")
+_LENGTH = struct.Struct(">H")
+
+
+def _pack_str(value: str | None) -> bytes:
+    if value is None:
+        return _LENGTH.pack(_NULL)
+    encoded = value.encode()
+    return _LENGTH.pack(len(encoded)) + encoded
+
+
+def _unpack_str(data: bytes, offset: int) -> tuple[str | None, int]:
+    (length,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    if length == _NULL:
+        return None, offset
+    return data[offset : offset + length].decode(), offset + length
+
+
+def dump_principal(user: User) -> bytes:
+    """
+    The dump_principal function packs the fields of a user needed by UserResponse and RoleAccess into a compact binary record. The first byte is the schema version.
+
+    :param user: User: The user to serialize
+    :return: The packed record
+    :doc-author: Trelent
+    """
+    role = _ROLES.index(Role(user.role)) if user.role is not None else _NO_ROLE
+    return (
+        _HEADER.pack(PRINCIPAL_VERSION, user.id, role, bool(user.confirmed))
+        + _pack_str(user.username)
+        + _pack_str(user.email)
+        + _pack_str(user.avatar)
+    )
+
+
+def load_principal(data: bytes) -> User | None:
+    """
+    The load_principal function rebuilds a detached User from a record made by dump_principal. Records of any other schema version (including old pickles) are treated as a cache miss.
+
+    :param data: bytes: The packed record
+    :return: A User with only the cached fields set, or None if the record cannot be read
+    :doc-author: Trelent
+    """
+    if not data or data[0] != PRINCIPAL_VERSION:
+        return None
+    _, user_id, role, confirmed = _HEADER.unpack_from(data)
+    offset = _HEADER.size
+    username, offset = _unpack_str(data, offset)
+    email, offset = _unpack_str(data, offset)
+    avatar, offset = _unpack_str(data, offset)
+    return User(
+        id=user_id,
+        username=username,
+        email=email,
+        avatar=avatar,
+        role=_ROLES[role] if role != _NO_ROLE else None,
+        confirmed=confirmed,
+    )
@@ -0,0 +1,245 @@
+import math
+import time
+
+from typing import NamedTuple
+
+import redis.asyncio as redis
+from fastapi import Depends, HTTPException, status
+from redis.exceptions import RedisError
+
+from src.conf import messages
+from src.conf.config import config
+from src.database.cache import redismanager
+from src.entity.models import Role, User
+from src.services.auth import auth_service
+from src.services.cache import LRUCache
+
+# Gives back the ARGV[5] unspent tokens of a lapsed lease, refills the shared
+# bucket for the time that passed and takes up to ARGV[4] whole tokens from it.
+# Returns the tokens granted and, when none were, the milliseconds until one is
+# there.
+TAKE_LEASE = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = tokens + math.max(0, now - ts) * rate + tonumber(ARGV[5])
+tokens = math.min(capacity, tokens)
+local granted = math.min(tonumber(ARGV[4]), math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate))
+local wait = 0
+if granted == 0 then
+    wait = math.ceil((1 - tokens) / rate)
+end
+return {granted, wait}
+"""
+
+
+class Rate(NamedTuple):
+    times: int
+    seconds: float
+
+    @classmethod
+    def parse(cls, value: str) -> "Rate | None":
+        """
+        The parse function reads a rate written as "times/seconds", such as "1/20". An empty value means no limit.
+
+        :param cls: Represent the class
+        :param value: str: The rate as it is written in the settings
+        :return: The rate, or None for no limit
+        :doc-author: Trelent
+        """
+        if not value:
+            return None
+        times, seconds = value.split("/")
+        return cls(int(times), float(seconds))
+
+
+class Lease:
+    def __init__(
+        self,
+        tokens: int,
+        expires_at: float,
+        started_at: float,
+        blocked_until: float = 0.0,
+    ):
+        self.tokens = tokens
+        self.spent = 0
+        self.expires_at = expires_at
+        self.started_at = started_at
+        self.blocked_until = blocked_until
+
+
+class TokenBuckets:
+    """
+    Token buckets shared by all workers through Redis, consulted in leases.
+
+    A worker takes a share of a bucket's tokens in one round trip and spends
+    them locally. A lease is sized from the rate at which this worker has
+    been spending the key's tokens: enough for the time the bucket takes to
+    refill lease_fraction of itself, and no more than that fraction. It lasts
+    that long; tokens still unspent then are given back with the next lease
+    for the key. The bucket grants what it holds up to the size asked for.
+    When it holds no whole token the worker remembers until when, and refuses
+    requests for that key without asking Redis again. Every token comes out
+    of the shared bucket, so the workers together never exceed the limit.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        prefix: str,
+        lease_fraction: float,
+        maxsize: int,
+    ):
+        self.client = client
+        self.prefix = prefix
+        self.lease_fraction = lease_fraction
+        self.local = LRUCache(maxsize, ttl=0)
+        self.decisions = {"local": 0, "redis": 0}
+        self.rejected = 0
+        self.errors = 0
+        self._take = client.register_script(TAKE_LEASE)
+
+    def lease_term(self, rate: Rate) -> float:
+        return max(1, int(rate.times * self.lease_fraction)) * rate.seconds / rate.times
+
+    def lease_size(self, rate: Rate, lease: Lease | None, now: float) -> int:
+        """
+        The lease_size function decides how many tokens to ask for: as many as this worker is expected to spend on the key during a lease, going by the requests it saw since it took the last one. A key without a lease gets a single token. The size is capped at lease_fraction of the bucket.
+
+        :param self: Represent the instance of the class
+        :param rate: Rate: Size and refill of the bucket
+        :param lease: Lease | None: The last lease for the key
+        :param now: float: The current time
+        :return: The number of tokens to ask for
+        :doc-author: Trelent
+        """
+        limit = max(1, int(rate.times * self.lease_fraction))
+        if lease is None:
+            return 1
+        # The spent tokens and the request asking now.
+        demand = (lease.spent + 1) / max(now - lease.started_at, 0.001)
+        return min(limit, max(1, math.ceil(demand * self.lease_term(rate))))
+
+    async def acquire(self, key: str, rate: Rate) -> float:
+        """
+        The acquire function spends one token of the key's bucket. It is answered from the local lease when possible and takes a new lease from Redis otherwise, giving back what is left of a lapsed one. If Redis cannot be reached the request is let through.
+
+        :param self: Represent the instance of the class
+        :param key: str: The bucket, e.g. the route and the user
+        :param rate: Rate: Size and refill of the bucket
+        :return: 0 if the request may go ahead, else the seconds until it may be retried
+        :doc-author: Trelent
+        """
+        now = time.time()
+        lease = self.local.get(key)
+        refund = 0
+        if lease is not None:
+            if lease.expires_at > now and lease.tokens > 0:
+                lease.tokens -= 1
+                lease.spent += 1
+                self.decisions["local"] += 1
+                return 0
+            if lease.blocked_until > now:
+                self.decisions["local"] += 1
+                self.rejected += 1
+                return lease.blocked_until - now
+            if lease.expires_at <= now:
+                # Taken here so that concurrent requests give them back once.
+                refund, lease.tokens = lease.tokens, 0
+
+        size = self.lease_size(rate, lease, now)
+        try:
+            granted, wait_ms = await self._take(
+                keys=[f"{self.prefix}:{key}"],
+                args=[
+                    rate.times,
+                    rate.times / (rate.seconds * 1000),
+                    int(now * 1000),
+                    size,
+                    refund,
+                ],
+            )
+        except RedisError as err:
+            print(err)
+            self.errors += 1
+            return 0
+        self.decisions["redis"] += 1
+
+        if granted:
+            # Another request may have taken a lease for the key meanwhile.
+            current = self.local.get(key)
+            tokens = granted - 1
+            if current is not None and current.expires_at > now:
+                tokens += current.tokens
+            expires_at = now + self.lease_term(rate)
+            lease = Lease(tokens, expires_at, now)
+            lease.spent = 1
+            # Kept until the bucket would have refilled, to give back what is left.
+            self.local.set(key, lease, expires_at=expires_at + rate.seconds)
+            return 0
+        blocked_until = now + wait_ms / 1000
+        lease = Lease(0, blocked_until, now, blocked_until)
+        self.local.set(key, lease, expires_at=blocked_until + rate.seconds)
+        self.rejected += 1
+        return wait_ms / 1000
+
+    def stats(self) -> dict:
+        decisions = sum(self.decisions.values())
+        return {
+            "decisions": self.decisions,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "local_rate": (
+                round(self.decisions["local"] / decisions, 4) if decisions else 0.0
+            ),
+            "local_size": len(self.local),
+        }
+
+
+rate_limits = TokenBuckets(
+    redismanager.client,
+    config.RATE_LIMIT_PREFIX,
+    config.RATE_LIMIT_LEASE,
+    config.RATE_LIMIT_LOCAL_SIZE,
+)
+
+
+class RateLimiter:
+    """
+    Limits how often each user may call a route.
+
+    The rate comes from RATE_LIMITS under "<route>:<role>", falling back to
+    "<route>". A route without an entry, or a role with an empty one, is not
+    limited.
+    """
+
+    def __init__(self, route: str, buckets: TokenBuckets = rate_limits):
+        self.route = route
+        self.buckets = buckets
+        self.default = Rate.parse(config.RATE_LIMITS.get(route, ""))
+        self.rates = {
+            role: Rate.parse(config.RATE_LIMITS[f"{route}:{role.value}"])
+            for role in Role
+            if f"{route}:{role.value}" in config.RATE_LIMITS
+        }
+
+    def rate_for(self, user: User) -> Rate | None:
+        return self.rates.get(user.role, self.default)
+
+    async def __call__(self, user: User = Depends(auth_service.get_current_user)):
+        rate = self.rate_for(user)
+        if rate is None:
+            return
+        wait = await self.buckets.acquire(f"{self.route}:{user.id}", rate)
+        if wait:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=messages.TOO_MANY_REQUESTS,
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
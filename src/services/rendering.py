@@ -0,0 +1,95 @@
+import time
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+
+TEMPLATE_FOLDER = Path(__file__).parent / "templates"
+
+
+class TemplateTimings:
+    def __init__(self):
+        self.renders = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, elapsed_ns: int) -> None:
+        self.renders += 1
+        self.total_ns += elapsed_ns
+        self.max_ns = max(self.max_ns, elapsed_ns)
+
+    def stats(self) -> dict:
+        mean = self.total_ns / self.renders if self.renders else 0
+        return {
+            "renders": self.renders,
+            "mean_us": round(mean / 1000, 1),
+            "max_us": round(self.max_ns / 1000, 1),
+        }
+
+
+class TemplateRenderer:
+    """
+    Compiles the email templates once and renders them from memory.
+
+    The environment never checks the files for changes, so a render only runs
+    the compiled template with the variables of one message. compile() loads
+    every template up front, at startup; a template that was not compiled yet
+    is compiled the first time it is rendered.
+    """
+
+    def __init__(self, folder: Path = TEMPLATE_FOLDER):
+        self.environment = Environment(
+            loader=FileSystemLoader(folder),
+            autoescape=select_autoescape(["html"]),
+            auto_reload=False,
+        )
+        self.templates: dict[str, Template] = {}
+        self.timings: dict[str, TemplateTimings] = {}
+        self.compile_ns = 0
+
+    def compile(self) -> int:
+        """
+        The compile function loads and compiles every template in the folder and keeps the compiled templates, so no message has to touch the filesystem or the Jinja compiler.
+
+        :param self: Represent the instance of the class
+        :return: How many templates were compiled
+        :doc-author: Trelent
+        """
+        start = time.perf_counter_ns()
+        for name in self.environment.list_templates():
+            self._load(name)
+        self.compile_ns = time.perf_counter_ns() - start
+        return len(self.templates)
+
+    def _load(self, name: str) -> Template:
+        template = self.environment.get_template(name)
+        self.templates[name] = template
+        self.timings.setdefault(name, TemplateTimings())
+        return template
+
+    def render(self, name: str, **context) -> str:
+        """
+        The render function renders a compiled template with the variables of one message and records how long it took.
+
+        :param self: Represent the instance of the class
+        :param name: str: Name of the template, relative to the folder
+        :param **context: The variables of the message
+        :return: The rendered template
+        :doc-author: Trelent
+        """
+        template = self.templates.get(name) or self._load(name)
+        start = time.perf_counter_ns()
+        rendered = template.render(context)
+        self.timings[name].record(time.perf_counter_ns() - start)
+        return rendered
+
+    def stats(self) -> dict:
+        return {
+            "compiled": len(self.templates),
+            "compile_ms": round(self.compile_ns / 1e6, 2),
+            "templates": {
+                name: timings.stats() for name, timings in self.timings.items()
+            },
+        }
+
+
+email_templates = TemplateRenderer()
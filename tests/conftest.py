@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sess
 
 from main import app
 from src.entity.models import Base, User
-from src.database.db import get_db
+from src.database.db import DatabaseSessionManager, get_db
 from src.services.auth import auth_service
 
 
@@ -22,6 +22,11 @@ engine = create_async_engine(
 TestingSessionLocal = async_sessionmaker(
     autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
 )
+testing_sessionmanager = DatabaseSessionManager(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
 
 test_user = {"username": "test", "email": "test@test.com", "password": "123456789"}
 
@@ -39,6 +44,7 @@ def init_models_wrap():
                 email=test_user["email"],
                 password=hash_password,
                 confirmed=True,
+                avatar="https://www.gravatar.com/avatar/test",
                 role="admin",
             )
             session.add(current_user)
@@ -52,15 +58,15 @@ def client(init_models_wrap):
     # Dependency override
 
     async def override_get_db():
-        session = TestingSessionLocal()
-        try:
+        async with testing_sessionmanager.session() as session:
             yield session
-        except Exception as err:
-            print(err)
-            await session.rollback()
-        finally:
-            await session.close()
 
     app.dependency_overrides[get_db] = override_get_db
 
     yield TestClient(app)
+
+
+@pytest_asyncio.fixture()
+async def get_token():
+    token = await auth_service.create_access_token(data={"sub": test_user["email"]})
+    return token
@@ -0,0 +1,349 @@
+from collections import defaultdict
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy import update
+
+from src.conf import messages
+from src.entity.models import Contact, ContactTombstone, User
+from src.services.auth import auth_service
+from src.services.cache import contact_versions, contacts_cache
+from tests.conftest import TestingSessionLocal
+
+contact_data = {
+    "name": "Wade",
+    "surname": "Wilson",
+    "email": "wade@wilson.net",
+    "phone": "380501234567",
+    "birthday": "1991-02-01",
+    "notes": "merc with a mouth",
+}
+
+
+class FakeVersions:
+    def __init__(self):
+        self.versions = defaultdict(int)
+
+    async def get(self, owner_id):
+        return self.versions[owner_id]
+
+    async def bump(self, owner_id):
+        self.versions[owner_id] += 1
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes = {}
+
+    async def hgetall(self, key):
+        return {
+            field.encode(): value for field, value in self.hashes.get(key, {}).items()
+        }
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def hset(self, key, mapping):
+        self.client.hashes[key] = dict(mapping)
+
+    def expire(self, key, seconds):
+        pass
+
+    async def execute(self):
+        pass
+
+
+@pytest.fixture()
+def auth(client, get_token, monkeypatch):
+    cache = AsyncMock()
+    cache.get.return_value = None
+    monkeypatch.setattr(auth_service, "cache", cache)
+    versions = FakeVersions()
+    monkeypatch.setattr(contact_versions, "get", versions.get)
+    monkeypatch.setattr(contact_versions, "bump", versions.bump)
+    monkeypatch.setattr(contacts_cache, "client", FakeRedis())
+    return {"Authorization": f"Bearer {get_token}"}
+
+
+def revalidate(client, url, headers, etag):
+    return client.get(url, headers=headers | {"If-None-Match": etag})
+
+
+def test_create_contact(client, auth):
+    response = client.post("api/contacts", json=contact_data, headers=auth)
+    assert response.status_code == 201, response.text
+    assert response.json()["id"] == 1
+
+
+def test_get_contact_not_modified(client, auth):
+    response = client.get("api/contacts/1", headers=auth)
+    assert response.status_code == 200, response.text
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    response = revalidate(client, "api/contacts/1", auth, etag)
+    assert response.status_code == 304, response.text
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+    response = revalidate(client, "api/contacts/1", auth, 'W/"stale"')
+    assert response.status_code == 200, response.text
+
+
+def test_get_contacts_not_modified(client, auth):
+    response = client.get("api/contacts", headers=auth)
+    assert response.status_code == 200, response.text
+    etag = response.headers["ETag"]
+
+    response = revalidate(client, "api/contacts", auth, etag)
+    assert response.status_code == 304, response.text
+
+    response = client.get("api/contacts", params={"lean": True}, headers=auth)
+    assert response.status_code == 200, response.text
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_owner_change_invalidates_etags(client, auth):
+    contact_etag = client.get("api/contacts/1", headers=auth).headers["ETag"]
+    list_etag = client.get("api/contacts", headers=auth).headers["ETag"]
+    lean_etag = client.get("api/contacts?lean=true", headers=auth).headers["ETag"]
+
+    avatar = "https://www.gravatar.com/avatar/changed"
+    async with TestingSessionLocal() as session:
+        await session.execute(update(User).where(User.id == 1).values(avatar=avatar))
+        await session.commit()
+
+    response = revalidate(client, "api/contacts/1", auth, contact_etag)
+    assert response.status_code == 200, response.text
+    assert response.json()["user"]["avatar"] == avatar
+    response = revalidate(client, "api/contacts", auth, list_etag)
+    assert response.status_code == 200, response.text
+    assert response.json()[0]["user"]["avatar"] == avatar
+    response = revalidate(client, "api/contacts?lean=true", auth, lean_etag)
+    assert response.status_code == 304, response.text
+
+
+def test_update_invalidates_etags(client, auth):
+    contact_etag = client.get("api/contacts/1", headers=auth).headers["ETag"]
+    list_etag = client.get("api/contacts", headers=auth).headers["ETag"]
+
+    response = client.patch(
+        "api/contacts/1", json={"notes": "fourth wall"}, headers=auth
+    )
+    assert response.status_code == 200, response.text
+
+    response = revalidate(client, "api/contacts/1", auth, contact_etag)
+    assert response.status_code == 200, response.text
+    assert response.json()["notes"] == "fourth wall"
+    assert response.headers["ETag"] != contact_etag
+
+    response = revalidate(client, "api/contacts", auth, list_etag)
+    assert response.status_code == 200, response.text
+    assert response.json()[0]["notes"] == "fourth wall"
+
+    updated = contact_data | {"notes": "healing factor"}
+    contact_etag = response.headers["ETag"]
+    response = client.put("api/contacts/1", json=updated, headers=auth)
+    assert response.status_code == 200, response.text
+    response = revalidate(client, "api/contacts", auth, contact_etag)
+    assert response.status_code == 200, response.text
+
+
+def test_delete_invalidates_etags(client, auth):
+    contact_etag = client.get("api/contacts/1", headers=auth).headers["ETag"]
+    list_etag = client.get("api/contacts", headers=auth).headers["ETag"]
+
+    response = client.delete("api/contacts/1", headers=auth)
+    assert response.status_code == 204, response.text
+
+    response = revalidate(client, "api/contacts/1", auth, contact_etag)
+    assert response.status_code == 404, response.text
+
+    response = revalidate(client, "api/contacts", auth, list_etag)
+    assert response.status_code == 200, response.text
+    assert response.json() == []
+    assert response.headers["ETag"] != list_etag
+
+
+def test_search_is_cached_until_contacts_change(client, auth, monkeypatch):
+    monkeypatch.setattr(contacts_cache, "hits", 0)
+    monkeypatch.setattr(contacts_cache, "misses", 0)
+    response = client.post("api/contacts", json=contact_data, headers=auth)
+    assert response.status_code == 201, response.text
+    contact_id = response.json()["id"]
+
+    first = client.get("api/contacts/search/Wilson", headers=auth)
+    second = client.get("api/contacts/search/Wilson", headers=auth)
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert contacts_cache.stats()["hits"] == 1
+    assert contacts_cache.stats()["hit_rate"] == 0.5
+
+    response = client.patch(
+        f"api/contacts/{contact_id}", json={"surname": "Wilsonn"}, headers=auth
+    )
+    assert response.status_code == 200, response.text
+    response = client.get("api/contacts/search/Wilson", headers=auth)
+    assert response.json()[0]["surname"] == "Wilsonn"
+
+    response = client.delete(f"api/contacts/{contact_id}", headers=auth)
+    assert response.status_code == 204, response.text
+    response = client.get("api/contacts/search/Wilson", headers=auth)
+    assert response.json() == []
+    assert contacts_cache.stats()["hits"] == 1
+
+
+def test_cache_stats(client, auth):
+    response = client.get("api/internal/cache", headers=auth)
+    assert response.status_code == 200, response.text
+    assert set(response.json()["contacts"]) == {"hits", "misses", "errors", "hit_rate"}
+
+
+@pytest.mark.asyncio
+async def test_sync_returns_changes_since_watermark(client, auth, monkeypatch):
+    for i in range(3):
+        body = contact_data | {"email": f"sync{i}@wilson.net", "phone": f"38050000{i}"}
+        response = client.post("api/contacts", json=body, headers=auth)
+        assert response.status_code == 201, response.text
+    response = client.get("api/contacts/sync", headers=auth)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    ids = [contact["id"] for contact in data["contacts"]]
+    assert len(ids) == 3
+    assert data["deleted"] == []
+    assert data["watermark"]
+
+    # Move everything so far well before the watermark used below.
+    async with TestingSessionLocal() as session:
+        await session.execute(update(Contact).values(updated_at=datetime(2020, 1, 1)))
+        await session.execute(
+            update(ContactTombstone).values(deleted_at=datetime(2020, 1, 1))
+        )
+        await session.commit()
+    monkeypatch.setattr("src.repository.contacts.config.CONTACTS_SYNC_OVERLAP", 0)
+    since = {"since": "2021-01-01T00:00:00"}
+    response = client.get("api/contacts/sync", params=since, headers=auth)
+    assert response.json()["contacts"] == []
+
+    response = client.patch(
+        f"api/contacts/{ids[0]}", json={"notes": "synced"}, headers=auth
+    )
+    assert response.status_code == 200, response.text
+    response = client.delete(f"api/contacts/{ids[1]}", headers=auth)
+    assert response.status_code == 204, response.text
+
+    response = client.get("api/contacts/sync", params=since, headers=auth)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert [contact["id"] for contact in data["contacts"]] == [ids[0]]
+    assert data["contacts"][0]["notes"] == "synced"
+    assert data["deleted"] == [ids[1]]
+
+    # A watermark with a zone is compared in the zone the columns are written in.
+    async with TestingSessionLocal() as session:
+        await session.execute(
+            update(Contact)
+            .filter_by(id=ids[0])
+            .values(updated_at=datetime(2022, 1, 1, 12))
+        )
+        await session.commit()
+    response = client.get(
+        "api/contacts/sync", params={"since": "2022-01-01T14:30:00+03:00"}, headers=auth
+    )
+    assert [contact["id"] for contact in response.json()["contacts"]] == [ids[0]]
+    response = client.get(
+        "api/contacts/sync", params={"since": "2022-01-01T13:30:00+01:00"}, headers=auth
+    )
+    assert response.json()["contacts"] == []
+
+
+def test_large_pages_are_compressed(client, auth):
+    for i in range(5):
+        body = contact_data | {"email": f"gzip{i}@wilson.net", "phone": f"38060000{i}"}
+        response = client.post("api/contacts", json=body, headers=auth)
+        assert response.status_code == 201, response.text
+
+    response = client.get("api/contacts", headers=auth | {"Accept-Encoding": "gzip"})
+    assert response.status_code == 200, response.text
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert len(response.json()) >= 5
+
+    response = client.get(
+        "api/contacts", headers=auth | {"Accept-Encoding": "identity"}
+    )
+    assert "Content-Encoding" not in response.headers
+
+
+def test_small_responses_are_not_compressed(client, auth):
+    response = client.get(
+        "api/contacts/sync",
+        params={"since": "2100-01-01T00:00:00"},
+        headers=auth | {"Accept-Encoding": "gzip"},
+    )
+    assert response.status_code == 200, response.text
+    assert "Content-Encoding" not in response.headers
+
+
+def test_update_conflict_and_clearing_notes(client, auth):
+    first = client.post(
+        "api/contacts",
+        json=contact_data | {"email": "first@wilson.net", "phone": "380501110001"},
+        headers=auth,
+    ).json()
+    client.post(
+        "api/contacts",
+        json=contact_data | {"email": "second@wilson.net", "phone": "380501110002"},
+        headers=auth,
+    )
+
+    response = client.patch(
+        f"api/contacts/{first['id']}",
+        json={"email": "second@wilson.net"},
+        headers=auth,
+    )
+    assert response.status_code == 409, response.text
+    assert response.json()["detail"] == messages.CONTACT_EXISTS
+    for clash in ({"phone": "380501110009"}, {"email": "other@wilson.net"}):
+        body = contact_data | {"email": "second@wilson.net", "phone": "380501110002"}
+        response = client.post("api/contacts", json=body | clash, headers=auth)
+        assert response.status_code == 409, response.text
+        assert response.json()["detail"] == messages.CONTACT_EXISTS
+    updated = contact_data | {"email": "first@wilson.net", "phone": "380501110002"}
+    response = client.put(f"api/contacts/{first['id']}", json=updated, headers=auth)
+    assert response.status_code == 409, response.text
+
+    response = client.patch(
+        f"api/contacts/{first['id']}", json={"notes": None}, headers=auth
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["notes"] is None
+    assert response.json()["email"] == "first@wilson.net"
+
+    response = client.patch(
+        f"api/contacts/{first['id']}", json={"notes": "kept by PATCH"}, headers=auth
+    )
+    assert response.json()["notes"] == "kept by PATCH"
+    response = client.patch(
+        f"api/contacts/{first['id']}", json={"name": "Patched"}, headers=auth
+    )
+    assert response.json()["notes"] == "kept by PATCH"
+    replaced = {key: value for key, value in contact_data.items() if key != "notes"}
+    replaced |= {"email": "first@wilson.net", "phone": "380501110001"}
+    response = client.put(f"api/contacts/{first['id']}", json=replaced, headers=auth)
+    assert response.status_code == 200, response.text
+    assert response.json()["notes"] is None
+    assert response.json()["name"] == contact_data["name"]
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from src.services.health import health_checker
+
+
+@pytest.fixture()
+def checks(monkeypatch):
+    results = {
+        "database": {"ok": True, "latency_ms": 0.4, "checked_at": time.time()},
+        "redis": {"ok": True, "latency_ms": 0.2, "checked_at": time.time()},
+    }
+    monkeypatch.setattr(health_checker, "results", results)
+    return results
+
+
+def test_liveness(client):
+    response = client.get("api/health/live")
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "alive"
+
+
+def test_readiness(client, checks):
+    response = client.get("api/health/ready")
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["status"] == "ready"
+    assert data["checks"]["redis"]["latency_ms"] == 0.2
+
+
+def test_not_ready_when_redis_is_down(client, checks):
+    checks["redis"] = {"ok": False, "error": "down", "checked_at": time.time()}
+    response = client.get("api/health/ready")
+    assert response.status_code == 503, response.text
+    assert response.json()["status"] == "unavailable"
+
+
+def test_healthchecker(client, checks):
+    response = client.get("api/healthchecker")
+    assert response.status_code == 200, response.text
+    assert response.json() == {"message": "Welcome to FastAPI!"}
+
+
+def test_healthchecker_database_down(client, checks):
+    checks["database"] = {"ok": False, "error": "refused", "checked_at": time.time()}
+    response = client.get("api/healthchecker")
+    assert response.status_code == 500, response.text
+    assert response.json()["detail"] == "Error connecting to the database"
@@ -0,0 +1,133 @@
+import re
+import unittest
+from datetime import date, datetime
+from unittest.mock import patch
+
+from sqlalchemy import event, insert, text
+
+from src.database.db import DatabaseSessionManager
+from src.entity.models import Base, Contact, User, birthday_ordinal
+from src.repository import contacts as repositories_contacts
+
+USERS = 4
+CONTACTS_PER_USER = 5000
+
+FULL_SCAN = re.compile(r"\bSCAN (TABLE )?contacts\b")
+
+
+class TestAsyncContactQueryPlans(unittest.IsolatedAsyncioTestCase):
+    """
+    Runs the user-scoped repository queries against a seeded SQLite database, captures the SQL they send and fails if
+    EXPLAIN QUERY PLAN shows a full scan of the contacts table for any of them.
+    """
+
+    async def asyncSetUp(self) -> None:
+        self.manager = DatabaseSessionManager("sqlite+aiosqlite://")
+        async with self.manager.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(
+                insert(User),
+                [
+                    {
+                        "username": f"user{u}",
+                        "email": f"user{u}@example.com",
+                        "password": "qwerty",
+                    }
+                    for u in range(1, USERS + 1)
+                ],
+            )
+            rows = []
+            for u in range(1, USERS + 1):
+                for i in range(CONTACTS_PER_USER):
+                    birthday = date(1990, 1 + i % 12, 1 + i % 28)
+                    rows.append(
+                        {
+                            "name": f"name{i}",
+                            "surname": f"surname{i % 500}",
+                            "email": f"contact{i}@example.com",
+                            "phone": f"380{i:07d}",
+                            "birthday": birthday,
+                            "birthday_ordinal": birthday_ordinal(birthday),
+                            "user_id": u,
+                        }
+                    )
+            await connection.execute(insert(Contact), rows)
+            await connection.execute(text("ANALYZE"))
+        self.user = User(id=2, username="user2", email="user2@example.com")
+        self.statements = []
+        event.listen(
+            self.manager.engine.sync_engine, "before_cursor_execute", self.capture
+        )
+
+    async def asyncTearDown(self) -> None:
+        await self.manager.close()
+
+    def capture(self, connection, cursor, statement, parameters, context, many):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+    async def assert_no_full_scan(self, query):
+        self.statements.clear()
+        async with self.manager.session() as session:
+            await query(session)
+        self.assertTrue(self.statements)
+        captured = list(self.statements)
+        async with self.manager.engine.connect() as connection:
+            for statement, parameters in captured:
+                plan = await connection.exec_driver_sql(
+                    f"EXPLAIN QUERY PLAN {statement}", parameters
+                )
+                details = [row[-1] for row in plan]
+                for detail in details:
+                    self.assertIsNone(
+                        FULL_SCAN.search(detail),
+                        f"full scan of contacts:\n{statement}\n" + "\n".join(details),
+                    )
+
+    async def test_get_contacts_first_page(self):
+        await self.assert_no_full_scan(
+            lambda db: repositories_contacts.get_contacts(500, 0, db, self.user)
+        )
+
+    async def test_get_contacts_offset_page(self):
+        await self.assert_no_full_scan(
+            lambda db: repositories_contacts.get_contacts(500, 3000, db, self.user)
+        )
+
+    async def test_get_contacts_cursor_page(self):
+        await self.assert_no_full_scan(
+            lambda db: repositories_contacts.get_contacts(
+                500, 0, db, self.user, after_id=CONTACTS_PER_USER + 3000
+            )
+        )
+
+    async def test_get_contact(self):
+        await self.assert_no_full_scan(
+            lambda db: repositories_contacts.get_contact(
+                CONTACTS_PER_USER + 1, db, self.user
+            )
+        )
+
+    async def test_search_contacts(self):
+        await self.assert_no_full_scan(
+            lambda db: repositories_contacts.search_contacts("name12", db, self.user)
+        )
+
+    async def test_congrats(self):
+        await self.assert_no_full_scan(
+            lambda db: repositories_contacts.congrats(db, self.user, days=30)
+        )
+
+    async def test_congrats_across_new_year(self):
+        with patch("src.repository.contacts.date") as mocked_date:
+            mocked_date.today.return_value = date(2024, 12, 29)
+            await self.assert_no_full_scan(
+                lambda db: repositories_contacts.congrats(db, self.user, days=7)
+            )
+
+    async def test_get_contact_changes(self):
+        await self.assert_no_full_scan(
+            lambda db: repositories_contacts.get_contact_changes(
+                datetime(2024, 1, 1), db, self.user
+            )
+        )
@@ -1,10 +1,17 @@
 import unittest
-from unittest.mock import MagicMock, AsyncMock, Mock
-from datetime import date
+from unittest.mock import MagicMock, AsyncMock, Mock, patch
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.entity.models import Contact, User
-from src.schemas.contact import ContactSchema, ContactUpdateSchema
+from src.schemas.contact import (
+    ContactSchema,
+    ContactUpdateSchema,
+    ContactPatchSchema,
+    ContactBatchPatch,
+    ContactBatchUpdate,
+)
 from src.repository.contacts import (
     get_contacts,
     get_all_contacts,
@@ -14,6 +21,12 @@ from src.repository.contacts import (
     delete_contact,
     search_contacts,
     congrats,
+    get_contacts_by_ids,
+    update_contacts,
+    delete_contacts,
+    encode_cursor,
+    decode_cursor,
+    get_contact_changes,
 )
 
 
@@ -22,6 +35,7 @@ class TestAsyncContacts(unittest.IsolatedAsyncioTestCase):
     def setUp(self) -> None:
         self.user = User(id=1, username="test_user", password="qwerty", confirmed=True)
         self.session = AsyncMock(spec=AsyncSession)
+        self.session.begin_nested = MagicMock()
 
     async def test_get_contacts(self):
         limit = 10
@@ -54,6 +68,53 @@ class TestAsyncContacts(unittest.IsolatedAsyncioTestCase):
         result = await get_contacts(limit, offset, self.session, self.user)
         self.assertEqual(result, contacts)
 
+    async def test_get_contacts_after_cursor(self):
+        mocked_contacts = Mock()
+        mocked_contacts.scalars.return_value.all.return_value = []
+        self.session.execute.return_value = mocked_contacts
+        result = await get_contacts(10, 0, self.session, self.user, after_id=20)
+        self.assertEqual(result, [])
+        statement = self.session.execute.call_args.args[0]
+        compiled = statement.compile()
+        self.assertIn("contacts.id >", str(compiled))
+        self.assertNotIn("OFFSET", str(compiled))
+        self.assertIn(20, compiled.params.values())
+
+    async def test_get_contacts_attaches_owner_without_join(self):
+        contacts = [Contact(id=1, name="test_name_1", user_id=self.user.id)]
+        mocked_contacts = Mock()
+        mocked_contacts.scalars.return_value.all.return_value = contacts
+        self.session.execute.return_value = mocked_contacts
+        result = await get_contacts(10, 0, self.session, self.user)
+        self.assertIs(result[0].user, self.user)
+        sql = str(self.session.execute.call_args.args[0].compile())
+        self.assertNotIn("JOIN", sql)
+
+    async def test_get_contacts_lean(self):
+        contacts = [Contact(id=1, name="test_name_1", user_id=self.user.id)]
+        mocked_contacts = Mock()
+        mocked_contacts.scalars.return_value.all.return_value = contacts
+        self.session.execute.return_value = mocked_contacts
+        result = await get_contacts(10, 0, self.session, self.user, lean=True)
+        self.assertNotIn("user", result[0].__dict__)
+
+    async def test_get_all_contacts_does_not_join_owners(self):
+        mocked_contacts = Mock()
+        mocked_contacts.scalars.return_value.all.return_value = []
+        self.session.execute.return_value = mocked_contacts
+        for lean in (False, True):
+            await get_all_contacts(10, 0, self.session, lean=lean)
+            sql = str(self.session.execute.call_args.args[0].compile())
+            self.assertNotIn("JOIN", sql)
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(12345)), 12345)
+
+    def test_invalid_cursor(self):
+        for cursor in ("", "not base64!", "aWQ6", "aWQ6eA", "bmFtZToy"):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
     async def test_get_all_contacts(self):
         limit = 10
         offset = 0
@@ -131,18 +192,18 @@ class TestAsyncContacts(unittest.IsolatedAsyncioTestCase):
         )
         mocked_contact = MagicMock()
         mocked_contact.scalar_one_or_none.return_value = Contact(
-            id=1,
-            name="name",
-            surname="surname",
-            email="test@email.net",
-            phone="+380939876532",
-            birthday="2024-04-09",
-            notes="test_notes",
-            user=self.user,
+            id=1, **body.model_dump()
         )
         self.session.execute.return_value = mocked_contact
         result = await update_contact(1, body, self.session, self.user)
+        self.session.execute.assert_called_once()
+        statement = self.session.execute.call_args.args[0]
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.assertTrue(sql.startswith("UPDATE contacts SET"))
+        self.assertIn("contacts.user_id = ", sql)
+        self.assertIn("RETURNING", sql)
         self.assertIsInstance(result, Contact)
+        self.assertIs(result.user, self.user)
         self.assertEqual(result.name, body.name)
         self.assertEqual(result.surname, body.surname)
         self.assertEqual(result.email, body.email)
@@ -150,6 +211,31 @@ class TestAsyncContacts(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result.birthday, body.birthday)
         self.assertEqual(result.notes, body.notes)
 
+    async def test_patch_contact_writes_only_given_fields(self):
+        body = ContactPatchSchema(phone="+380931112233", birthday="1990-12-31")
+        mocked_contact = MagicMock()
+        mocked_contact.scalar_one_or_none.return_value = Contact(id=1, name="name")
+        self.session.execute.return_value = mocked_contact
+        await update_contact(1, body, self.session, self.user)
+        statement = self.session.execute.call_args.args[0]
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        set_clause = sql[: sql.index(" WHERE ")]
+        self.assertIn("phone=", set_clause)
+        self.assertIn("birthday_ordinal=", set_clause)
+        self.assertNotIn("name=", set_clause)
+        self.assertNotIn("email=", set_clause)
+        self.assertIn(1231, statement.compile().params.values())
+
+    async def test_update_contact_not_found(self):
+        mocked_contact = MagicMock()
+        mocked_contact.scalar_one_or_none.return_value = None
+        self.session.execute.return_value = mocked_contact
+        result = await update_contact(
+            1, ContactPatchSchema(name="name"), self.session, self.user
+        )
+        self.assertIsNone(result)
+        self.session.commit.assert_not_called()
+
     async def test_delete_contact(self):
         mocked_contact = MagicMock()
         mocked_contact.scalar_one_or_none.return_value = Contact(
@@ -164,11 +250,73 @@ class TestAsyncContacts(unittest.IsolatedAsyncioTestCase):
         )
         self.session.execute.return_value = mocked_contact
         result = await delete_contact(1, self.session, self.user)
-        self.session.delete.assert_called_once()
+        self.assertEqual(self.session.execute.call_count, 2)
+        statement = self.session.execute.call_args_list[0].args[0]
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.assertTrue(sql.startswith("DELETE FROM contacts"))
+        self.assertIn("RETURNING", sql)
+        statement, rows = self.session.execute.call_args_list[1].args
+        self.assertIn("INSERT INTO contact_tombstones", str(statement.compile()))
+        self.assertEqual(rows, [{"contact_id": 1, "user_id": 1}])
+        self.session.delete.assert_not_called()
         self.session.commit.assert_called_once()
 
         self.assertIsInstance(result, Contact)
 
+    async def test_get_contacts_by_ids(self):
+        contacts = [Contact(id=3, name="name"), Contact(id=1, name="name")]
+        mocked_contacts = MagicMock()
+        mocked_contacts.scalars.return_value.all.return_value = contacts
+        self.session.execute.return_value = mocked_contacts
+        result = await get_contacts_by_ids([1, 2, 3], self.session, self.user)
+        self.assertEqual(result, {3: contacts[0], 1: contacts[1]})
+        self.session.execute.assert_called_once()
+        sql = str(self.session.execute.call_args.args[0].compile())
+        self.assertIn("contacts.id IN", sql)
+        self.assertIn("contacts.user_id =", sql)
+
+    async def test_update_contacts_in_one_statement(self):
+        self.session.begin_nested = MagicMock()
+        mocked_contacts = MagicMock()
+        mocked_contacts.scalars.return_value.all.return_value = [
+            Contact(id=1, name="first")
+        ]
+        self.session.execute.return_value = mocked_contacts
+        patches = [
+            ContactBatchPatch(id=1, name="first", birthday="1990-12-31"),
+            ContactBatchPatch(id=2, notes="changed"),
+        ]
+        result = await update_contacts(patches, self.session, self.user)
+        self.assertEqual(list(result), [1])
+        self.session.execute.assert_called_once()
+        self.session.begin_nested.assert_called_once()
+        statement = self.session.execute.call_args.args[0]
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.assertTrue(sql.startswith("UPDATE contacts SET"))
+        self.assertIn("CASE contacts.id", sql)
+        self.assertIn("ELSE contacts.notes", sql)
+        self.assertNotIn("email=", sql)
+        self.assertIn("contacts.user_id = ", sql)
+        self.assertIn("RETURNING", sql)
+        self.assertIn(1231, statement.compile().params.values())
+
+    def test_batch_update_rejects_repeated_ids(self):
+        with self.assertRaises(ValueError):
+            ContactBatchUpdate(items=[{"id": 1}, {"id": 1, "name": "name"}])
+
+    async def test_delete_contacts(self):
+        mocked_ids = MagicMock()
+        mocked_ids.scalars.return_value = [1, 3]
+        self.session.execute.return_value = mocked_ids
+        result = await delete_contacts([1, 2, 3], self.session, self.user)
+        self.assertEqual(result, {1, 3})
+        sql = str(self.session.execute.call_args_list[0].args[0].compile())
+        self.assertTrue(sql.startswith("DELETE FROM contacts"))
+        self.assertIn("contacts.user_id =", sql)
+        rows = self.session.execute.call_args_list[1].args[1]
+        self.assertEqual([row["contact_id"] for row in rows], [1, 3])
+        self.session.commit.assert_called_once()
+
     async def test_search_contacts(self):
         contacts = [
             Contact(
@@ -190,6 +338,26 @@ class TestAsyncContacts(unittest.IsolatedAsyncioTestCase):
         result = await search_contacts("test_name_1", self.session, self.user)
         self.assertEqual(result, contacts)
 
+    async def test_search_contacts_escapes_wildcards(self):
+        mocked_contacts = MagicMock()
+        mocked_contacts.scalars.return_value.all.return_value = []
+        self.session.execute.return_value = mocked_contacts
+        await search_contacts("50%_off", self.session, self.user, limit=5)
+        compiled = self.session.execute.call_args.args[0].compile()
+        self.assertIn("%50\\%\\_off%", compiled.params.values())
+        self.assertIn(5, compiled.params.values())
+
+    async def test_search_contacts_ranked_by_similarity_on_postgres(self):
+        self.session.get_bind.return_value.dialect.name = "postgresql"
+        mocked_contacts = MagicMock()
+        mocked_contacts.scalars.return_value.all.return_value = []
+        self.session.execute.return_value = mocked_contacts
+        await search_contacts("test", self.session, self.user)
+        statement = self.session.execute.call_args.args[0]
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.assertIn("similarity(contacts.name", sql)
+        self.assertIn("ILIKE", sql)
+
     async def test_congrats(self):
         contacts = [
             Contact(
@@ -212,3 +380,54 @@ class TestAsyncContacts(unittest.IsolatedAsyncioTestCase):
         self.session.execute.return_value = mocked_contacts
         result = await congrats(self.session, self.user)
         self.assertEqual(result, contacts)
+
+    async def test_congrats_window_wraps_at_year_end(self):
+        mocked_contacts = MagicMock()
+        mocked_contacts.scalars.return_value.all.return_value = []
+        self.session.execute.return_value = mocked_contacts
+        with patch("src.repository.contacts.date") as mocked_date:
+            mocked_date.today.return_value = date(2024, 12, 29)
+            await congrats(self.session, self.user, days=7)
+        compiled = self.session.execute.call_args.args[0].compile()
+        self.assertIn(" OR ", str(compiled))
+        self.assertIn(1229, compiled.params.values())
+        self.assertIn(105, compiled.params.values())
+
+    async def test_congrats_window_within_year(self):
+        mocked_contacts = MagicMock()
+        mocked_contacts.scalars.return_value.all.return_value = []
+        self.session.execute.return_value = mocked_contacts
+        with patch("src.repository.contacts.date") as mocked_date:
+            mocked_date.today.return_value = date(2024, 1, 28)
+            await congrats(self.session, self.user, days=7)
+        compiled = self.session.execute.call_args.args[0].compile()
+        self.assertIn("BETWEEN", str(compiled))
+        self.assertIn(128, compiled.params.values())
+        self.assertIn(204, compiled.params.values())
+
+    async def test_contact_changes_convert_aware_watermark(self):
+        result = MagicMock()
+        result.scalar_one.return_value = datetime(2024, 1, 1)
+        result.scalars.return_value.all.return_value = []
+        result.scalars.return_value.__iter__.return_value = iter([])
+        self.session.execute.return_value = result
+        since = datetime(2024, 1, 1, 12, tzinfo=timezone(timedelta(hours=2)))
+
+        with patch("src.repository.contacts.config.CONTACTS_SYNC_OVERLAP", 0):
+            self.session.get_bind.return_value.dialect.name = "sqlite"
+            await get_contact_changes(since, self.session, self.user)
+            self.session.get_bind.return_value.dialect.name = "postgresql"
+            await get_contact_changes(since, self.session, self.user)
+        compiled = self.session.execute.call_args_list[1].args[0].compile()
+        self.assertIn(datetime(2024, 1, 1, 10), compiled.params.values())
+        statement = self.session.execute.call_args_list[4].args[0]
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.assertIn("timezone(current_setting(", sql)
+
+    def test_birthday_ordinal_follows_birthday(self):
+        contact = Contact(name="name", birthday=date(1990, 3, 1))
+        self.assertEqual(contact.birthday_ordinal, 301)
+        contact.birthday = "1990-12-31"
+        self.assertEqual(contact.birthday_ordinal, 1231)
+        contact.birthday = None
+        self.assertIsNone(contact.birthday_ordinal)
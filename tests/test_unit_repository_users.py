@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import MagicMock, AsyncMock, Mock
+from unittest.mock import MagicMock, AsyncMock, Mock, patch
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.entity.models import Contact, User
@@ -27,6 +27,20 @@ class TestAsyncUsers(unittest.IsolatedAsyncioTestCase):
             confirmed=True,
         )
         self.session = AsyncMock(spec=AsyncSession)
+        patcher = patch("src.repository.users.user_cache")
+        self.user_cache = patcher.start()
+        self.user_cache.invalidate = AsyncMock()
+        self.addCleanup(patcher.stop)
+        patcher = patch("src.repository.users.after_commit")
+        self.after_commit = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def assert_invalidated_after_commit(self, email: str):
+        self.user_cache.invalidate.assert_not_awaited()
+        session, callback = self.after_commit.call_args.args
+        self.assertIs(session, self.session)
+        await callback()
+        self.user_cache.invalidate.assert_awaited_once_with(email)
 
     async def test_get_user_by_email(self):
         user = self.user
@@ -48,6 +62,7 @@ class TestAsyncUsers(unittest.IsolatedAsyncioTestCase):
         token = "new_token"
         result = await update_token(self.user, token, self.session)
         self.assertIsNone(result)
+        await self.assert_invalidated_after_commit(self.user.email)
 
     async def test_confirmed_email(self):
         user = self.user
@@ -56,6 +71,7 @@ class TestAsyncUsers(unittest.IsolatedAsyncioTestCase):
         self.session.execute.return_value = mocked_user
         result = await confirmed_email(user.email, self.session)
         self.assertIsNone(result)
+        await self.assert_invalidated_after_commit(user.email)
 
     async def test_update_avatar_url(self):
         user = self.user
@@ -65,3 +81,4 @@ class TestAsyncUsers(unittest.IsolatedAsyncioTestCase):
         new_avatar = "path/to/new_avatar.png"
         result = await update_avatar_url(user.email, new_avatar, self.session)
         self.assertEqual(result.avatar, new_avatar)
+        await self.assert_invalidated_after_commit(user.email)
@@ -0,0 +1,65 @@
+import time
+import unittest
+from unittest.mock import patch, AsyncMock
+
+from fastapi import HTTPException
+from jose import jwt, JWTError
+
+from src.services.auth import Auth
+from src.services.executor import ExecutorSaturated
+
+
+class TestAsyncAuthTokens(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.auth = Auth()
+        self.auth.token_cache.clear()
+
+    async def test_decode_token_is_cached(self):
+        token = await self.auth.create_access_token(data={"sub": "user@mail.net"})
+        with patch("src.services.auth.jwt.decode", wraps=jwt.decode) as decode:
+            first = self.auth.decode_token(token)
+            second = self.auth.decode_token(token)
+        self.assertEqual(first, second)
+        self.assertEqual(first["sub"], "user@mail.net")
+        decode.assert_called_once()
+
+    async def test_cached_token_expires_with_exp(self):
+        token = await self.auth.create_access_token(
+            data={"sub": "user@mail.net"}, expires_delta=60
+        )
+        payload = self.auth.decode_token(token)
+        key = next(iter(self.auth.token_cache._data))
+        self.auth.token_cache.set(key, payload, expires_at=time.time() - 1)
+        with patch("src.services.auth.jwt.decode", wraps=jwt.decode) as decode:
+            self.auth.decode_token(token)
+        decode.assert_called_once()
+
+    async def test_invalid_token_is_not_cached(self):
+        with self.assertRaises(JWTError):
+            self.auth.decode_token("not-a-token")
+        self.assertEqual(len(self.auth.token_cache), 0)
+
+    async def test_refresh_token_scope(self):
+        token = await self.auth.create_refresh_token(data={"sub": "user@mail.net"})
+        email = await self.auth.decode_refresh_token(token)
+        self.assertEqual(email, "user@mail.net")
+
+
+class TestAsyncAuthPasswords(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.auth = Auth()
+
+    async def test_hash_and_verify_in_pool(self):
+        hashed = await self.auth.get_password_hash_async("qwerty")
+        self.assertTrue(await self.auth.verify_password_async("qwerty", hashed))
+        self.assertFalse(await self.auth.verify_password_async("qwertz", hashed))
+
+    async def test_saturated_pool_answers_503(self):
+        with patch.object(
+            self.auth, "hash_executor", run=AsyncMock(side_effect=ExecutorSaturated)
+        ):
+            with self.assertRaises(HTTPException) as err:
+                await self.auth.verify_password_async("qwerty", "hash")
+        self.assertEqual(err.exception.status_code, 503)
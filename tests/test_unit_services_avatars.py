@@ -0,0 +1,116 @@
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import httpx
+from PIL import Image
+from starlette.requests import Request
+
+from src.services import avatars
+from src.services.avatars import (
+    AvatarTooLarge,
+    InvalidImage,
+    LocalAvatarStorage,
+    receive_avatar,
+    resize_avatar,
+    store_avatar,
+)
+
+
+def png(width: int, height: int) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(output, format="PNG")
+    return output.getvalue()
+
+
+def upload_request(
+    content: bytes, field: str = "file", chunk: int = 4096, length: bool = True
+) -> Request:
+    built = httpx.Request(
+        "PATCH",
+        "http://test/api/users/avatar",
+        files={field: ("avatar.png", content, "image/png")},
+    )
+    body = built.read()
+    headers = [
+        (key.lower().encode(), value.encode())
+        for key, value in built.headers.items()
+        if length or key.lower() != "content-length"
+    ]
+    chunks = [body[i : i + chunk] for i in range(0, len(body), chunk)]
+
+    async def receive():
+        if chunks:
+            return {
+                "type": "http.request",
+                "body": chunks.pop(0),
+                "more_body": bool(chunks),
+            }
+        return {"type": "http.disconnect"}
+
+    scope = {"type": "http", "method": "PATCH", "headers": headers}
+    return Request(scope, receive)
+
+
+class TestAsyncReceiveAvatar(unittest.IsolatedAsyncioTestCase):
+
+    async def test_reads_file_field(self):
+        content = os.urandom(50_000)
+        self.assertEqual(
+            await receive_avatar(upload_request(content), 100_000), content
+        )
+
+    async def test_rejects_large_content_length_before_reading(self):
+        request = upload_request(os.urandom(200_000))
+        with patch.object(request, "stream", side_effect=AssertionError):
+            with self.assertRaises(AvatarTooLarge):
+                await receive_avatar(request, 100_000)
+
+    async def test_rejects_large_body_while_streaming(self):
+        request = upload_request(os.urandom(200_000), length=False)
+        with self.assertRaises(AvatarTooLarge):
+            await receive_avatar(request, 100_000)
+
+    async def test_missing_file_field(self):
+        with self.assertRaises(InvalidImage):
+            await receive_avatar(upload_request(b"data", field="image"), 100_000)
+
+
+class TestResizeAvatar(unittest.TestCase):
+
+    def test_crops_to_square(self):
+        data, extension = resize_avatar(png(800, 400), 250)
+        self.assertEqual(extension, ".png")
+        with Image.open(io.BytesIO(data)) as avatar:
+            self.assertEqual(avatar.size, (250, 250))
+
+    def test_invalid_image(self):
+        with self.assertRaises(InvalidImage):
+            resize_avatar(b"not an image", 250)
+
+
+class TestAsyncLocalAvatarStorage(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.storage = LocalAvatarStorage(self.directory.name, "/static/avatars/")
+
+    async def test_save_writes_file(self):
+        url = await self.storage.save("user@example.com", b"avatar", ".png")
+        name = hashlib.sha256(b"user@example.com").hexdigest() + ".png"
+        self.assertTrue(url.startswith(f"/static/avatars/{name}?v="))
+        self.assertNotIn("user@example.com", url)
+        path = os.path.join(self.directory.name, name)
+        with open(path, "rb") as file:
+            self.assertEqual(file.read(), b"avatar")
+
+    async def test_store_avatar_resizes_before_saving(self):
+        with patch.object(avatars.config, "AVATAR_SIZE", 64):
+            url = await store_avatar(png(300, 200), "user", self.storage)
+        name = url.rsplit("/", 1)[1].split("?")[0]
+        with Image.open(os.path.join(self.directory.name, name)) as avatar:
+            self.assertEqual(avatar.size, (64, 64))
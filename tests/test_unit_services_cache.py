@@ -0,0 +1,141 @@
+import pickle
+import time
+import unittest
+from unittest.mock import AsyncMock
+
+from redis.exceptions import ConnectionError
+
+from src.services.cache import (
+    CollectionVersions,
+    LRUCache,
+    PrincipalCache,
+    QueryCache,
+)
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_expired_entry_is_dropped(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("a", 1, expires_at=time.time() - 1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+
+class TestAsyncPrincipalCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.client = AsyncMock()
+        self.cache = PrincipalCache(
+            self.client,
+            maxsize=10,
+            local_ttl=30,
+            ttl=300,
+            channel="invalidate",
+            dumps=pickle.dumps,
+            loads=pickle.loads,
+        )
+
+    async def test_miss_in_both_tiers(self):
+        self.client.get.return_value = None
+        result = await self.cache.get("user@mail.net")
+        self.assertIsNone(result)
+        self.assertEqual(self.cache.misses, {"local": 1, "redis": 1})
+
+    async def test_redis_hit_is_promoted_to_local_tier(self):
+        self.client.get.return_value = pickle.dumps({"email": "user@mail.net"})
+        await self.cache.get("user@mail.net")
+        result = await self.cache.get("user@mail.net")
+        self.assertEqual(result, {"email": "user@mail.net"})
+        self.client.get.assert_awaited_once()
+        self.assertEqual(self.cache.hits, {"local": 1, "redis": 1})
+
+    async def test_set_writes_both_tiers(self):
+        await self.cache.set("user@mail.net", {"email": "user@mail.net"})
+        self.client.set.assert_awaited_once_with(
+            "user@mail.net", pickle.dumps({"email": "user@mail.net"}), ex=300
+        )
+        self.assertEqual(
+            self.cache.local.get("user@mail.net"), {"email": "user@mail.net"}
+        )
+
+    async def test_redis_errors_are_misses(self):
+        self.client.get.side_effect = ConnectionError()
+        self.client.set.side_effect = ConnectionError()
+        self.assertIsNone(await self.cache.get("user@mail.net"))
+        self.assertEqual(self.cache.misses, {"local": 1, "redis": 1})
+        await self.cache.set("user@mail.net", {"email": "user@mail.net"})
+        self.assertIsNone(self.cache.local.get("user@mail.net"))
+
+    async def test_invalidate_publishes_key(self):
+        await self.cache.set("user@mail.net", {"email": "user@mail.net"})
+        await self.cache.invalidate("user@mail.net")
+        self.assertIsNone(self.cache.local.get("user@mail.net"))
+        self.client.delete.assert_awaited_once_with("user@mail.net")
+        self.client.publish.assert_awaited_once_with("invalidate", "user@mail.net")
+
+    async def test_invalidate_survives_redis_errors(self):
+        self.client.delete.side_effect = ConnectionError()
+        await self.cache.set("user@mail.net", {"email": "user@mail.net"})
+        await self.cache.invalidate("user@mail.net")
+        self.assertIsNone(self.cache.local.get("user@mail.net"))
+
+
+class TestAsyncCollectionVersions(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.client = AsyncMock()
+        self.versions = CollectionVersions(self.client, "contacts:version")
+
+    async def test_missing_version_is_seeded(self):
+        self.client.get.side_effect = [None, b"42"]
+        self.assertEqual(await self.versions.get(1), 42)
+        key, _ = self.client.set.call_args.args
+        self.assertEqual(key, "contacts:version:1")
+        self.assertTrue(self.client.set.call_args.kwargs["nx"])
+
+    async def test_get_survives_redis_errors(self):
+        self.client.get.side_effect = ConnectionError()
+        self.assertIsNone(await self.versions.get(1))
+
+
+class TestAsyncQueryCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.client = AsyncMock()
+        self.cache = QueryCache(self.client, "contacts:query", ttl=60)
+        self.load = AsyncMock(return_value={"body": b"[]"})
+
+    def test_key_depends_on_version_and_params(self):
+        key = self.cache.key(1, 7, "search", query="a", lean=False)
+        self.assertEqual(key, self.cache.key(1, 7, "search", lean=False, query="a"))
+        self.assertNotEqual(key, self.cache.key(1, 8, "search", query="a", lean=False))
+        self.assertNotEqual(key, self.cache.key(1, 7, "search", query="b", lean=False))
+
+    async def test_hit_skips_load(self):
+        self.client.hgetall.return_value = {b"body": b"[1]"}
+        entry = await self.cache.get_or_load("key", self.load)
+        self.assertEqual(entry, {"body": b"[1]"})
+        self.load.assert_not_awaited()
+        self.assertEqual(self.cache.stats()["hit_rate"], 1.0)
+
+    async def test_redis_errors_fall_back_to_load(self):
+        self.client.hgetall.side_effect = ConnectionError()
+        entry = await self.cache.get_or_load("key", self.load)
+        self.assertEqual(entry, {"body": b"[]"})
+        self.assertEqual(self.cache.stats()["errors"], 1)
+
+    async def test_no_key_bypasses_cache(self):
+        await self.cache.get_or_load(None, self.load)
+        self.client.hgetall.assert_not_awaited()
+        self.load.assert_awaited_once()
@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+import resource
+import tracemalloc
+import unittest
+from datetime import date
+
+from sqlalchemy import insert
+
+from src.database.db import DatabaseSessionManager
+from src.entity.models import Base, Contact, User
+from src.services.contacts_export import EXPORT_FIELDS, ExportFormat, export_contacts
+
+ROWS = 30_000
+BATCH = 5_000
+
+
+class TestAsyncExportContacts(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.manager = DatabaseSessionManager("sqlite+aiosqlite://")
+        async with self.manager.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(
+                insert(User),
+                [{"username": "user", "email": "user@example.com", "password": "x"}],
+            )
+            for start in range(0, ROWS, BATCH):
+                await connection.execute(
+                    insert(Contact),
+                    [
+                        {
+                            "name": f"name{i}",
+                            "surname": f"surname{i}",
+                            "email": f"contact{i}@example.com",
+                            "phone": f"380{i:07d}",
+                            "birthday": date(1990, 1 + i % 12, 1 + i % 28),
+                            "notes": "exported",
+                            "user_id": 1,
+                        }
+                        for i in range(start, start + BATCH)
+                    ],
+                )
+
+    async def asyncTearDown(self) -> None:
+        await self.manager.close()
+
+    async def test_ndjson_export(self):
+        lines, first = 0, None
+        async for chunk in export_contacts(self.manager, ExportFormat.ndjson, 1000):
+            if first is None:
+                first = json.loads(chunk.split(b"\n", 1)[0])
+            lines += chunk.count(b"\n")
+        self.assertEqual(lines, ROWS)
+        self.assertEqual(first["id"], 1)
+        self.assertEqual(first["birthday"], "1990-01-01")
+        self.assertEqual(set(first), set(EXPORT_FIELDS))
+
+    async def test_csv_export(self):
+        chunks = export_contacts(self.manager, ExportFormat.csv, 1000)
+        header = await anext(chunks)
+        self.assertEqual(
+            next(csv.reader(io.StringIO(header.decode()))), list(EXPORT_FIELDS)
+        )
+        rows = 0
+        async for chunk in chunks:
+            rows += sum(1 for _ in csv.reader(io.StringIO(chunk.decode())))
+        self.assertEqual(rows, ROWS)
+
+    async def test_memory_stays_flat(self):
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        tracemalloc.start()
+        try:
+            exported = 0
+            async for chunk in export_contacts(self.manager, ExportFormat.ndjson, 500):
+                exported += len(chunk)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+        # The whole export is several MiB; only a batch or two may be alive at once.
+        self.assertGreater(exported, 5 * 2**20)
+        self.assertLess(peak, exported / 4)
+        self.assertLess(rss_growth * 1024, exported)
@@ -0,0 +1,203 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import func, insert, select
+
+from src.database.db import DatabaseSessionManager
+from src.entity.models import Base, Contact, User
+from src.services.contacts_import import (
+    ImportFormat,
+    ImportRejected,
+    detect_format,
+    import_contacts,
+    iter_lines,
+    iter_records,
+)
+
+
+async def stream(data: bytes, size: int = 7):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+async def collect(iterator) -> list:
+    return [item async for item in iterator]
+
+
+CSV_HEADER = b"name,surname,email,phone,birthday,notes\n"
+
+
+def csv_row(i: int, notes: str = "imported") -> bytes:
+    return (
+        f"name{i},surname{i},contact{i}@example.com,38093{i:05d},1990-03-01,{notes}\n"
+    ).encode()
+
+
+class TestImportParsing(unittest.IsolatedAsyncioTestCase):
+
+    def test_detect_format(self):
+        self.assertEqual(detect_format("text/csv; charset=utf-8"), ImportFormat.csv)
+        self.assertEqual(detect_format("application/x-ndjson"), ImportFormat.ndjson)
+        self.assertIsNone(detect_format("application/json"))
+        self.assertIsNone(detect_format(None))
+
+    async def test_lines_are_split_across_chunks(self):
+        lines = await collect(iter_lines(stream(b"first\nsecond\r\nlast", size=3)))
+        self.assertEqual(lines, [(1, b"first"), (2, b"second\r"), (3, b"last")])
+
+    async def test_overlong_line_is_dropped(self):
+        data = b"short\n" + b"x" * 50 + b"\nafter\n"
+        lines = await collect(iter_lines(stream(data, size=8), max_bytes=16))
+        self.assertEqual(lines, [(1, b"short"), (2, None), (3, b"after")])
+
+    async def test_csv_records(self):
+        data = (
+            b"\xef\xbb\xbfName,Surname,Email,Phone,Birthday,Notes\n"
+            b'Ann,Lee,ann@example.com,12345,1990-03-01,"two\nlines"\n'
+            b"Bob,Ray,bob@example.com,54321,1990-03-02,\n"
+            b"broken,row\n"
+        )
+        records = await collect(iter_records(stream(data), ImportFormat.csv))
+        self.assertEqual(records[0][0], 2)
+        self.assertEqual(records[0][1]["notes"], "two\nlines")
+        self.assertEqual(records[1][0], 4)
+        self.assertIsNone(records[1][1]["notes"])
+        self.assertEqual(records[2], (5, None, "Expected 6 fields, got 2"))
+
+    async def test_quote_inside_unquoted_field(self):
+        data = (
+            CSV_HEADER
+            + b'Bob,O"Brien,bob@example.com,54321,1990-03-02,\n'
+            + b'Ann,Lee,ann@example.com,12345,1990-03-01,"say ""hi""\nthen go"\n'
+            + csv_row(3)
+        )
+        records = await collect(iter_records(stream(data), ImportFormat.csv))
+        self.assertEqual([record[0] for record in records], [2, 3, 5])
+        self.assertEqual(records[0][1]["surname"], 'O"Brien')
+        self.assertEqual(records[1][1]["notes"], 'say "hi"\nthen go')
+        self.assertEqual(records[2][1]["email"], "contact3@example.com")
+
+    async def test_unterminated_quoted_field_is_capped(self):
+        data = CSV_HEADER + b'Ann,Lee,ann@example.com,1,1990-03-01,"open\n'
+        data += b"more\n" * 10 + csv_row(1)
+        with patch("src.services.contacts_import.MAX_LINE_BYTES", 32):
+            records = await collect(iter_records(stream(data), ImportFormat.csv))
+        self.assertEqual(records[0], (2, None, "Record is longer than 32 bytes"))
+        self.assertEqual(records[-1][1]["email"], "contact1@example.com")
+
+    async def test_csv_without_header_is_rejected(self):
+        with self.assertRaises(ImportRejected):
+            await collect(iter_records(stream(csv_row(1)), ImportFormat.csv))
+
+    async def test_ndjson_records(self):
+        data = b'{"name": "Ann"}\n\nnot json\n[1, 2]\n'
+        records = await collect(iter_records(stream(data), ImportFormat.ndjson))
+        self.assertEqual(records[0], (1, {"name": "Ann"}, None))
+        self.assertEqual(records[1][0], 3)
+        self.assertTrue(records[1][2].startswith("Invalid JSON"))
+        self.assertEqual(records[2], (4, None, "Expected a JSON object"))
+
+
+class TestAsyncImportContacts(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.manager = DatabaseSessionManager("sqlite+aiosqlite://")
+        async with self.manager.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.execute(
+                insert(User),
+                [{"username": "user", "email": "user@example.com", "password": "x"}],
+            )
+        self.user = User(id=1, username="user", email="user@example.com")
+
+    async def asyncTearDown(self) -> None:
+        await self.manager.close()
+
+    async def count_contacts(self) -> int:
+        async with self.manager.session() as session:
+            result = await session.execute(select(func.count(Contact.id)))
+            return result.scalar_one()
+
+    async def test_csv_import_in_batches(self):
+        data = CSV_HEADER + b"".join(csv_row(i) for i in range(25))
+        async with self.manager.session() as session:
+            report = await import_contacts(
+                stream(data, size=64), ImportFormat.csv, session, self.user, 10
+            )
+        self.assertEqual(report.imported, 25)
+        self.assertEqual(report.failed, 0)
+        self.assertEqual(await self.count_contacts(), 25)
+        async with self.manager.session() as session:
+            contact = (await session.execute(select(Contact).limit(1))).scalar_one()
+        self.assertEqual(contact.birthday_ordinal, 301)
+        self.assertEqual(contact.user_id, self.user.id)
+        self.assertIsNotNone(contact.created_at)
+
+    async def test_notes_column_is_optional(self):
+        csv_data = b"name,surname,email,phone,birthday\n" + b"".join(
+            csv_row(i).rsplit(b",", 1)[0] + b"\n" for i in range(2)
+        )
+        ndjson_data = json.dumps(
+            {
+                "name": "name9",
+                "surname": "surname9",
+                "email": "contact9@example.com",
+                "phone": "3809300009",
+                "birthday": "1990-03-01",
+            }
+        ).encode()
+        async with self.manager.session() as session:
+            csv_report = await import_contacts(
+                stream(csv_data), ImportFormat.csv, session, self.user
+            )
+            ndjson_report = await import_contacts(
+                stream(ndjson_data), ImportFormat.ndjson, session, self.user
+            )
+        self.assertEqual((csv_report.imported, csv_report.failed), (2, 0))
+        self.assertEqual((ndjson_report.imported, ndjson_report.failed), (1, 0))
+        self.assertEqual(await self.count_contacts(), 3)
+
+    async def test_duplicates_and_errors_are_reported(self):
+        async with self.manager.session() as session:
+            await import_contacts(
+                stream(CSV_HEADER + csv_row(1)), ImportFormat.csv, session, self.user
+            )
+        rows = [
+            {
+                "name": "name1",
+                "surname": "surname1",
+                "email": "contact1@example.com",
+                "phone": "3809300001",
+                "birthday": "1990-03-01",
+                "notes": None,
+            },
+            {
+                "name": "name2",
+                "surname": "surname2",
+                "email": "contact2@example.com",
+                "phone": "3809300002",
+                "birthday": "1990-03-01",
+                "notes": None,
+            },
+            {
+                "name": "name2",
+                "surname": "surname2",
+                "email": "contact2@example.com",
+                "phone": "3809300003",
+                "birthday": "1990-03-01",
+                "notes": None,
+            },
+            {"name": "x", "email": "not-an-email"},
+        ]
+        data = b"".join(json.dumps(row).encode() + b"\n" for row in rows)
+        async with self.manager.session() as session:
+            report = await import_contacts(
+                stream(data), ImportFormat.ndjson, session, self.user, max_errors=1
+            )
+        self.assertEqual(report.imported, 1)
+        self.assertEqual(report.duplicates, 2)
+        self.assertEqual(report.failed, 1)
+        self.assertEqual(report.errors[0].line, 4)
+        self.assertIn("email", report.errors[0].error)
+        self.assertEqual(await self.count_contacts(), 2)
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import unittest
+
+from src.services.executor import BoundedExecutor, ExecutorSaturated
+
+
+class TestAsyncBoundedExecutor(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.executor = BoundedExecutor(
+            max_workers=1, max_queue=1, thread_name_prefix="test"
+        )
+        self.release = threading.Event()
+
+    def tearDown(self) -> None:
+        self.release.set()
+        self.executor.shutdown()
+
+    async def test_run_returns_result(self):
+        result = await self.executor.run(sum, [1, 2, 3])
+        self.assertEqual(result, 6)
+        self.assertEqual(self.executor.pending, 0)
+
+    async def test_saturated_executor_rejects_calls(self):
+        running = [
+            asyncio.create_task(self.executor.run(self.release.wait)) for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        with self.assertRaises(ExecutorSaturated):
+            await self.executor.run(self.release.wait)
+        self.release.set()
+        await asyncio.gather(*running)
+        self.assertEqual(self.executor.pending, 0)
+
+    async def test_cancelled_call_keeps_its_slot_until_the_thread_is_done(self):
+        started = threading.Event()
+
+        def work():
+            started.set()
+            self.release.wait()
+
+        task = asyncio.create_task(self.executor.run(work))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        self.assertEqual(self.executor.pending, 1)
+        self.release.set()
+        for _ in range(100):
+            if not self.executor.pending:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(self.executor.pending, 0)
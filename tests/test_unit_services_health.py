@@ -0,0 +1,80 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from redis.exceptions import ConnectionError
+
+from src.database.db import DatabaseSessionManager
+from src.services.health import HealthChecker
+
+
+class TestAsyncHealthChecker(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.manager = DatabaseSessionManager("sqlite+aiosqlite://")
+        self.redis = AsyncMock()
+        self.checker = HealthChecker(
+            self.manager, self.redis, interval=5, timeout=1, stale_after=15
+        )
+
+    async def asyncTearDown(self) -> None:
+        await self.manager.close()
+
+    async def test_not_ready_before_first_check(self):
+        ready, checks = self.checker.ready()
+        self.assertFalse(ready)
+        self.assertEqual(checks["database"]["error"], "not checked yet")
+
+    async def test_ready_after_check(self):
+        await self.checker.check()
+        ready, checks = self.checker.ready()
+        self.assertTrue(ready)
+        self.assertGreaterEqual(checks["database"]["latency_ms"], 0)
+        self.assertIn("checked_out", checks["database"]["pool"])
+        self.assertGreaterEqual(checks["redis"]["latency_ms"], 0)
+        self.redis.ping.assert_awaited_once()
+
+    async def test_probes_do_no_io(self):
+        await self.checker.check()
+        with patch.object(self.checker, "sessionmanager", None):
+            for _ in range(100):
+                self.assertTrue(self.checker.ready()[0])
+        self.redis.ping.assert_awaited_once()
+
+    async def test_redis_down(self):
+        self.redis.ping.side_effect = ConnectionError("down")
+        await self.checker.check()
+        ready, checks = self.checker.ready()
+        self.assertFalse(ready)
+        self.assertTrue(checks["database"]["ok"])
+        self.assertIn("down", checks["redis"]["error"])
+
+    async def test_slow_ping_times_out(self):
+        async def hang():
+            await asyncio.sleep(10)
+
+        self.redis.ping.side_effect = hang
+        self.checker.timeout = 0.01
+        await self.checker.check()
+        self.assertFalse(self.checker.results["redis"]["ok"])
+
+    async def test_stale_check_is_not_ready(self):
+        await self.checker.check()
+        for result in self.checker.results.values():
+            result["checked_at"] -= 60
+        ready, checks = self.checker.ready()
+        self.assertFalse(ready)
+        self.assertEqual(checks["database"]["error"], "check is stale")
+
+    async def test_start_runs_checks_in_background(self):
+        await self.checker.start()
+        try:
+
+            async def until_ready():
+                while not self.checker.ready()[0]:
+                    await asyncio.sleep(0.01)
+
+            await asyncio.wait_for(until_ready(), 5)
+            self.assertEqual(set(self.checker.results), {"database", "redis"})
+        finally:
+            await self.checker.stop()
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import aiosmtplib
+
+from src.services.mail_queue import MailQueue, MailWorker, build_message
+
+MESSAGE = {
+    "id": "1",
+    "attempts": 0,
+    "to": "user@example.com",
+    "subject": "Confirm your email ",
+    "template": "verify_email.html",
+    "body": {"host": "http://test/", "username": "user", "token": "token"},
+}
+
+
+class FakeQueue:
+    def __init__(self, batches=()):
+        self.batches = list(batches)
+        self.acked = []
+        self.rescheduled = []
+        self.heartbeats = []
+        self.released = []
+
+    async def take(self, consumer, count, timeout):
+        if self.batches:
+            return self.batches.pop(0)
+        await asyncio.sleep(timeout)
+        return []
+
+    async def heartbeat(self, consumer, ttl):
+        self.heartbeats.append(consumer)
+
+    async def requeue_orphans(self, consumer=""):
+        self.released.append(consumer)
+        return 0
+
+    async def ack(self, consumer, raw):
+        self.acked.append(raw)
+
+    async def reschedule(self, consumer, raw, due):
+        self.rescheduled.append((raw, due))
+
+
+class FakeSMTP:
+    connects = 0
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+        self.is_connected = False
+
+    async def connect(self):
+        FakeSMTP.connects += 1
+        self.is_connected = True
+
+    async def send_message(self, message):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append(message)
+
+    async def quit(self):
+        self.is_connected = False
+
+
+class TestBuildMessage(unittest.TestCase):
+
+    def test_renders_template(self):
+        message = build_message(MESSAGE)
+        self.assertEqual(message["To"], "user@example.com")
+        html = message.get_content()
+        self.assertIn("Hi user,", html)
+        self.assertIn("http://test/api/auth/confirmed_email/token", html)
+
+
+class TestAsyncMailWorker(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        FakeSMTP.connects = 0
+        self.queue = FakeQueue()
+
+    def worker(self, smtp: FakeSMTP) -> MailWorker:
+        return MailWorker(self.queue, 1, 10, smtp_factory=lambda: smtp, name="test")
+
+    async def test_batch_shares_one_session(self):
+        smtp = FakeSMTP()
+        worker = self.worker(smtp)
+        session = None
+        batch = [json.dumps(MESSAGE | {"id": str(i)}).encode() for i in range(5)]
+        for raw in batch:
+            session = await worker._send("test:0", session, raw)
+        self.assertIs(session, smtp)
+        self.assertEqual(FakeSMTP.connects, 1)
+        self.assertEqual(len(smtp.sent), 5)
+        self.assertEqual(self.queue.acked, batch)
+        self.assertEqual(worker.stats()["sessions"], 1)
+
+    async def test_consumer_names_are_unique_per_worker(self):
+        first = MailWorker(self.queue, 1, 10)
+        second = MailWorker(self.queue, 1, 10)
+        self.assertNotEqual(first.name, second.name)
+
+    async def test_consumer_beats_and_releases_its_messages_on_stop(self):
+        raw = json.dumps(MESSAGE).encode()
+        self.queue.batches = [[raw]]
+        worker = self.worker(FakeSMTP())
+        task = asyncio.create_task(worker._consume("test:0"))
+        for _ in range(100):
+            if self.queue.acked:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        self.assertEqual(self.queue.acked, [raw])
+        self.assertEqual(self.queue.heartbeats, ["test:0"])
+        self.assertEqual(self.queue.released, ["test:0"])
+
+    async def test_transient_failure_is_retried_later(self):
+        smtp = FakeSMTP([aiosmtplib.SMTPServerDisconnected("gone")])
+        raw = json.dumps(MESSAGE).encode()
+        with patch("src.services.mail_queue.time.time", return_value=1000.0):
+            session = await self.worker(smtp)._send("test:0", None, raw)
+        self.assertIsNone(session)
+        [(rescheduled, due)] = self.queue.rescheduled
+        self.assertEqual(rescheduled, raw)
+        self.assertGreater(due, 1000.0)
+        self.assertEqual(self.queue.acked, [])
+
+    async def test_permanent_failure_is_dead_lettered(self):
+        error = aiosmtplib.SMTPResponseException(550, "no such user")
+        smtp = FakeSMTP([error])
+        session = await self.worker(smtp)._send(
+            "test:0", None, json.dumps(MESSAGE).encode()
+        )
+        self.assertIs(session, smtp)
+        self.assertIsNone(self.queue.rescheduled[0][1])
+
+    async def test_unknown_template_is_dead_lettered(self):
+        smtp = FakeSMTP()
+        raw = json.dumps(MESSAGE | {"template": "missing.html"}).encode()
+        session = await self.worker(smtp)._send("test:0", None, raw)
+        self.assertIsNone(session)
+        self.assertEqual(self.queue.rescheduled, [(raw, None)])
+        self.assertEqual(FakeSMTP.connects, 0)
+
+    async def test_poison_message_does_not_stop_the_consumer(self):
+        good = json.dumps(MESSAGE).encode()
+        self.queue.batches = [[b"not json", good]]
+        task = asyncio.create_task(self.worker(FakeSMTP())._consume("test:0"))
+        for _ in range(100):
+            if self.queue.acked:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        self.assertEqual(self.queue.rescheduled, [(b"not json", None)])
+        self.assertEqual(self.queue.acked, [good])
+
+    async def test_gives_up_after_max_attempts(self):
+        smtp = FakeSMTP([aiosmtplib.SMTPServerDisconnected("gone")])
+        raw = json.dumps(MESSAGE | {"attempts": 5}).encode()
+        with patch("src.services.mail_queue.config.MAIL_MAX_ATTEMPTS", 6):
+            await self.worker(smtp)._send("test:0", None, raw)
+        self.assertIsNone(self.queue.rescheduled[0][1])
+
+
+class TestAsyncMailQueue(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.client = AsyncMock()
+        self.client.register_script = MagicMock(side_effect=lambda _: AsyncMock())
+        self.queue = MailQueue(self.client, "mail")
+
+    async def test_put_adds_id_and_attempts(self):
+        await self.queue.put({"to": "user@example.com"})
+        key, raw = self.client.lpush.call_args.args
+        self.assertEqual(key, "mail:queue")
+        message = json.loads(raw)
+        self.assertEqual(message["attempts"], 0)
+        self.assertEqual(message["to"], "user@example.com")
+        self.assertTrue(message["id"])
+
+    async def test_requeue_orphans(self):
+        self.queue._requeue.return_value = 3
+        self.assertEqual(await self.queue.requeue_orphans(), 3)
+        self.queue._requeue.assert_awaited_once_with(
+            keys=["mail:consumers", "mail:queue"], args=["mail", ""]
+        )
+
+    async def test_unreadable_message_is_dead_lettered_as_is(self):
+        pipe = MagicMock(execute=AsyncMock())
+        self.client.pipeline = MagicMock(return_value=AsyncMock())
+        self.client.pipeline.return_value.__aenter__.return_value = pipe
+        await self.queue.reschedule("host:0", b"not json", None)
+        pipe.lpush.assert_called_once_with("mail:dead", b"not json")
+
+    async def test_take_waits_for_first_message(self):
+        self.client.blmove.return_value = None
+        self.assertEqual(await self.queue.take("host:0", 10, 1), [])
+        args = self.client.blmove.call_args.args
+        self.assertEqual(args[:2], ("mail:queue", "mail:processing:host:0"))
@@ -0,0 +1,50 @@
+import pickle
+import unittest
+
+from src.entity.models import User, Role
+from src.schemas.user import UserResponse
+from src.services.principal import PRINCIPAL_VERSION, dump_principal, load_principal
+
+
+class TestPrincipal(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.user = User(
+            id=42,
+            username="user",
+            email="user@mail.net",
+            password="qwerty",
+            avatar="https://example.com/avatar.png",
+            refresh_token="token",
+            role=Role.moderator,
+            confirmed=True,
+        )
+
+    def test_round_trip(self):
+        data = dump_principal(self.user)
+        self.assertEqual(data[0], PRINCIPAL_VERSION)
+        result = load_principal(data)
+        self.assertIsInstance(result, User)
+        self.assertEqual(
+            UserResponse.model_validate(result), UserResponse.model_validate(self.user)
+        )
+        self.assertTrue(result.confirmed)
+
+    def test_secrets_are_not_cached(self):
+        result = load_principal(dump_principal(self.user))
+        self.assertIsNone(result.password)
+        self.assertIsNone(result.refresh_token)
+
+    def test_role_given_as_string(self):
+        self.user.role = "admin"
+        result = load_principal(dump_principal(self.user))
+        self.assertEqual(result.role, Role.admin)
+
+    def test_missing_avatar(self):
+        self.user.avatar = None
+        result = load_principal(dump_principal(self.user))
+        self.assertIsNone(result.avatar)
+
+    def test_unknown_version_is_a_miss(self):
+        self.assertIsNone(load_principal(pickle.dumps(self.user)))
+        self.assertIsNone(load_principal(b""))
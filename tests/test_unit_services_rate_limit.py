@@ -0,0 +1,145 @@
+import math
+import unittest
+from unittest.mock import MagicMock, patch
+
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError
+
+from src.entity.models import Role
+from src.services.rate_limit import Rate, RateLimiter, TokenBuckets
+
+
+class FakeLeaseScript:
+    """
+    The TAKE_LEASE script, evaluated in Python over an in-memory bucket.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.calls = 0
+
+    async def __call__(self, keys, args):
+        self.calls += 1
+        capacity, rate, now, want, refund = args
+        tokens, ts = self.buckets.get(keys[0], (capacity, now))
+        tokens = min(capacity, tokens + max(0, now - ts) * rate + refund)
+        granted = min(want, math.floor(tokens))
+        tokens -= granted
+        self.buckets[keys[0]] = (tokens, now)
+        wait = 0 if granted else math.ceil((1 - tokens) / rate)
+        return [granted, wait]
+
+
+def buckets(script, lease_fraction: float = 0.1) -> TokenBuckets:
+    client = MagicMock()
+    client.register_script.return_value = script
+    return TokenBuckets(client, "ratelimit", lease_fraction, 100)
+
+
+class TestRate(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(Rate.parse("1/20"), Rate(1, 20.0))
+        self.assertIsNone(Rate.parse(""))
+
+
+class TestAsyncTokenBuckets(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.script = FakeLeaseScript()
+        self.buckets = buckets(self.script)
+        self.now = 1000.0
+        clock = patch("src.services.rate_limit.time.time", lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    async def test_spends_leased_tokens_locally(self):
+        rate = Rate(100, 60)
+        for _ in range(30):
+            self.assertEqual(await self.buckets.acquire("route:1", rate), 0)
+        # One token first, then leases of a tenth of the bucket.
+        self.assertEqual(self.script.calls, 4)
+        self.assertEqual(self.buckets.decisions, {"local": 26, "redis": 4})
+
+    async def test_refuses_locally_until_refilled(self):
+        rate = Rate(1, 20)
+        self.assertEqual(await self.buckets.acquire("route:1", rate), 0)
+        self.now += 2
+        self.assertAlmostEqual(await self.buckets.acquire("route:1", rate), 18)
+        self.now += 1
+        self.assertAlmostEqual(await self.buckets.acquire("route:1", rate), 17)
+        self.assertEqual(self.script.calls, 2)
+        self.now += 17
+        self.assertEqual(await self.buckets.acquire("route:1", rate), 0)
+        self.assertEqual(self.buckets.rejected, 2)
+
+    async def test_workers_share_the_limit(self):
+        rate = Rate(20, 60)
+        workers = [buckets(self.script), buckets(self.script)]
+        allowed = 0
+        for index in range(100):
+            wait = await workers[index % 2].acquire("route:1", rate)
+            allowed += wait == 0
+        self.assertEqual(allowed, 20)
+
+    async def test_workers_never_refuse_a_user_under_the_limit(self):
+        rate = Rate(100, 60)
+        for count, interval in ((4, 4.0), (2, 2.0), (4, 0.65), (3, 0.61)):
+            self.script.buckets.clear()
+            workers = [buckets(self.script) for _ in range(count)]
+            for index in range(int(600 / interval)):
+                self.now += interval
+                wait = await workers[index % count].acquire("route:1", rate)
+                self.assertEqual(wait, 0, (count, interval, index))
+
+    async def test_gives_back_unspent_tokens(self):
+        rate = Rate(100, 60)
+        for _ in range(3):
+            await self.buckets.acquire("route:1", rate)
+        lease = self.buckets.local.get("route:1")
+        self.assertEqual(lease.tokens, 8)
+        # Everyone else has drained the shared bucket meanwhile.
+        self.script.buckets["ratelimit:route:1"] = (0, int(self.now * 1000))
+        self.now = lease.expires_at
+        await self.buckets.acquire("route:1", rate)
+        tokens, _ = self.script.buckets["ratelimit:route:1"]
+        # 10 refilled over the lease and 8 given back, less the new lease of 3.
+        self.assertAlmostEqual(tokens, 15)
+
+    async def test_lets_requests_through_when_redis_fails(self):
+        script = MagicMock(side_effect=ConnectionError("down"))
+        failing = buckets(script)
+        self.assertEqual(await failing.acquire("route:1", Rate(1, 20)), 0)
+        self.assertEqual(failing.errors, 1)
+
+
+class TestAsyncRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self) -> None:
+        self.script = FakeLeaseScript()
+        self.buckets = buckets(self.script)
+
+    def user(self, role: Role):
+        return MagicMock(id=1, role=role)
+
+    async def test_too_many_requests(self):
+        with patch.dict(
+            "src.services.rate_limit.config.RATE_LIMITS", {"route": "1/20"}
+        ):
+            limiter = RateLimiter("route", self.buckets)
+        await limiter(self.user(Role.user))
+        with self.assertRaises(HTTPException) as err:
+            await limiter(self.user(Role.user))
+        self.assertEqual(err.exception.status_code, 429)
+        self.assertEqual(err.exception.headers["Retry-After"], "20")
+
+    async def test_rate_per_role(self):
+        limits = {"route": "1/20", "route:admin": "", "route:moderator": "5/20"}
+        with patch.dict("src.services.rate_limit.config.RATE_LIMITS", limits):
+            limiter = RateLimiter("route", self.buckets)
+        self.assertEqual(limiter.rate_for(self.user(Role.user)), Rate(1, 20))
+        self.assertEqual(limiter.rate_for(self.user(Role.moderator)), Rate(5, 20))
+        self.assertIsNone(limiter.rate_for(self.user(Role.admin)))
+        for _ in range(3):
+            await limiter(self.user(Role.admin))
+        self.assertEqual(self.script.calls, 0)
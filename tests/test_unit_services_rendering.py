@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from src.services.rendering import TemplateRenderer, email_templates
+
+
+class TestTemplateRenderer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.folder = Path(self.directory.name)
+        (self.folder / "hello.html").write_text("<p>Hi {{ username }}</p>")
+        (self.folder / "bye.html").write_text("<p>Bye {{ username }}</p>")
+        self.renderer = TemplateRenderer(self.folder)
+
+    def test_compile_loads_every_template(self):
+        self.assertEqual(self.renderer.compile(), 2)
+        self.assertEqual(set(self.renderer.templates), {"hello.html", "bye.html"})
+
+    def test_render_does_not_touch_the_loader(self):
+        self.renderer.compile()
+        with patch.object(
+            self.renderer.environment.loader, "get_source", side_effect=AssertionError
+        ):
+            html = self.renderer.render("hello.html", username="<b>user</b>")
+        self.assertEqual(html, "<p>Hi &lt;b&gt;user&lt;/b&gt;</p>")
+
+    def test_changes_on_disk_are_not_picked_up(self):
+        self.renderer.compile()
+        (self.folder / "hello.html").write_text("changed")
+        os.utime(self.folder / "hello.html", (0, 2**31))
+        self.assertEqual(
+            self.renderer.render("hello.html", username="u"), "<p>Hi u</p>"
+        )
+
+    def test_renders_template_not_compiled_yet(self):
+        self.assertEqual(self.renderer.render("bye.html", username="u"), "<p>Bye u</p>")
+        self.assertEqual(list(self.renderer.templates), ["bye.html"])
+
+    def test_stats_count_renders(self):
+        self.renderer.compile()
+        for _ in range(3):
+            self.renderer.render("hello.html", username="u")
+        stats = self.renderer.stats()
+        self.assertEqual(stats["compiled"], 2)
+        self.assertEqual(stats["templates"]["hello.html"]["renders"], 3)
+        self.assertEqual(stats["templates"]["bye.html"]["renders"], 0)
+        self.assertGreater(stats["templates"]["hello.html"]["max_us"], 0)
+
+    def test_email_templates_include_verify_email(self):
+        self.assertIn("verify_email.html", email_templates.environment.list_templates())